@@ -1,14 +1,11 @@
 # app.py
 from flask import Flask, jsonify, request, render_template, Response, session
 import json
+import math
+import os
 import time
-import datetime
-import threading
 import asyncio
-import numpy as np
-import random
-import uuid
-from datetime import timedelta
+import itertools
 from lovable_integration import (
     lovable_auth_required,
     lovable_login,
@@ -16,442 +13,71 @@ from lovable_integration import (
     lovable_logout,
     sync_with_lovable
 )
+from rate_limiter import AdmissionController
+from simulation import SimulationState
+from tick_recorder import TickRecorder
+from idempotency import IdempotencyCache
 
 # Define the Flask application
 app = Flask(__name__, static_folder='static', template_folder='templates')
 app.secret_key = os.getenv('FLASK_SECRET_KEY', 'your-secret-key-here')  # Required for session
 
-# In-memory storage for simulation purposes
-class SimulationState:
-    def __init__(self, initial_liquidity=1200000):
-        self.btc_price = 40000
-        self.bid_price = 39950
-        self.ask_price = 40050
-        self.liquidity = initial_liquidity
-        self.options = []
-        self.hedge_positions = []
-        self.fee_rate = 0.0015  # 0.15%
-        self.fee_history = []
-        self.volatility = 0.7  # Annualized volatility
-        self.portfolio_delta = 0
-        self.portfolio_gamma = 0
-        self.portfolio_theta = 0
-        self.portfolio_vega = 0
-        self.exchanges = {
-            "binance": {"status": "active", "weight": 0.4, "hedge_delta": 0},
-            "coinbase": {"status": "active", "weight": 0.3, "hedge_delta": 0},
-            "kraken": {"status": "active", "weight": 0.2, "hedge_delta": 0},
-            "ftx": {"status": "backup", "weight": 0.1, "hedge_delta": 0}
-        }
-        self.competitor_fees = {
-            "binance": 0.0010,
-            "coinbase": 0.0020,
-            "dydx": 0.0010,
-            "uniswap": 0.0030,
-            "sushiswap": 0.0025
-        }
-        self.price_history = []
-        self.transactions = []
-        self.last_rebalance = datetime.datetime.now()
-        self.last_price_update = datetime.datetime.now()
-        
-        # Start price simulation thread
-        self.should_run = True
-        self.simulation_thread = threading.Thread(target=self.run_simulation)
-        self.simulation_thread.daemon = True
-        self.simulation_thread.start()
+def parse_option_request(data, default_strike):
+    """Validate an option request body, raising ValueError on bad input"""
+    option_type = data.get('type', 'call')
+    if option_type not in ('call', 'put'):
+        raise ValueError(f"unknown option type '{option_type}'")
     
-    def run_simulation(self):
-        """Simulate real-time price and platform behavior"""
-        while self.should_run:
-            # Update BTC price (small random walk with occasional jumps)
-            price_change = np.random.normal(0, self.btc_price * 0.0005)
-            
-            # Add occasional price jumps (5% chance)
-            if random.random() < 0.05:
-                jump_size = np.random.normal(0, self.btc_price * 0.002)
-                price_change += jump_size
-            
-            self.btc_price += price_change
-            
-            # Update bid-ask spread (wider during volatile periods)
-            spread_factor = 1 + abs(price_change / self.btc_price) * 10
-            spread = max(50, self.btc_price * 0.0005 * spread_factor)
-            self.bid_price = self.btc_price - spread/2
-            self.ask_price = self.btc_price + spread/2
-            
-            # Record price history
-            self.price_history.append({
-                'price': self.btc_price,
-                'bid': self.bid_price,
-                'ask': self.ask_price,
-                'timestamp': datetime.datetime.now().isoformat()
-            })
-            
-            # Limit history size
-            if len(self.price_history) > 1000:
-                self.price_history.pop(0)
-            
-            # Process option expirations
-            self.process_expirations()
-            
-            # Update Greeks and hedge if needed
-            self.update_portfolio_metrics()
-            
-            if (datetime.datetime.now() - self.last_rebalance).total_seconds() > 10:
-                self.rebalance_hedges()
-                self.last_rebalance = datetime.datetime.now()
-            
-            # Dynamically adjust fees (less frequently)
-            if random.random() < 0.05:
-                self.adjust_fees()
-            
-            # Occasionally simulate exchange issues (0.2% chance per cycle)
-            if random.random() < 0.002:
-                self.simulate_exchange_issue()
-            
-            self.last_price_update = datetime.datetime.now()
-            
-            # Short sleep to prevent CPU overuse
-            time.sleep(0.5)
+    strike = float(data.get('strike', default_strike))
+    expiry = float(data.get('expiry', 120))
+    quantity = float(data.get('quantity', 1))
+    # NaN and inf would get through the positivity check below
+    if not (math.isfinite(strike) and math.isfinite(expiry) and math.isfinite(quantity)):
+        raise ValueError("strike, expiry and quantity must be finite numbers")
+    expiry = int(expiry)
+    if strike <= 0 or expiry <= 0 or quantity <= 0:
+        raise ValueError("strike, expiry and quantity must be positive")
     
-    def create_option(self, option_type, strike_price, expiry_seconds, quantity):
-        """Create a new option contract"""
-        current_time = datetime.datetime.now()
-        expiry_time = current_time + timedelta(seconds=expiry_seconds)
-        
-        # Calculate option price
-        time_to_expiry_years = expiry_seconds / (365 * 24 * 60 * 60)
-        option_price = self.calculate_option_price(
-            option_type, self.btc_price, strike_price, time_to_expiry_years
-        )
-        
-        # Calculate greeks
-        greeks = self.calculate_greeks(
-            option_type, self.btc_price, strike_price, time_to_expiry_years
-        )
-        
-        # Apply fee
-        premium = option_price * (1 + self.fee_rate)
-        fee_amount = option_price * self.fee_rate
-        
-        option = {
-            'id': str(uuid.uuid4())[:8],
-            'type': option_type,
-            'strike': strike_price,
-            'quantity': quantity,
-            'premium': premium,
-            'fee_amount': fee_amount,
-            'creation_time': current_time.isoformat(),
-            'expiry_time': expiry_time.isoformat(),
-            'status': 'active',
-            'entry_price': self.btc_price,
-            'greeks': {
-                'delta': greeks['delta'] * quantity,
-                'gamma': greeks['gamma'] * quantity,
-                'theta': greeks['theta'] * quantity,
-                'vega': greeks['vega'] * quantity
-            }
-        }
-        
-        self.options.append(option)
-        
-        # Update liquidity
-        self.liquidity += premium * quantity
-        
-        # Log transaction
-        self.transactions.append({
-            'type': 'create',
-            'option_id': option['id'],
-            'timestamp': current_time.isoformat(),
-            'details': f"{option_type} option, strike ${strike_price}, premium ${premium:.2f}"
-        })
-        
-        # Update portfolio metrics after new option
-        self.update_portfolio_metrics()
-        
-        # Trigger hedge rebalance
-        self.rebalance_hedges()
-        
-        return option
-    
-    def process_expirations(self):
-        """Process expired options"""
-        current_time = datetime.datetime.now()
-        
-        for option in self.options:
-            if option['status'] != 'active':
-                continue
-                
-            expiry_time = datetime.datetime.fromisoformat(option['expiry_time'])
-            
-            if current_time >= expiry_time:
-                # Check if ITM
-                if option['type'] == 'call':
-                    is_itm = self.btc_price > option['strike']
-                else:  # put
-                    is_itm = self.btc_price < option['strike']
-                
-                if is_itm:
-                    # Calculate payoff
-                    if option['type'] == 'call':
-                        payoff = max(0, self.btc_price - option['strike']) * option['quantity']
-                    else:  # put
-                        payoff = max(0, option['strike'] - self.btc_price) * option['quantity']
-                    
-                    option['status'] = 'exercised'
-                    option['settlement_price'] = self.btc_price
-                    option['payoff'] = payoff
-                    
-                    # Update liquidity
-                    self.liquidity -= payoff
-                    
-                    # Log transaction
-                    self.transactions.append({
-                        'type': 'exercise',
-                        'option_id': option['id'],
-                        'timestamp': current_time.isoformat(),
-                        'details': f"Exercise {option['type']} option, payoff ${payoff:.2f}"
-                    })
-                else:
-                    option['status'] = 'expired'
-                    option['settlement_price'] = self.btc_price
-                    option['payoff'] = 0
-                    
-                    # Log transaction
-                    self.transactions.append({
-                        'type': 'expire',
-                        'option_id': option['id'],
-                        'timestamp': current_time.isoformat(),
-                        'details': f"Option expired worthless"
-                    })
-    
-    def calculate_option_price(self, option_type, S, K, T):
-        """Simple Black-Scholes calculation"""
-        import math
-        from scipy.stats import norm
-        
-        r = 0.03  # Risk-free rate
-        sigma = self.volatility
-        
-        if T <= 0:
-            # At expiry
-            if option_type == 'call':
-                return max(0, S - K)
-            else:  # put
-                return max(0, K - S)
-        
-        d1 = (math.log(S/K) + (r + 0.5 * sigma**2) * T) / (sigma * math.sqrt(T))
-        d2 = d1 - sigma * math.sqrt(T)
-        
-        if option_type == 'call':
-            return S * norm.cdf(d1) - K * math.exp(-r * T) * norm.cdf(d2)
-        else:  # put
-            return K * math.exp(-r * T) * norm.cdf(-d2) - S * norm.cdf(-d1)
-    
-    def calculate_greeks(self, option_type, S, K, T):
-        """Calculate option Greeks"""
-        import math
-        from scipy.stats import norm
-        
-        r = 0.03  # Risk-free rate
-        sigma = self.volatility
-        
-        if T <= 0:
-            # At expiry
-            if option_type == 'call':
-                delta = 1.0 if S > K else 0.0
-            else:  # put
-                delta = -1.0 if S < K else 0.0
-            return {'delta': delta, 'gamma': 0.0, 'theta': 0.0, 'vega': 0.0}
-        
-        d1 = (math.log(S/K) + (r + 0.5 * sigma**2) * T) / (sigma * math.sqrt(T))
-        d2 = d1 - sigma * math.sqrt(T)
-        
-        # Calculate normal distribution values
-        norm_d1 = norm.cdf(d1)
-        norm_prime_d1 = norm.pdf(d1)
-        
-        # Delta
-        if option_type == 'call':
-            delta = norm_d1
-        else:  # put
-            delta = norm_d1 - 1
-        
-        # Gamma (same for calls and puts)
-        gamma = norm_prime_d1 / (S * sigma * math.sqrt(T))
-        
-        # Theta
-        if option_type == 'call':
-            theta = -S * norm_prime_d1 * sigma / (2 * math.sqrt(T)) - r * K * math.exp(-r * T) * norm.cdf(d2)
-        else:  # put
-            theta = -S * norm_prime_d1 * sigma / (2 * math.sqrt(T)) + r * K * math.exp(-r * T) * norm.cdf(-d2)
-        
-        # Vega (same for calls and puts)
-        vega = S * math.sqrt(T) * norm_prime_d1
-        
-        return {'delta': delta, 'gamma': gamma, 'theta': theta, 'vega': vega}
-    
-    def update_portfolio_metrics(self):
-        """Update portfolio-wide Greeks"""
-        portfolio_greeks = {'delta': 0, 'gamma': 0, 'theta': 0, 'vega': 0}
-        
-        # Loop through active options
-        for option in self.options:
-            if option['status'] != 'active':
-                continue
-                
-            # Calculate time to expiry
-            expiry_time = datetime.datetime.fromisoformat(option['expiry_time'])
-            current_time = datetime.datetime.now()
-            
-            if current_time >= expiry_time:
-                continue  # Skip expired options
-                
-            seconds_to_expiry = (expiry_time - current_time).total_seconds()
-            time_to_expiry = seconds_to_expiry / (365 * 24 * 60 * 60)  # Convert to years
-            
-            # Recalculate Greeks with current price and time
-            greeks = self.calculate_greeks(
-                option['type'], self.btc_price, option['strike'], time_to_expiry
-            )
-            
-            # Update option Greeks
-            option['greeks'] = {
-                'delta': greeks['delta'] * option['quantity'],
-                'gamma': greeks['gamma'] * option['quantity'],
-                'theta': greeks['theta'] * option['quantity'],
-                'vega': greeks['vega'] * option['quantity']
-            }
-            
-            # Sum for portfolio metrics
-            for greek in portfolio_greeks:
-                portfolio_greeks[greek] += option['greeks'][greek]
-        
-        # Update portfolio metrics
-        self.portfolio_delta = portfolio_greeks['delta']
-        self.portfolio_gamma = portfolio_greeks['gamma']
-        self.portfolio_theta = portfolio_greeks['theta']
-        self.portfolio_vega = portfolio_greeks['vega']
-    
-    def rebalance_hedges(self):
-        """Rebalance hedges across exchanges"""
-        # Calculate current hedge delta
-        current_hedge_delta = sum(exch['hedge_delta'] for name, exch in self.exchanges.items() if exch['status'] == 'active')
-        
-        # Calculate needed adjustment
-        net_delta = self.portfolio_delta + current_hedge_delta
-        
-        # Only rebalance if net delta exceeds threshold
-        if abs(net_delta) < 0.05:
-            return
-        
-        # Calculate required hedge adjustment
-        adjustment_needed = -net_delta
-        
-        # Distribute adjustment across active exchanges
-        active_exchanges = [name for name, exch in self.exchanges.items() if exch['status'] == 'active']
-        if not active_exchanges:
-            return
-        
-        total_weight = sum(self.exchanges[name]['weight'] for name in active_exchanges)
-        
-        for name in active_exchanges:
-            exchange = self.exchanges[name]
-            normalized_weight = exchange['weight'] / total_weight
-            exchange_adjustment = adjustment_needed * normalized_weight
-            
-            # Add new hedge position
-            hedge_price = self.btc_price * (1 + np.random.normal(0, 0.0005))  # Slight price variation
-            
-            self.hedge_positions.append({
-                'exchange': name,
-                'amount': exchange_adjustment,
-                'price': hedge_price,
-                'timestamp': datetime.datetime.now().isoformat()
-            })
-            
-            # Update exchange hedge delta
-            exchange['hedge_delta'] += exchange_adjustment
-        
-        # Log transaction
-        self.transactions.append({
-            'type': 'hedge',
-            'timestamp': datetime.datetime.now().isoformat(),
-            'details': f"Rebalanced hedges across {len(active_exchanges)} exchanges, net adjustment: {adjustment_needed:.4f}"
-        })
-    
-    def adjust_fees(self):
-        """Dynamically adjust fee rate based on competitive positioning"""
-        # Calculate average competitor fee
-        avg_competitor_fee = sum(self.competitor_fees.values()) / len(self.competitor_fees)
-        
-        # Add small random changes to competitor fees
-        for platform in self.competitor_fees:
-            adjustment = np.random.normal(0, 0.0001)
-            self.competitor_fees[platform] = max(0.0001, min(0.005, self.competitor_fees[platform] + adjustment))
-        
-        # Calculate volatility factor from recent price history
-        if len(self.price_history) > 10:
-            recent_prices = [p['price'] for p in self.price_history[-30:]]
-            returns = np.diff(recent_prices) / recent_prices[:-1]
-            recent_volatility = np.std(returns) * np.sqrt(365 * 24)  # Annualized
-            volatility_factor = 1.0 + (recent_volatility - 0.7) * 0.5
-            volatility_factor = max(0.8, min(1.5, volatility_factor))
-        else:
-            volatility_factor = 1.0
-        
-        # Adjust fee based on competitive positioning and volatility
-        target_fee = avg_competitor_fee * 0.95 * volatility_factor
-        
-        # Smooth fee changes
-        fee_change = (target_fee - self.fee_rate) * 0.3
-        new_fee = self.fee_rate + fee_change
-        
-        # Apply constraints
-        new_fee = max(0.0005, min(0.003, new_fee))
-        
-        # Record fee change
-        self.fee_history.append({
-            'timestamp': datetime.datetime.now().isoformat(),
-            'fee_rate': new_fee,
-            'avg_competitor_fee': avg_competitor_fee,
-            'volatility_factor': volatility_factor
-        })
-        
-        # Update fee rate
-        self.fee_rate = new_fee
-    
-    def simulate_exchange_issue(self):
-        """Occasionally simulate an exchange failure to test fallback system"""
-        active_exchanges = [name for name, exch in self.exchanges.items() if exch['status'] == 'active']
-        
-        if len(active_exchanges) <= 1:
-            return  # Don't fail if only one exchange is left
-        
-        # Randomly select an exchange to fail
-        failed_exchange = random.choice(active_exchanges)
-        self.exchanges[failed_exchange]['status'] = 'failed'
-        
-        # Find backup to activate
-        for name, exchange in self.exchanges.items():
-            if exchange['status'] == 'backup':
-                exchange['status'] = 'active'
-                
-                # Transfer hedge delta from failed exchange
-                exchange['hedge_delta'] = self.exchanges[failed_exchange]['hedge_delta']
-                self.exchanges[failed_exchange]['hedge_delta'] = 0
-                
-                # Log event
-                self.transactions.append({
-                    'type': 'exchange_fallback',
-                    'timestamp': datetime.datetime.now().isoformat(),
-                    'details': f"Exchange {failed_exchange} failed. Activated {name} as fallback."
-                })
-                break
+    return {'type': option_type, 'strike': strike, 'expiry': expiry, 'quantity': quantity}
+
+# Initialize simulation state, recording ticks to disk when a directory is configured
+tick_record_dir = os.getenv('TICK_RECORD_DIR')
+simulation = SimulationState(
+    recorder=TickRecorder(tick_record_dir) if tick_record_dir else None,
+    price_model=os.getenv('PRICE_MODEL', 'walk'),
+    hedge_window=float(os.getenv('HEDGE_WINDOW', '2.0')),
+    hedge_limit=float(os.getenv('HEDGE_LIMIT', '1.0')),
+    hedge_policy=os.getenv('HEDGE_POLICY', 'fixed')
+)
+
+# Admission control: per-client and global token buckets, with order
+# creation shed while the tick loop is running late
+admission = AdmissionController(lag_source=simulation.current_tick_lag, max_tick_lag=0.25)
 
-# Initialize simulation state
-simulation = SimulationState()
+# Lovable sync runs on a bus consumer thread, so order requests never wait on it
+simulation.bus.attach(
+    'lovable-sync',
+    lambda event: sync_with_lovable(event['data']['payload'], token=event['data']['token']),
+    topics=['sync'],
+    maxlen=1000,
+    policy='drop_oldest'
+)
+
+sse_client_ids = itertools.count(1)
+
+def publish_sync(payload):
+    """Queue a Lovable sync on behalf of the current user"""
+    simulation.bus.publish('sync', {'payload': payload, 'token': session.get('lovable_token')})
+
+# Retried order submissions carrying the same Idempotency-Key replay the
+# original result instead of creating a second option
+idempotency = IdempotencyCache(max_entries=10000, ttl=600)
+
+def batch_cost(req):
+    """Batch orders consume one order token per item"""
+    data = req.get_json(silent=True) or {}
+    items = data.get('options') if isinstance(data, dict) else data
+    return max(1, len(items)) if isinstance(items, list) else 1
 
 # API Routes
 @app.route('/lovable/login')
@@ -480,7 +106,7 @@ def get_price():
         'price': simulation.btc_price,
         'bid': simulation.bid_price,
         'ask': simulation.ask_price,
-        'timestamp': datetime.datetime.now().isoformat(),
+        'timestamp': simulation.clock.now().isoformat(),
         'last_update': simulation.last_price_update.isoformat()
     }
     return jsonify(price_data)
@@ -488,10 +114,30 @@ def get_price():
 @app.route('/api/price_history', methods=['GET'])
 @lovable_auth_required
 def get_price_history():
-    """Get historical price data"""
-    # Limit to 100 most recent points for performance
-    history = simulation.price_history[-100:]
-    return jsonify(history)
+    """Get historical price data
+    
+    resolution: 'tick' (default, raw ticks) or a bar resolution (1s, 10s, 1m, 5m)
+    since: epoch seconds; ticks after it, or bars starting at or after it
+    limit: maximum number of points (default 100 ticks or 300 bars)
+    """
+    resolution = request.args.get('resolution', 'tick')
+    try:
+        since = float(request.args['since']) if 'since' in request.args else None
+        limit = int(request.args['limit']) if 'limit' in request.args else None
+    except ValueError:
+        return jsonify({'error': 'since must be epoch seconds and limit an integer'}), 400
+    if limit is not None and limit <= 0:
+        return jsonify({'error': 'limit must be positive'}), 400
+    
+    if resolution == 'tick':
+        return jsonify(simulation.tick_store.to_records(limit or 100, since))
+    
+    if resolution not in simulation.bars.resolutions():
+        return jsonify({
+            'error': f"Unknown resolution '{resolution}'",
+            'resolutions': ['tick'] + simulation.bars.resolutions()
+        }), 400
+    return jsonify(simulation.bars.to_records(resolution, limit or 300, since))
 
 @app.route('/api/status', methods=['GET'])
 @lovable_auth_required
@@ -511,22 +157,65 @@ def get_status():
         'active_options': active_options,
         'total_options': len(simulation.options),
         'fee_rate': simulation.fee_rate,
+        'volatility': dict(simulation.realized_vol.get_stats(), surface=simulation.vol_surface.get_stats(),
+                           garch=simulation.garch.get_stats()),
         'hedging': {
             'exchanges': simulation.exchanges,
-            'hedge_positions': len(simulation.hedge_positions)
+            'hedge_positions': simulation.positions.fill_count,
+            'positions': simulation.positions.to_dict(simulation.btc_price),
+            'pnl': simulation.hedge_marker.to_dict(),
+            'routing': simulation.router.get_stats(),
+            'health': simulation.venue_health.get_stats(),
+            'netting': simulation.hedge_netter.get_stats(),
+            'policy': simulation.hedge_policy.get_stats()
         },
-        'last_rebalance': simulation.last_rebalance.isoformat()
+        'last_rebalance': simulation.last_rebalance.isoformat(),
+        'tick_lag': simulation.current_tick_lag(),
+        'admission': admission.get_stats(),
+        'idempotency': idempotency.get_stats(),
+        'event_bus': simulation.bus.get_stats()
     }
     return jsonify(status)
 
+@app.route('/api/vol_surface', methods=['GET'])
+@lovable_auth_required
+@admission.limit('reads')
+def get_vol_surface():
+    """Current volatility surface (expiries in seconds, standardized moneyness)"""
+    return jsonify(simulation.vol_surface.to_dict())
+
+@app.route('/api/hedge_pnl', methods=['GET'])
+@lovable_auth_required
+@admission.limit('reads')
+def get_hedge_pnl():
+    """Hedge PnL series (realized, unrealized, funding, total), one point per tick
+    
+    since: epoch seconds; points after it
+    limit: maximum number of points (default 300)
+    """
+    try:
+        since = float(request.args['since']) if 'since' in request.args else None
+        limit = int(request.args.get('limit', 300))
+    except ValueError:
+        return jsonify({'error': 'since must be epoch seconds and limit an integer'}), 400
+    if limit <= 0:
+        return jsonify({'error': 'limit must be positive'}), 400
+    
+    with simulation.lock:
+        records = simulation.hedge_marker.series.to_records(limit, since)
+    return jsonify(records)
+
 @app.route('/api/options', methods=['GET'])
 @lovable_auth_required
+@admission.limit('reads')
 def get_options():
     """Get list of all options"""
     return jsonify(simulation.options)
 
 @app.route('/api/options', methods=['POST'])
 @lovable_auth_required
+@idempotency.idempotent
+@admission.limit('orders', shed=True)
 def create_option():
     """Create a new option"""
     data = request.json
@@ -539,16 +228,60 @@ def create_option():
     )
     
     # After creating the option, sync with Lovable
-    sync_data = {
+    publish_sync({
         'type': 'option_created',
         'option': option,
-        'timestamp': datetime.datetime.now().isoformat()
-    }
-    sync_with_lovable(sync_data)
+        'timestamp': simulation.clock.now().isoformat()
+    })
     return jsonify(option)
 
+@app.route('/api/options/batch', methods=['POST'])
+@lovable_auth_required
+@idempotency.idempotent
+@admission.limit('orders', cost=batch_cost, shed=True)
+def create_options_batch():
+    """Create a batch of options atomically (all or nothing)"""
+    data = request.json or {}
+    items = data.get('options') if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'Expected a non-empty list of option requests'}), 400
+    
+    # Validate everything up front so a bad item rejects the whole batch
+    orders = []
+    results = []
+    default_strike = simulation.btc_price
+    for index, item in enumerate(items):
+        try:
+            orders.append(parse_option_request(item, default_strike))
+            results.append({'index': index, 'status': 'not_applied'})
+        except (TypeError, ValueError, AttributeError) as e:
+            results.append({'index': index, 'status': 'rejected', 'error': str(e)})
+    
+    if len(orders) != len(items):
+        return jsonify({'error': 'Batch rejected, no options were created', 'results': results}), 400
+    
+    state_version, options = simulation.create_options_batch(orders)
+    
+    publish_sync({
+        'type': 'options_batch_created',
+        'option_ids': [option['id'] for option in options],
+        'state_version': state_version,
+        'timestamp': simulation.clock.now().isoformat()
+    })
+    
+    def generate():
+        # Stream one result at a time instead of serializing the whole batch at once
+        yield f'{{"state_version": {state_version}, "count": {len(options)}, "results": ['
+        for index, option in enumerate(options):
+            prefix = ', ' if index else ''
+            yield prefix + json.dumps({'index': index, 'status': 'created', 'option': option})
+        yield ']}'
+    
+    return Response(generate(), mimetype='application/json')
+
 @app.route('/api/metrics', methods=['GET'])
 @lovable_auth_required
+@admission.limit('reads')
 def get_metrics():
     """Get detailed platform metrics including hedging and fees"""
     # Calculate hedge delta by exchange
@@ -575,7 +308,9 @@ def get_metrics():
         'hedging': {
             'exchanges': simulation.exchanges,
             'by_exchange': hedge_by_exchange,
-            'recent_positions': simulation.hedge_positions[-10:]  # Last 10 hedge positions
+            'positions': simulation.positions.to_dict(simulation.btc_price),
+            'recent_positions': simulation.positions.recent_fills(10),  # Last 10 hedge fills
+            'books': {name: book.to_dict(5) for name, book in simulation.exchange_books.books.items()}
         },
         'transactions': simulation.transactions[-20:]  # Last 20 transactions
     }
@@ -586,27 +321,32 @@ def get_metrics():
 @lovable_auth_required
 def get_events():
     """Server-sent events for real-time updates"""
+    # Transactions, fee changes and exchange events are queued (oldest dropped
+    # if this client falls 1000 behind); prices are conflated to the latest
+    client = f"sse-{next(sse_client_ids)}"
+    events = simulation.bus.subscribe(client, topics=['transaction', 'fee', 'exchange'], maxlen=1000)
+    prices = simulation.bus.subscribe(client + '-price', topics=['price'], policy='conflate')
+    
+    def format_event(event):
+        return f"data: {json.dumps({'type': event['topic'], 'seq': event['seq'], 'data': event['data']})}\n\n"
+    
     def generate():
-        last_transaction_count = len(simulation.transactions)
-        
-        while True:
-            # Check for new transactions
-            current_count = len(simulation.transactions)
-            if current_count > last_transaction_count:
-                new_transactions = simulation.transactions[last_transaction_count:current_count]
-                for tx in new_transactions:
-                    yield f"data: {json.dumps({'type': 'transaction', 'data': tx})}\n\n"
-                last_transaction_count = current_count
-            
-            # Send price update every 2 seconds
-            price_data = {
-                'price': simulation.btc_price,
-                'bid': simulation.bid_price,
-                'ask': simulation.ask_price
-            }
-            yield f"data: {json.dumps({'type': 'price', 'data': price_data})}\n\n"
-            
-            time.sleep(2)
+        try:
+            next_price = time.monotonic()
+            while True:
+                event = events.get(timeout=max(0.0, next_price - time.monotonic()))
+                if event is not None:
+                    yield format_event(event)
+                
+                # Send the latest price every 2 seconds
+                if time.monotonic() >= next_price:
+                    for price in prices.drain():
+                        yield format_event(price)
+                    next_price = time.monotonic() + 2
+        finally:
+            # Client disconnected
+            simulation.bus.unsubscribe(events)
+            simulation.bus.unsubscribe(prices)
     
     return Response(generate(), mimetype='text/event-stream')
 
@@ -0,0 +1,135 @@
+# bar_store.py
+import datetime
+import numpy as np
+
+# Bar resolutions (seconds) and how many bars each keeps: 1h, 6h, 24h and 7 days
+RESOLUTIONS = {
+    '1s': (1, 3600),
+    '10s': (10, 2160),
+    '1m': (60, 1440),
+    '5m': (300, 2016),
+}
+
+class BarSeries:
+    """OHLC bars at one resolution in a fixed-size ring of float64 columns
+
+    Like TickStore, every closed bar is written at slot i and i + capacity so
+    the latest n bars are one contiguous slice. The open bar is a plain list,
+    replaced by an updated copy on each tick (never changed in place, so a
+    concurrent snapshot sees a whole bar) and only written to the ring when
+    the next bucket starts. Buckets with no ticks produce
+    no bar. Listeners are called with each bar (a list in column order) as
+    it closes.
+    """
+
+    TIME, OPEN, HIGH, LOW, CLOSE, TICKS, SPREAD_SUM, SPREAD_MIN, SPREAD_MAX = range(9)
+
+    def __init__(self, seconds, capacity):
+        self.seconds = seconds
+        self.capacity = capacity
+        self.data = np.zeros((9, 2 * capacity), dtype=np.float64)
+        self.count = 0          # closed bars ever written
+        self.version = 0        # odd while a bar is being closed, for consistent snapshots
+        self.bucket = None      # start time of the open bar
+        self.bar = None         # open bar values, in column order
+        self.listeners = []
+
+    def __len__(self):
+        return min(self.count, self.capacity - 1) + (self.bar is not None)
+
+    def update(self, price, spread, timestamp):
+        bucket = timestamp - timestamp % self.seconds
+        bar = self.bar
+        if bucket == self.bucket:
+            start, open_, high, low, _, ticks, spread_sum, spread_min, spread_max = bar
+            # Published with one assignment: readers get the previous bar or this one
+            self.bar = [
+                start, open_,
+                price if price > high else high,
+                price if price < low else low,
+                price,
+                ticks + 1,
+                spread_sum + spread,
+                spread if spread < spread_min else spread_min,
+                spread if spread > spread_max else spread_max,
+            ]
+        elif self.bucket is None or bucket > self.bucket:
+            self.version += 1
+            if bar is not None:
+                slot = self.count % self.capacity
+                self.data[:, slot] = bar
+                self.data[:, slot + self.capacity] = bar
+                self.count += 1
+            self.bar = [bucket, price, price, price, price, 1, spread, spread, spread]
+            self.bucket = bucket
+            self.version += 1
+            if bar is not None:
+                for listener in self.listeners:
+                    listener(bar)
+        # Ticks older than the open bar are ignored (clock stepped backwards)
+
+    def snapshot(self, n=None):
+        """Consistent copy of the last n bars (the open bar last), shape (9, n)"""
+        while True:
+            version = self.version
+            count = self.count
+            bar = self.bar
+            closed = min(len(self) if n is None else n, len(self))
+            if bar is not None:
+                closed -= 1
+            end = count % self.capacity + self.capacity
+            data = self.data[:, end - closed:end]
+            if bar is not None:
+                data = np.column_stack((data, list(bar)))
+            else:
+                data = data.copy()
+            # Retry if a bar was closed while copying
+            if version % 2 == 0 and version == self.version:
+                return data
+
+    def to_records(self, n=None, since=None):
+        """Bars as API dicts; since (epoch seconds) keeps bars starting at or after it,
+        so a poller re-receives the bar that is still open"""
+        data = self.snapshot(n)
+        if since is not None:
+            data = data[:, np.searchsorted(data[self.TIME], since, side='left'):]
+        return [
+            {
+                'time': start,
+                'timestamp': datetime.datetime.fromtimestamp(start, tz=datetime.timezone.utc).isoformat(),
+                'open': open_,
+                'high': high,
+                'low': low,
+                'close': close,
+                'ticks': int(ticks),
+                'spread_avg': spread_sum / ticks,
+                'spread_min': spread_min,
+                'spread_max': spread_max,
+            }
+            for start, open_, high, low, close, ticks, spread_sum, spread_min, spread_max in zip(*data.tolist())
+        ]
+
+class BarStore:
+    """Incremental OHLC + spread bars at several resolutions, fed tick by tick"""
+
+    def __init__(self, resolutions=None):
+        self.series = {
+            name: BarSeries(seconds, capacity)
+            for name, (seconds, capacity) in (resolutions or RESOLUTIONS).items()
+        }
+
+    def update(self, price, bid, ask, timestamp):
+        spread = ask - bid
+        for series in self.series.values():
+            series.update(price, spread, timestamp)
+
+    def subscribe(self, resolution, callback):
+        """Call callback(bar) whenever a bar at this resolution closes"""
+        self.series[resolution].listeners.append(callback)
+    
+    def resolutions(self):
+        return list(self.series)
+
+    def to_records(self, resolution, n=None, since=None):
+        """Raises KeyError for an unknown resolution"""
+        return self.series[resolution].to_records(n, since)
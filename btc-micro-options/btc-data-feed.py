@@ -1,113 +1,155 @@
 # btc_data_feed.py
 import asyncio
-import websockets
-import json
 import datetime
 import time
 import random
 import threading
 import numpy as np
+from tick_store import TickStore
+from feed_connection import FeedConnectionManager
+from feed_decoder import TickerDecoder
+from clock import SystemClock
+from conflation import TickConflator
+from price_paths import PathGenerator
 
 class BTCDataFeed:
-    def __init__(self, price_callback=None, demo_mode=True):
+    def __init__(self, price_callback=None, demo_mode=True, tick_store=None, recorder=None, clock=None, seed=None,
+                 conflate=False):
         self.ws_url = 'wss://ws-feed.pro.coinbase.com'
+        self.clock = clock or SystemClock()
+        self.random = random.Random(seed)
         self.current_data = {
             'price': 40000, 
             'bid': 39990, 
             'ask': 40010, 
-            'time': datetime.datetime.now().isoformat()
+            'time': self.clock.now().isoformat()
         }
-        self.price_history = []
-        self.max_history_length = 1000
+        # Shared with the engine when provided, so history is kept only once
+        self.tick_store = tick_store if tick_store is not None else TickStore(capacity=1000, clock=self.clock)
+        self.recorder = recorder  # optional TickRecorder keeping every tick on disk
         self.price_callback = price_callback
         self.demo_mode = demo_mode
         
+        # Conflating delivery: each subscriber gets the latest tick on its own
+        # thread, so a slow consumer never holds up the websocket reader
+        self.conflator = None
+        if conflate:
+            self.conflator = TickConflator()
+            if price_callback:
+                self.conflator.subscribe(price_callback, 'engine')
+        
+        # Drops non-ticker frames before parsing and writes tickers into the tick store
+        self.decoder = TickerDecoder(self.tick_store, clock=self.clock)
+        
+        # Subscribe to ticker channel for BTC-USD. Tickers are conflated by the exchange, so
+        # neither trade_id nor sequence is contiguous and there is no gap detection
+        self.connection = FeedConnectionManager(
+            'coinbase',
+            self.ws_url,
+            on_message=self.on_message,
+            decode=self.decoder.decode,
+            subscribe={
+                "type": "subscribe",
+                "channels": [{"name": "ticker", "product_ids": ["BTC-USD"]}]
+            },
+            clock=self.clock,
+            seed=self.random.getrandbits(64)
+        )
+        
     async def connect(self):
         """Connect to Coinbase Pro WebSocket feed"""
         if self.demo_mode:
             await self.run_demo_simulation()
             return
-            
-        async with websockets.connect(self.ws_url) as websocket:
-            # Subscribe to ticker channel for BTC-USD
-            subscribe_message = {
-                "type": "subscribe",
-                "channels": [{"name": "ticker", "product_ids": ["BTC-USD"]}]
-            }
-            await websocket.send(json.dumps(subscribe_message))
-            
-            while True:
-                try:
-                    response = await websocket.recv()
-                    data = json.loads(response)
-                    
-                    if data.get('type') == 'ticker':
-                        self.current_data = {
-                            'price': float(data.get('price', self.current_data['price'])),
-                            'bid': float(data.get('best_bid', self.current_data['bid'])),
-                            'ask': float(data.get('best_ask', self.current_data['ask'])),
-                            'time': data.get('time', datetime.datetime.now().isoformat()),
-                        }
-                        
-                        # Add to history and trim if needed
-                        self.price_history.append(self.current_data.copy())
-                        if len(self.price_history) > self.max_history_length:
-                            self.price_history.pop(0)
-                        
-                        # Call callback if provided
-                        if self.price_callback:
-                            self.price_callback(self.current_data)
-                        
-                except Exception as e:
-                    print(f"WebSocket error: {e}")
-                    await asyncio.sleep(5)
-                    break
+        
+        # Reconnects, heartbeats and gap detection are handled by the connection manager
+        await self.connection.run()
+    
+    def on_message(self, data):
+        """Handle one decoded ticker message"""
+        # Written straight into the tick store columns
+        tick = self.decoder.record(data)
+        if tick is None:
+            return
+        
+        price, bid, ask, timestamp = tick
+        if self.recorder is not None:
+            self.recorder.record(price, bid, ask, 'coinbase', int(timestamp * 1e9))
+        
+        self.current_data = {
+            'price': price,
+            'bid': bid,
+            'ask': ask,
+            'time': data.get('time') or datetime.datetime.fromtimestamp(timestamp, tz=datetime.timezone.utc).isoformat(),
+        }
+        
+        self.deliver(self.current_data)
+    
+    def deliver(self, data):
+        """Hand a tick to the callback (directly) or to the conflated subscribers"""
+        if self.conflator is not None:
+            self.conflator.publish(data)
+        elif self.price_callback:
+            self.price_callback(data)
+    
+    def subscribe(self, callback, name=None):
+        """Add a conflated subscriber (switches the feed to conflating delivery)"""
+        if self.conflator is None:
+            self.conflator = TickConflator()
+            if self.price_callback:
+                self.conflator.subscribe(self.price_callback, 'engine')
+        return self.conflator.subscribe(callback, name)
+    
+    def get_subscriber_stats(self):
+        """Per-subscriber delivery and conflation counts"""
+        return self.conflator.get_stats() if self.conflator is not None else {}
+    
+    def is_stale(self):
+        """True while the live feed has not delivered a fresh ticker (demo data is never stale)"""
+        return not self.demo_mode and self.connection.is_stale()
     
     async def run_demo_simulation(self):
         """Run a simulated price feed for demo purposes"""
-        price = 40000
-        volatility = 0.0004  # Per-second volatility
+        # Per-second volatility of 0.04% with 1% chance of a jump (jump diffusion),
+        # pre-generated in blocks; spread widens during volatile moves
+        paths = PathGenerator(
+            'walk', start_price=40000, seed=self.random.getrandbits(64), dt=0.5,
+            tick_sigma=0.0004, jump_prob=0.01, jump_sigma=0.005, min_spread=0.0
+        )
         
         while True:
-            # Generate realistic price movements
-            # Use jump diffusion model to simulate occasional large moves
-            if random.random() < 0.01:  # 1% chance of a jump
-                jump_size = random.normalvariate(0, price * 0.005)
-                price += jump_size
-                print(f"🚀 Price jump: ${jump_size:.2f}")
-            else:
-                # Regular price movement
-                price_change = random.normalvariate(0, price * volatility)
-                price += price_change
+            price, bid, ask, price_change, jumped = paths.next_tick()
+            if jumped:
+                print(f"🚀 Price jump: ${price_change:.2f}")
             
             # Ensure price stays realistic
-            price = max(10000, min(100000, price))
-            
-            # Calculate bid-ask spread (wider during volatile moves)
-            spread = price * 0.0005 * (1 + abs(price_change / price) * 10)
-            bid = price - spread / 2
-            ask = price + spread / 2
+            if not 10000 <= price <= 100000:
+                clamped = max(10000, min(100000, price))
+                bid += clamped - price
+                ask += clamped - price
+                price = clamped
+                paths.reset(price)
             
-            # Update current data
+            # Update current data (one clock read per tick)
+            now = self.clock.now()
+            timestamp = now.timestamp()
             self.current_data = {
                 'price': price,
                 'bid': bid,
                 'ask': ask,
-                'time': datetime.datetime.now().isoformat(),
+                'time': now.isoformat(),
                 'change': price_change
             }
             
-            # Add to history and trim if needed
-            self.price_history.append(self.current_data.copy())
-            if len(self.price_history) > self.max_history_length:
-                self.price_history.pop(0)
+            # Add to history (fixed-size ring, oldest ticks are overwritten)
+            self.tick_store.append(price, bid, ask, timestamp)
+            if self.recorder is not None:
+                self.recorder.record(price, bid, ask, 'simulation', int(timestamp * 1e9))
             
-            # Call callback if provided
-            if self.price_callback:
-                self.price_callback(self.current_data)
+            self.deliver(self.current_data)
             
             # Simulate websocket delay
-            await asyncio.sleep(0.5)
+            await self.clock.async_sleep(0.5)
     
     def run(self):
         """Run the websocket client in a loop"""
@@ -118,5 +160,7 @@ class BTCDataFeed:
             try:
                 loop.run_until_complete(self.connect())
             except Exception as e:
+                # The connection manager retries network errors itself; this only
+                # catches unexpected failures, which are retried after a jittered backoff
                 print(f"Connection error: {e}")
-                time.sleep(5)
+                self.clock.sleep(self.connection.backoff_delay())
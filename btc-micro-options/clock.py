@@ -0,0 +1,76 @@
+# clock.py
+import asyncio
+import datetime
+import heapq
+import itertools
+import time
+
+class SystemClock:
+    """Wall-clock time for live trading"""
+
+    def now(self):
+        return datetime.datetime.now(datetime.timezone.utc)
+
+    def time(self):
+        """Epoch seconds"""
+        return time.time()
+
+    def monotonic(self):
+        return time.monotonic()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+    async def async_sleep(self, seconds):
+        await asyncio.sleep(seconds)
+
+class SimulatedClock:
+    """Manually driven clock for replay and backtests
+
+    Time only moves when the driver calls advance()/set() or a component
+    sleeps, so a replay runs as fast as the CPU allows and is reproducible.
+    Concurrent async sleeps wake in time order and move the clock only to
+    each wake time, so tasks waiting side by side overlap instead of adding up.
+    """
+
+    def __init__(self, start=None):
+        # Default start is a fixed epoch so runs don't depend on when they were started
+        self._time = 1704067200.0 if start is None else float(start)  # 2024-01-01 00:00 UTC
+        self._sleepers = []     # heap of (wake time, sequence) for pending async sleeps
+        self._sequence = itertools.count()
+
+    def now(self):
+        # UTC like SystemClock, so timestamps and digests don't depend on the machine's time zone
+        return datetime.datetime.fromtimestamp(self._time, tz=datetime.timezone.utc)
+
+    def time(self):
+        return self._time
+
+    def monotonic(self):
+        return self._time
+
+    def advance(self, seconds):
+        self._time += seconds
+
+    def set(self, timestamp):
+        """Move to an absolute epoch time (never backwards)"""
+        self._time = max(self._time, float(timestamp))
+
+    def sleep(self, seconds):
+        self.advance(seconds)
+
+    async def async_sleep(self, seconds):
+        entry = (self._time + seconds, next(self._sequence))
+        heapq.heappush(self._sleepers, entry)
+        try:
+            # Let every other runnable task reach its own sleep, then wake in order
+            await asyncio.sleep(0)
+            while self._sleepers[0] is not entry:
+                await asyncio.sleep(0)
+        except BaseException:
+            # Cancelled (e.g. a deadline fired first): forget this sleeper
+            self._sleepers.remove(entry)
+            heapq.heapify(self._sleepers)
+            raise
+        heapq.heappop(self._sleepers)
+        self.set(entry[0])
@@ -0,0 +1,117 @@
+# conflation.py
+import threading
+import time
+
+class ConflatingSubscriber:
+    """Latest-value slot delivered to one callback on its own thread
+
+    offer() never blocks the publisher: it overwrites the slot and counts the
+    tick it replaced. When the callback is ready it receives the newest tick
+    with a 'coalesced' field giving how many ticks were merged into it.
+    """
+
+    def __init__(self, name, callback):
+        self.name = name
+        self.callback = callback
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+        self.slot = None
+        self.slot_count = 0         # ticks offered since the last delivery
+        self.slot_time = None       # when the newest tick was offered
+        self.is_running = True
+        self.stats = {
+            'offered': 0,
+            'delivered': 0,
+            'coalesced': 0,         # ticks replaced before delivery
+            'max_coalesced': 0,
+            'errors': 0,
+            'delivery_lag_ms': 0.0, # EWMA of offer -> callback start
+        }
+        self.thread = threading.Thread(target=self._run, name=f'conflate-{name}')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def offer(self, tick):
+        with self.lock:
+            self.stats['offered'] += 1
+            if self.slot is not None:
+                self.stats['coalesced'] += 1
+            self.slot = tick
+            self.slot_count += 1
+            self.slot_time = time.monotonic()
+        self.ready.set()
+
+    def _run(self):
+        while self.is_running:
+            self.ready.wait()
+            with self.lock:
+                self.ready.clear()
+                tick, count, offered_at = self.slot, self.slot_count, self.slot_time
+                self.slot = None
+                self.slot_count = 0
+            if tick is None:
+                continue
+
+            coalesced = count - 1
+            self.stats['max_coalesced'] = max(self.stats['max_coalesced'], coalesced)
+            lag_ms = (time.monotonic() - offered_at) * 1000
+            self.stats['delivery_lag_ms'] += 0.1 * (lag_ms - self.stats['delivery_lag_ms'])
+            try:
+                self.callback(dict(tick, coalesced=coalesced))
+            except Exception as e:
+                self.stats['errors'] += 1
+                print(f"Subscriber {self.name} failed: {e}")
+            self.stats['delivered'] += 1
+
+    def stop(self):
+        self.is_running = False
+        self.ready.set()
+
+    def get_stats(self):
+        with self.lock:
+            pending = self.slot_count
+        return dict(self.stats, pending=pending)
+
+class TickConflator:
+    """Fans ticks out to subscribers without ever blocking the feed reader
+
+    Subscribers may come and go from other threads while the feed publishes,
+    so the subscriber table is only changed under the lock and publish()
+    iterates over a snapshot of it.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = {}
+
+    def _snapshot(self):
+        with self.lock:
+            return list(self.subscribers.items())
+
+    def subscribe(self, callback, name=None):
+        with self.lock:
+            name = name or getattr(callback, '__name__', None) or f'subscriber-{len(self.subscribers)}'
+            base, suffix = name, len(self.subscribers)
+            while name in self.subscribers:
+                name = f'{base}-{suffix}'
+                suffix += 1
+            subscriber = ConflatingSubscriber(name, callback)
+            self.subscribers[name] = subscriber
+        return subscriber
+
+    def unsubscribe(self, name):
+        with self.lock:
+            subscriber = self.subscribers.pop(name, None)
+        if subscriber is not None:
+            subscriber.stop()
+
+    def publish(self, tick):
+        for _, subscriber in self._snapshot():
+            subscriber.offer(tick)
+
+    def get_stats(self):
+        return {name: subscriber.get_stats() for name, subscriber in self._snapshot()}
+
+    def stop(self):
+        for _, subscriber in self._snapshot():
+            subscriber.stop()
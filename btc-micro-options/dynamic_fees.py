@@ -3,9 +3,17 @@ import numpy as np
 import pandas as pd
 import time
 from datetime import datetime, timedelta
+from clock import SystemClock
+from realized_vol import RealizedVolatility
 
 class DynamicFeeAdjuster:
-    def __init__(self):
+    def __init__(self, clock=None, seed=None, realized_vol=None):
+        self.clock = clock or SystemClock()
+        self.rng = np.random.default_rng(seed)
+        
+        # Streaming volatility estimate, fed one tick at a time via on_tick()
+        self.realized_vol = realized_vol or RealizedVolatility()
+        
         # Base fee parameters
         self.base_fee_rate = 0.0015  # 0.15%
         self.min_fee_rate = 0.0005   # 0.05%
@@ -23,7 +31,8 @@ class DynamicFeeAdjuster:
         # Market condition tracking
         self.market_volatility = 0.0
         self.trading_volume = 0
-        self.last_update = datetime.now()
+        self.last_update = self.clock.now()
+        self.last_update_at = self.clock.monotonic()
         self.update_frequency = 60  # seconds
         
         # Fee adjustment history
@@ -36,20 +45,21 @@ class DynamicFeeAdjuster:
         # Here we simulate small random changes to represent market dynamics
         for platform in self.competitor_fees:
             # Simulate minor fee adjustments from competitors
-            adjustment = np.random.normal(0, 0.0001)
+            adjustment = self.rng.normal(0, 0.0001)
             new_fee = max(0.0001, min(0.005, self.competitor_fees[platform] + adjustment))
             self.competitor_fees[platform] = new_fee
             
         return self.competitor_fees
         
-    def calculate_volatility_factor(self, recent_prices):
+    def on_tick(self, price, timestamp):
+        """Feed one tick (epoch seconds) to the volatility estimator"""
+        self.realized_vol.update(price, timestamp)
+        
+    def calculate_volatility_factor(self, recent_volatility=None):
         """Calculate fee adjustment factor based on market volatility"""
-        if len(recent_prices) < 10:
-            return 1.0
-            
-        # Calculate recent volatility
-        returns = np.diff(recent_prices) / recent_prices[:-1]
-        recent_volatility = np.std(returns) * np.sqrt(365 * 24)  # Annualized
+        if recent_volatility is None:
+            # Annualized from actual tick spacing (the 0.7 default until enough ticks arrived)
+            recent_volatility = self.realized_vol.estimate()
         
         # Update stored volatility
         self.market_volatility = recent_volatility
@@ -86,19 +96,19 @@ class DynamicFeeAdjuster:
             
         return max(0.7, min(1.3, competitive_factor))
     
-    def update_fee_rate(self, recent_prices=None, recent_volume=0):
+    def update_fee_rate(self, recent_volume=0, recent_volatility=None):
         """Update fee rate based on all factors"""
-        now = datetime.now()
-        
         # Only update at specified frequency
-        if (now - self.last_update).total_seconds() < self.update_frequency:
+        monotonic_now = self.clock.monotonic()
+        if monotonic_now - self.last_update_at < self.update_frequency:
             return self.current_fee
+        now = self.clock.now()
             
         # Scan competitor fees
         self.scan_competitor_fees()
         
         # Calculate adjustment factors
-        volatility_factor = self.calculate_volatility_factor(recent_prices if recent_prices else [40000])
+        volatility_factor = self.calculate_volatility_factor(recent_volatility)
         volume_factor = self.calculate_volume_factor(recent_volume)
         competitive_factor = self.calculate_competitive_factor()
         
@@ -123,5 +133,6 @@ class DynamicFeeAdjuster:
         
         self.current_fee = new_fee
         self.last_update = now
+        self.last_update_at = monotonic_now
         
         return new_fee
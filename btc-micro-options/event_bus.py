@@ -0,0 +1,166 @@
+# event_bus.py
+import threading
+from collections import deque, OrderedDict
+from clock import SystemClock
+
+# Topics published by the engine
+TOPICS = ('price', 'transaction', 'option', 'fee', 'exchange')
+
+POLICIES = ('drop_oldest', 'conflate', 'block')
+
+class Subscription:
+    """Bounded queue of events for one consumer
+
+    Overflow policies:
+    - drop_oldest: a full queue discards its oldest event
+    - conflate: only the latest pending event per topic is kept
+    - block: the publisher waits up to block_timeout for space, then drops the oldest
+    Every event carries the bus sequence number, so a consumer can see gaps.
+    """
+
+    def __init__(self, name, topics=None, maxlen=1000, policy='drop_oldest', block_timeout=0.5):
+        if policy not in POLICIES:
+            raise ValueError(f"unknown overflow policy '{policy}'")
+        self.name = name
+        self.topics = set(topics) if topics is not None else None  # None: every topic
+        self.maxlen = maxlen
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.queue = OrderedDict() if policy == 'conflate' else deque()
+        self.condition = threading.Condition()
+        self.closed = False
+        self.last_seq = 0
+        self.stats = {
+            'published': 0,
+            'delivered': 0,
+            'dropped': 0,
+            'conflated': 0,
+            'blocked': 0,           # publishes that had to wait for space
+            'max_depth': 0,
+        }
+
+    def wants(self, topic):
+        return self.topics is None or topic in self.topics
+
+    def put(self, event):
+        with self.condition:
+            if self.closed:
+                return
+            self.stats['published'] += 1
+            if self.policy == 'conflate':
+                if event['topic'] in self.queue:
+                    self.stats['conflated'] += 1
+                    del self.queue[event['topic']]
+                self.queue[event['topic']] = event
+            else:
+                if len(self.queue) >= self.maxlen and self.policy == 'block':
+                    self.stats['blocked'] += 1
+                    self.condition.wait_for(lambda: len(self.queue) < self.maxlen or self.closed, self.block_timeout)
+                if len(self.queue) >= self.maxlen:
+                    self.queue.popleft()
+                    self.stats['dropped'] += 1
+                self.queue.append(event)
+            self.stats['max_depth'] = max(self.stats['max_depth'], len(self.queue))
+            self.condition.notify_all()
+
+    def _pop(self):
+        if self.policy == 'conflate':
+            return self.queue.popitem(last=False)[1]
+        return self.queue.popleft()
+
+    def get(self, timeout=None):
+        """Next event, or None on timeout or once closed"""
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.queue or self.closed, timeout):
+                return None
+            if not self.queue:
+                return None
+            event = self._pop()
+            self.last_seq = event['seq']
+            self.stats['delivered'] += 1
+            self.condition.notify_all()
+            return event
+
+    def drain(self):
+        """All pending events without waiting"""
+        with self.condition:
+            events = []
+            while self.queue:
+                events.append(self._pop())
+            if events:
+                self.last_seq = events[-1]['seq']
+                self.stats['delivered'] += len(events)
+                self.condition.notify_all()
+            return events
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def get_stats(self):
+        with self.condition:
+            depth = len(self.queue)
+        return dict(self.stats, policy=self.policy, depth=depth, last_seq=self.last_seq)
+
+class EventBus:
+    """In-process pub/sub: topic subscriptions, bounded queues, sequence numbers"""
+
+    def __init__(self, clock=None):
+        self.clock = clock or SystemClock()
+        self.lock = threading.Lock()
+        self.seq = 0
+        self.subscriptions = []
+
+    def subscribe(self, name, topics=None, maxlen=1000, policy='drop_oldest', block_timeout=0.5):
+        subscription = Subscription(name, topics, maxlen, policy, block_timeout)
+        with self.lock:
+            self.subscriptions = self.subscriptions + [subscription]
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscription.close()
+        with self.lock:
+            self.subscriptions = [s for s in self.subscriptions if s is not subscription]
+
+    def attach(self, name, callback, topics=None, **options):
+        """Run callback(event) for each event on a dedicated consumer thread"""
+        subscription = self.subscribe(name, topics, **options)
+
+        def consume():
+            while not subscription.closed:
+                event = subscription.get(timeout=1.0)
+                if event is None:
+                    continue
+                try:
+                    callback(event)
+                except Exception as e:
+                    print(f"Event consumer {name} failed: {e}")
+
+        thread = threading.Thread(target=consume, name=f'bus-{name}')
+        thread.daemon = True
+        thread.start()
+        return subscription
+
+    def publish(self, topic, data, timestamp=None):
+        """Stamp data with the next sequence number and fan it out to matching subscribers"""
+        with self.lock:
+            self.seq += 1
+            event = {
+                'seq': self.seq,
+                'topic': topic,
+                'time': timestamp if timestamp is not None else self.clock.time(),
+                'data': data,
+            }
+            # Delivered under the lock so every subscriber sees sequence order
+            # (a full 'block' subscriber therefore applies backpressure to all publishers)
+            for subscription in self.subscriptions:
+                if subscription.wants(topic):
+                    subscription.put(event)
+        return event
+
+    def get_stats(self):
+        return {
+            'seq': self.seq,
+            'subscribers': {s.name: s.get_stats() for s in self.subscriptions},
+        }
@@ -0,0 +1,146 @@
+# exchange_simulator.py
+import math
+import random
+from order_book import L2Book
+
+# Stand-in venue microstructure: price increment ($), half spread (increments)
+# and average size resting per level (BTC)
+VENUE_PROFILES = {
+    'binance': {'tick': 5.0, 'half_spread': 1, 'level_size': 2.5},
+    'coinbase': {'tick': 5.0, 'half_spread': 1, 'level_size': 1.5},
+    'kraken': {'tick': 5.0, 'half_spread': 2, 'level_size': 1.0},
+    'ftx': {'tick': 5.0, 'half_spread': 2, 'level_size': 0.75},
+}
+DEFAULT_PROFILE = {'tick': 5.0, 'half_spread': 2, 'level_size': 0.75}
+
+class ExchangeSimulator:
+    """Local stand-in for the venues' L2 feeds and matching engines
+
+    Each venue quotes `levels` price levels per side around the consolidated
+    price. on_price() moves every book incrementally, the way a venue's
+    diff feed would: only the levels entering or leaving the quoted range
+    are sent, plus `churn` random size changes per venue, and levels taken
+    out by executions refill. execute() takes liquidity from a venue's book
+    like a market order. start_incident() degrades a venue for a while:
+    condition() reports how slow and error-prone it is as time goes on.
+    """
+
+    def __init__(self, venues=None, levels=20, churn=2, seed=None):
+        self.profiles = {v: dict(VENUE_PROFILES.get(v, DEFAULT_PROFILE)) for v in (venues or VENUE_PROFILES)}
+        self.levels = levels
+        self.churn = churn
+        self.random = random.Random(seed)
+        self.books = {venue: L2Book(venue) for venue in self.profiles}
+        self.touch = {}         # venue -> (best bid, best ask) in price increments
+        self.depleted = set()   # venues with levels taken by executions, refilled on the next price
+        self.incidents = {}     # venue -> (monotonic start, ramp seconds, outage seconds)
+        self.stats = {
+            'prices': 0,
+            'executions': 0,
+            'incidents': 0,
+        }
+
+    def _size(self, venue):
+        return self.profiles[venue]['level_size'] * self.random.uniform(0.5, 1.5)
+
+    def _set(self, venue, side, index, size):
+        self.books[venue].update(side, index * self.profiles[venue]['tick'], size)
+
+    def _fill(self, venue, side, start, stop):
+        # Quote levels start..stop-1 (in price increments)
+        update = self.books[venue].update
+        profile = self.profiles[venue]
+        tick, size, uniform = profile['tick'], profile['level_size'], self.random.uniform
+        for index in range(start, stop):
+            update(side, index * tick, size * uniform(0.5, 1.5))
+
+    def on_price(self, price):
+        """Move every venue's book to the consolidated price"""
+        levels = self.levels
+        for venue, profile in self.profiles.items():
+            book = self.books[venue]
+            center = price / profile['tick']
+            bid = math.floor(center) - profile['half_spread'] + 1
+            ask = math.ceil(center) + profile['half_spread'] - 1
+            if ask <= bid:
+                ask = bid + 1
+            previous = self.touch.get(venue)
+            self.touch[venue] = (bid, ask)
+
+            if previous is None or abs(bid - previous[0]) >= levels or abs(ask - previous[1]) >= levels:
+                # First price or a jump past the quoted range: requote everything
+                for side in ('bid', 'ask'):
+                    for level in list(book.prices[side]):
+                        book.update(side, level, 0)
+                self._fill(venue, 'bid', bid - levels + 1, bid + 1)
+                self._fill(venue, 'ask', ask, ask + levels)
+                continue
+
+            old_bid, old_ask = previous
+            # Bids span bid - levels + 1 .. bid
+            if bid > old_bid:
+                for index in range(old_bid - levels + 1, bid - levels + 1):
+                    self._set(venue, 'bid', index, 0)
+                self._fill(venue, 'bid', old_bid + 1, bid + 1)
+            elif bid < old_bid:
+                for index in range(bid + 1, old_bid + 1):
+                    self._set(venue, 'bid', index, 0)
+                self._fill(venue, 'bid', bid - levels + 1, old_bid - levels + 1)
+            # Asks span ask .. ask + levels - 1
+            if ask < old_ask:
+                for index in range(ask + levels, old_ask + levels):
+                    self._set(venue, 'ask', index, 0)
+                self._fill(venue, 'ask', ask, old_ask)
+            elif ask > old_ask:
+                for index in range(old_ask, ask):
+                    self._set(venue, 'ask', index, 0)
+                self._fill(venue, 'ask', old_ask + levels, ask + levels)
+
+            if venue in self.depleted:
+                # Liquidity taken by our orders comes back
+                for side, start, stop in (('bid', bid - levels + 1, bid + 1), ('ask', ask, ask + levels)):
+                    resting = book.levels[side]
+                    for index in range(start, stop):
+                        if index * profile['tick'] not in resting:
+                            self._set(venue, side, index, self._size(venue))
+                self.depleted.discard(venue)
+
+            # Other participants adding and cancelling
+            for _ in range(self.churn):
+                depth = self.random.randrange(levels)
+                if self.random.random() < 0.5:
+                    self._set(venue, 'bid', bid - depth, self._size(venue))
+                else:
+                    self._set(venue, 'ask', ask + depth, self._size(venue))
+        self.stats['prices'] += 1
+
+    def execute(self, venue, amount):
+        """Market order for `amount` BTC (negative sells): (filled, average price)"""
+        side = 'ask' if amount > 0 else 'bid'
+        filled, price = self.books[venue].walk(side, abs(amount))
+        if filled:
+            self.depleted.add(venue)
+        self.stats['executions'] += 1
+        return math.copysign(filled, amount), price
+
+    def start_incident(self, venue, monotonic_now, ramp=60.0, outage=120.0):
+        """Degrade a venue: latency and errors build up over `ramp` seconds, then it is down for `outage`"""
+        if venue in self.incidents:
+            return
+        self.incidents[venue] = (monotonic_now, ramp, outage)
+        self.stats['incidents'] += 1
+
+    def condition(self, venue, monotonic_now):
+        """(latency multiplier, error probability) of a venue; 1 and 0 when it is well"""
+        incident = self.incidents.get(venue)
+        if incident is None:
+            return 1.0, 0.0
+        started, ramp, outage = incident
+        elapsed = monotonic_now - started
+        if elapsed < ramp:
+            progress = elapsed / ramp
+            return 1.0 + 9.0 * progress, 0.5 * progress
+        if elapsed < ramp + outage:
+            return 10.0, 1.0
+        del self.incidents[venue]
+        return 1.0, 0.0
@@ -0,0 +1,188 @@
+# feed_connection.py
+import asyncio
+import json
+import random
+from collections import deque
+import websockets
+from clock import SystemClock
+
+class FeedStaleError(Exception):
+    """Raised when quoting is refused because the price feed is stale"""
+
+class FeedConnectionManager:
+    """Keeps one websocket feed connected and reports whether its data is fresh
+
+    - reconnects with jittered exponential backoff instead of fixed sleeps
+    - pings the server when no message arrives within heartbeat_timeout and
+      reconnects if the ping is not answered
+    - detects gaps in a sequence field that increases by exactly one per
+      message (sequence_key), when the feed has one
+    - marks the feed 'stale' once no message has arrived for stale_after
+      seconds, so the engine can pause quoting
+    - records reconnection latency and outage (blind period) durations
+    """
+
+    def __init__(self, name, url, on_message, subscribe=None, decode=json.loads, sequence_key=None,
+                 on_gap=None, base_delay=0.25, max_delay=30.0, heartbeat_timeout=5.0,
+                 ping_timeout=5.0, stale_after=2.0, clock=None, seed=None):
+        self.name = name
+        self.clock = clock or SystemClock()
+        self.random = random.Random(seed)   # backoff jitter
+        self.url = url
+        self.on_message = on_message        # called with each decoded message
+        self.subscribe = subscribe          # message sent after every (re)connect
+        self.decode = decode                # raw frame -> message, or None to drop it
+        self.sequence_key = sequence_key
+        self.on_gap = on_gap                # called with (expected, received) sequence numbers
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.heartbeat_timeout = heartbeat_timeout
+        self.ping_timeout = ping_timeout
+        self.stale_after = stale_after
+
+        self.is_running = False
+        self.connected = False
+        self.attempt = 0
+        self.last_message_time = None
+        self.last_sequence = None
+        self.disconnected_at = self.clock.monotonic()
+
+        self.metrics = {
+            'messages': 0,
+            'decode_errors': 0,
+            'callback_errors': 0,
+            'connects': 0,
+            'reconnects': 0,
+            'connect_failures': 0,
+            'heartbeat_timeouts': 0,
+            'sequence_gaps': 0,
+            'missed_messages': 0,
+            'last_reconnect_latency': None,
+            'max_reconnect_latency': 0.0,
+            'outages': 0,
+            'total_outage_seconds': 0.0,
+            'max_outage_seconds': 0.0,
+        }
+        self.recent_outages = deque(maxlen=100)  # (ended_at epoch, duration seconds)
+
+    @property
+    def state(self):
+        if not self.connected:
+            return 'connecting' if self.is_running else 'disconnected'
+        if self.last_message_time is None or self.clock.monotonic() - self.last_message_time > self.stale_after:
+            return 'stale'
+        return 'live'
+
+    def is_stale(self):
+        return self.state != 'live'
+
+    def backoff_delay(self):
+        """Exponential backoff with jitter, so reconnecting clients don't synchronize"""
+        delay = min(self.max_delay, self.base_delay * (2 ** self.attempt))
+        return self.random.uniform(delay / 2, delay)
+
+    def _record_message(self, now):
+        # The time since the last message is how long we were blind, if it exceeded the stale limit
+        if self.last_message_time is not None:
+            blind = now - self.last_message_time
+            if blind > self.stale_after:
+                self.metrics['outages'] += 1
+                self.metrics['total_outage_seconds'] += blind
+                self.metrics['max_outage_seconds'] = max(self.metrics['max_outage_seconds'], blind)
+                self.recent_outages.append((self.clock.time(), blind))
+        self.last_message_time = now
+        self.metrics['messages'] += 1
+
+    def _check_sequence(self, message):
+        """Returns False for duplicate or out-of-order messages that should be dropped"""
+        if self.sequence_key is None or not isinstance(message, dict):
+            return True
+        sequence = message.get(self.sequence_key)
+        if sequence is None:
+            return True
+        if self.last_sequence is not None:
+            expected = self.last_sequence + 1
+            if sequence < expected:
+                return False
+            if sequence > expected:
+                self.metrics['sequence_gaps'] += 1
+                self.metrics['missed_messages'] += sequence - expected
+                if self.on_gap:
+                    self.on_gap(expected, sequence)
+        self.last_sequence = sequence
+        return True
+
+    async def _receive(self, websocket):
+        while self.is_running:
+            try:
+                raw = await asyncio.wait_for(websocket.recv(), self.heartbeat_timeout)
+            except asyncio.TimeoutError:
+                # Quiet feed: make sure the connection itself is still alive
+                self.metrics['heartbeat_timeouts'] += 1
+                pong = await websocket.ping()
+                await asyncio.wait_for(pong, self.ping_timeout)
+                continue
+
+            try:
+                message = self.decode(raw)
+            except ValueError:
+                self.metrics['decode_errors'] += 1
+                continue
+            if message is None or not self._check_sequence(message):
+                continue
+            self._record_message(self.clock.monotonic())
+            try:
+                self.on_message(message)
+            except Exception as e:
+                # A bad message or consumer must not drop the connection (or other venues)
+                self.metrics['callback_errors'] += 1
+                print(f"Feed {self.name} message handler failed: {e!r}")
+
+    async def run(self):
+        """Connect and receive until stop() is called, reconnecting on any failure"""
+        self.is_running = True
+        while self.is_running:
+            try:
+                async with websockets.connect(self.url, ping_interval=None) as websocket:
+                    if self.subscribe is not None:
+                        await websocket.send(json.dumps(self.subscribe))
+
+                    latency = self.clock.monotonic() - self.disconnected_at
+                    if self.metrics['connects']:
+                        self.metrics['reconnects'] += 1
+                        self.metrics['last_reconnect_latency'] = latency
+                        self.metrics['max_reconnect_latency'] = max(self.metrics['max_reconnect_latency'], latency)
+                    self.metrics['connects'] += 1
+                    self.connected = True
+                    self.attempt = 0
+
+                    await self._receive(websocket)
+            except (OSError, asyncio.TimeoutError, websockets.exceptions.WebSocketException) as e:
+                if self.connected:
+                    print(f"Feed {self.name} disconnected: {e}")
+                else:
+                    self.metrics['connect_failures'] += 1
+            finally:
+                if self.connected:
+                    self.connected = False
+                    self.disconnected_at = self.clock.monotonic()
+
+            if self.is_running:
+                await self.clock.async_sleep(self.backoff_delay())
+                self.attempt += 1
+
+    def stop(self):
+        self.is_running = False
+
+    def get_metrics(self):
+        now = self.clock.monotonic()
+        current_outage = None
+        if self.is_stale() and self.last_message_time is not None:
+            current_outage = now - self.last_message_time
+        return dict(
+            self.metrics,
+            name=self.name,
+            state=self.state,
+            current_outage_seconds=current_outage,
+            recent_outages=list(self.recent_outages)[-10:]
+        )
@@ -0,0 +1,177 @@
+# feed_decoder.py
+import json
+import sys
+import time
+from clock import SystemClock
+
+# Use a faster JSON parser when one is installed
+try:
+    import orjson
+    fast_loads = orjson.loads
+    JSON_BACKEND = 'orjson'
+except ImportError:
+    try:
+        import ujson
+        fast_loads = ujson.loads
+        JSON_BACKEND = 'ujson'
+    except ImportError:
+        fast_loads = json.loads
+        JSON_BACKEND = 'json'
+
+def make_prefiltered_decoder(token=None, loads=fast_loads):
+    """Decoder that skips frames not containing token before parsing them
+
+    The substring check runs in C and is far cheaper than a full parse, so
+    heartbeats, subscription acks and other channels are dropped early.
+    """
+    if token is None:
+        return loads
+    token_bytes = token.encode()
+
+    def decode(raw):
+        if (token_bytes if isinstance(raw, bytes) else token) not in raw:
+            return None
+        return loads(raw)
+    return decode
+
+class TickerDecoder:
+    """Coinbase ticker decode stage writing straight into a tick store
+
+    decode() filters and parses raw frames (usable as a connection manager's
+    decode hook); record() converts a ticker into the store's float64
+    columns without building intermediate history records.
+    """
+
+    def __init__(self, tick_store, message_type='ticker', clock=None):
+        self.tick_store = tick_store
+        self.clock = clock or SystemClock()
+        self.message_type = message_type
+        self._decode = make_prefiltered_decoder(f'"{message_type}"')
+        self.stats = {
+            'frames': 0,
+            'filtered': 0,         # not a ticker object (most dropped by the substring prefilter)
+            'decoded': 0,
+            'errors': 0,
+            'messages_per_second': 0.0,
+            'json_backend': JSON_BACKEND,
+        }
+        self._window_start = self.clock.monotonic()
+        self._window_count = 0
+
+    def decode(self, raw):
+        self.stats['frames'] += 1
+        try:
+            message = self._decode(raw)
+        except ValueError:
+            self.stats['errors'] += 1
+            return None
+        # Valid JSON that isn't an object (a bare string, list or number) is not a ticker either
+        if not isinstance(message, dict) or message.get('type') != self.message_type:
+            self.stats['filtered'] += 1
+            return None
+        return message
+
+    def record(self, message, timestamp=None):
+        """Append a decoded ticker to the tick store; returns (price, bid, ask, timestamp)"""
+        try:
+            price = float(message['price'])
+            bid = float(message['best_bid'])
+            ask = float(message['best_ask'])
+        except (KeyError, TypeError, ValueError):
+            self.stats['errors'] += 1
+            return None
+        if timestamp is None:
+            timestamp = self.clock.time()
+        self.tick_store.append(price, bid, ask, timestamp)
+
+        self.stats['decoded'] += 1
+        self._window_count += 1
+        now = self.clock.monotonic()
+        if now - self._window_start >= 1.0:
+            self.stats['messages_per_second'] = self._window_count / (now - self._window_start)
+            self._window_start = now
+            self._window_count = 0
+        return price, bid, ask, timestamp
+
+    def __call__(self, raw):
+        """Decode and record in one step (no sequence checks in between)"""
+        message = self.decode(raw)
+        if message is None:
+            return None
+        return self.record(message)
+
+def synthetic_capture(count=200000):
+    """Coinbase-like frame mix: tickers interleaved with heartbeats and book updates"""
+    frames = []
+    price = 40000.0
+    for i in range(count):
+        kind = i % 4
+        if kind == 0:
+            price += ((i * 7919) % 21 - 10) * 0.5
+            frames.append(json.dumps({
+                'type': 'ticker', 'sequence': 1000 + i, 'trade_id': i, 'product_id': 'BTC-USD',
+                'price': f'{price:.2f}', 'open_24h': '39000.00', 'volume_24h': '12345.678',
+                'low_24h': '38000.00', 'high_24h': '41000.00', 'volume_30d': '345678.9',
+                'best_bid': f'{price - 5:.2f}', 'best_ask': f'{price + 5:.2f}', 'side': 'buy',
+                'time': '2024-01-01T00:00:00.000000Z', 'last_size': '0.01'
+            }, separators=(',', ':')))
+        elif kind == 1:
+            frames.append(json.dumps({
+                'type': 'heartbeat', 'sequence': 1000 + i, 'last_trade_id': i,
+                'product_id': 'BTC-USD', 'time': '2024-01-01T00:00:00.000000Z'
+            }, separators=(',', ':')))
+        else:
+            frames.append(json.dumps({
+                'type': 'l2update', 'product_id': 'BTC-USD', 'time': '2024-01-01T00:00:00.000000Z',
+                'changes': [['buy', f'{price - 10:.2f}', '0.5'], ['sell', f'{price + 10:.2f}', '0.25']]
+            }, separators=(',', ':')))
+    return frames
+
+def replay_benchmark(frames):
+    """Compare the original decode path with TickerDecoder over the same frames"""
+    from tick_store import TickStore
+
+    # Original path: full parse of every frame, dict build, history copy with pop(0)
+    history = []
+    current = {'price': 0.0, 'bid': 0.0, 'ask': 0.0}
+    started = time.perf_counter()
+    for raw in frames:
+        data = json.loads(raw)
+        if data.get('type') == 'ticker':
+            current = {
+                'price': float(data.get('price', current['price'])),
+                'bid': float(data.get('best_bid', current['bid'])),
+                'ask': float(data.get('best_ask', current['ask'])),
+                'time': data.get('time'),
+            }
+            history.append(current.copy())
+            if len(history) > 1000:
+                history.pop(0)
+    baseline = time.perf_counter() - started
+
+    decoder = TickerDecoder(TickStore(capacity=1000))
+    started = time.perf_counter()
+    for raw in frames:
+        decoder(raw)
+    optimized = time.perf_counter() - started
+
+    return {
+        'frames': len(frames),
+        'tickers': decoder.stats['decoded'],
+        'json_backend': JSON_BACKEND,
+        'baseline_frames_per_second': len(frames) / baseline,
+        'decoder_frames_per_second': len(frames) / optimized,
+        'speedup': baseline / optimized,
+    }
+
+if __name__ == '__main__':
+    # Usage: python feed_decoder.py [capture file with one raw frame per line]
+    if len(sys.argv) > 1:
+        with open(sys.argv[1]) as f:
+            frames = [line.rstrip('\n') for line in f if line.strip()]
+    else:
+        frames = synthetic_capture()
+    result = replay_benchmark(frames)
+    print(f"Replayed {result['frames']} frames ({result['tickers']} tickers) using {result['json_backend']}")
+    print(f"  original path: {result['baseline_frames_per_second']:,.0f} frames/s")
+    print(f"  decoder:       {result['decoder_frames_per_second']:,.0f} frames/s ({result['speedup']:.1f}x)")
@@ -0,0 +1,169 @@
+# garch.py
+import math
+import threading
+import time
+import numpy as np
+from scipy.optimize import minimize
+from scipy.signal import lfilter
+from clock import SystemClock
+from realized_vol import ReturnEstimator, SECONDS_PER_YEAR
+
+class GarchForecaster(ReturnEstimator):
+    """Online GARCH(1,1) on per-second-scaled tick returns x = r / sqrt(dt)
+
+    h(t+1) = omega + alpha * x(t)^2 + beta * h(t) is updated in O(1) per
+    tick. The parameters are refitted by maximum likelihood on the tick
+    store every refit_interval seconds, on a worker thread when background
+    is set (inline otherwise, which keeps replays deterministic), each fit
+    starting from the previous one. Every tick publishes one state tuple,
+    so forecast() never waits on a fit: it returns the annualized vol
+    expected over the next `horizon` seconds, up to max_horizon.
+    """
+
+    def __init__(self, tick_store, clock=None, default=0.7, refit_interval=60.0, min_ticks=200,
+                 max_horizon=604800, background=True):
+        self.tick_store = tick_store
+        self.clock = clock or SystemClock()
+        self.refit_interval = refit_interval
+        self.min_ticks = min_ticks
+        self.max_horizon = max_horizon
+        self.background = background
+
+        # Until the first fit: a persistent process around the default vol
+        variance = default ** 2 / SECONDS_PER_YEAR
+        alpha, beta = 0.05, 0.9
+        self.params = (variance * (1 - alpha - beta), alpha, beta)  # written only by refit()
+        self.fit_start = None       # last fit in normalized units, the next fit's starting point
+        self.fitted = False
+        # (omega, alpha, beta, next variance, EWMA of the tick spacing), written only by add()
+        self.state = self.params + (variance, 0.5)
+
+        self.last_refit_at = self.clock.monotonic()
+        self.refit_requested = threading.Event()
+        self.stats = {
+            'ticks': 0,
+            'fits': 0,
+            'fit_errors': 0,
+            'last_fit_ms': 0.0,
+            'iterations': 0,
+            'log_likelihood': None,
+        }
+        if background:
+            self.thread = threading.Thread(target=self._run, name='garch-refit')
+            self.thread.daemon = True
+            self.thread.start()
+
+    def add(self, r, dt):
+        omega, alpha, beta, h, mean_dt = self.state
+        x2 = r * r / dt
+        # The step uses the parameters h was filtered with; a refit applies from the next one
+        next_omega, next_alpha, next_beta = self.params
+        mean_dt += 0.01 * (dt - mean_dt)
+        # Publish as one tuple so readers never see a half-updated state
+        self.state = (next_omega, next_alpha, next_beta, omega + alpha * x2 + beta * h, mean_dt)
+        self.stats['ticks'] += 1
+
+    def forecast_variance(self, horizon):
+        """Expected per-second variance averaged over the next horizon seconds"""
+        omega, alpha, beta, h, dt = self.state
+        horizon = max(dt, min(horizon, self.max_horizon))
+        steps = horizon / dt
+        persistence = alpha + beta
+        if persistence >= 1:
+            return h
+        long_run = omega / (1 - persistence)
+        # Sum over the steps of long_run + persistence^k * (h - long_run)
+        total = steps * long_run + (h - long_run) * (1 - persistence ** steps) / (1 - persistence)
+        return max(0.0, total / steps)
+
+    def forecast(self, horizon):
+        """Annualized vol forecast over the next horizon seconds"""
+        return math.sqrt(self.forecast_variance(horizon) * SECONDS_PER_YEAR)
+
+    def ready(self):
+        return self.fitted
+
+    def maybe_refit(self, monotonic_now=None):
+        """Start a refit once refit_interval has passed; called from the tick loop"""
+        monotonic_now = self.clock.monotonic() if monotonic_now is None else monotonic_now
+        if monotonic_now - self.last_refit_at < self.refit_interval:
+            return
+        self.last_refit_at = monotonic_now
+        if self.background:
+            self.refit_requested.set()
+        else:
+            self.refit()
+
+    def _run(self):
+        while True:
+            self.refit_requested.wait()
+            self.refit_requested.clear()
+            self.refit()
+
+    def refit(self):
+        """Fit the parameters to the ticks in the store; False if there are too few"""
+        if len(self.tick_store) <= self.min_ticks:
+            return False
+        window = self.tick_store.snapshot()
+        prices = window[self.tick_store.PRICE]
+        dts = np.diff(window[self.tick_store.TIME])
+        valid = (dts > 0) & (prices[1:] > 0) & (prices[:-1] > 0)
+        x = np.log(prices[1:][valid] / prices[:-1][valid]) / np.sqrt(dts[valid])
+        if len(x) < self.min_ticks:
+            return False
+
+        started = time.perf_counter()
+        try:
+            params, log_likelihood, iterations = self.fit(x, self.fit_start)
+        except Exception as e:
+            self.stats['fit_errors'] += 1
+            print(f"GARCH refit failed: {e}")
+            return False
+        scale2 = np.mean(x * x)
+        omega, alpha, beta = params
+        self.fit_start = params
+        # Picked up by the next tick; the filtered variance carries on
+        self.params = (omega * scale2, alpha, beta)
+        self.fitted = True
+
+        self.stats['fits'] += 1
+        self.stats['last_fit_ms'] = (time.perf_counter() - started) * 1000
+        self.stats['iterations'] = iterations
+        self.stats['log_likelihood'] = log_likelihood
+        return True
+
+    @staticmethod
+    def fit(x, start=None):
+        """Gaussian MLE of (omega, alpha, beta) for returns x scaled to unit mean square
+
+        Returns the parameters in those normalized units, the log likelihood
+        and the optimizer iterations.
+        """
+        z2 = x * x / np.mean(x * x)
+        lagged = np.concatenate(([1.0], z2[:-1]))
+
+        def negative_log_likelihood(params):
+            omega, alpha, beta = params
+            if alpha + beta >= 0.999:
+                return 1e10
+            # h(t) - beta * h(t-1) = omega + alpha * z2(t-1), starting from h = 1
+            h = lfilter([1.0], [1.0, -beta], omega + alpha * lagged, zi=[beta])[0]
+            return 0.5 * np.sum(np.log(h) + z2 / h)
+
+        start = start if start is not None else (0.05, 0.05, 0.9)
+        result = minimize(
+            negative_log_likelihood, start, method='L-BFGS-B',
+            bounds=[(1e-6, 10.0), (0.0, 0.999), (0.0, 0.999)]
+        )
+        return tuple(float(p) for p in result.x), -float(result.fun), int(result.nit)
+
+    def get_stats(self):
+        omega, alpha, beta, h, dt = self.state
+        return dict(
+            self.stats,
+            fitted=self.fitted,
+            alpha=alpha,
+            beta=beta,
+            long_run=math.sqrt(omega / (1 - alpha - beta) * SECONDS_PER_YEAR) if alpha + beta < 1 else None,
+            forecast_120s=self.forecast(120),
+        )
@@ -0,0 +1,162 @@
+# hedge_backtest.py
+import math
+import sys
+import time
+import numpy as np
+from scipy.special import ndtr
+from price_paths import PathGenerator, SECONDS_PER_YEAR
+from hedging_policy import FixedThreshold, WhalleyWilmott
+
+def black_scholes(S, K, T, sigma, is_call):
+    """Vectorized price, delta and gamma (zero rate; T in years, > 0)"""
+    vol = sigma * np.sqrt(T)
+    d1 = (np.log(S / K) + 0.5 * vol * vol) / vol
+    d2 = d1 - vol
+    pdf = np.exp(-0.5 * d1 * d1) / np.sqrt(2 * np.pi)
+    call = S * ndtr(d1) - K * ndtr(d2)
+    price = np.where(is_call, call, call - S + K)
+    delta = np.where(is_call, ndtr(d1), ndtr(d1) - 1)
+    return price, delta, pdf / (S * vol)
+
+def option_book(seed=0, hours=1.0, dt=0.5, sigma=0.7, arrival_seconds=20.0, expiries=(60, 120, 300, 900)):
+    """A GBM path and the platform's book of sold micro options along it
+
+    Options arrive every arrival_seconds on average, near the money, and
+    are held to expiry. Returns the prices and, per step, the book's delta
+    and gamma and its PnL over the step (expiring options settle at their
+    payoff), all as the writer of the options.
+    """
+    steps = int(hours * 3600 / dt)
+    rng = np.random.default_rng(seed)
+    paths = PathGenerator('gbm', seed=rng, dt=dt, sigma=sigma)
+    prices = np.concatenate(([paths.price], paths.generate(steps)[PathGenerator.PRICE]))
+
+    delta = np.zeros(steps)
+    gamma = np.zeros(steps)
+    book_pnl = np.zeros(steps)
+    arrivals = np.flatnonzero(rng.random(steps) < dt / arrival_seconds)
+    for start in arrivals:
+        expiry = int(rng.choice(expiries) / dt)
+        end = min(start + expiry, steps)
+        S = prices[start:end + 1]
+        K = round(prices[start] * (1 + rng.normal(0, 0.001)))
+        is_call = rng.random() < 0.5
+        quantity = rng.uniform(0.5, 2.0)
+
+        T = (start + expiry - np.arange(start, end + 1)) * dt / SECONDS_PER_YEAR
+        live = T > 0
+        price, d, g = black_scholes(S[live], K, T[live], sigma, is_call)
+        value = np.empty(len(S))
+        value[live] = price
+        value[~live] = np.maximum(S[~live] - K, 0) if is_call else np.maximum(K - S[~live], 0)
+
+        # The writer is short the option
+        delta[start:end] -= quantity * d[:end - start]
+        gamma[start:end] -= quantity * g[:end - start]
+        book_pnl[start:end] -= quantity * np.diff(value)
+    return {'prices': prices, 'delta': delta, 'gamma': gamma, 'book_pnl': book_pnl, 'dt': dt, 'sigma': sigma}
+
+def run_policy(policy, book, cost=0.0005, check_every=1):
+    """Hedge the book with `policy`, checking every check_every steps; trade count, costs and residual risk"""
+    prices = book['prices']
+    steps = len(book['delta'])
+    hedge = 0.0
+    trades = 0
+    volume = 0.0
+    costs = 0.0
+    net_abs = 0.0
+    pnl = np.empty(steps)
+    context = {'spot': 0.0, 'gamma': 0.0, 'volatility': book['sigma'], 'cost': cost}
+    delta, gamma, book_pnl = book['delta'].tolist(), book['gamma'].tolist(), book['book_pnl'].tolist()
+    price_list = prices.tolist()
+
+    for i in range(steps):
+        spot = price_list[i]
+        if i % check_every == 0:
+            context['spot'] = spot
+            context['gamma'] = gamma[i]
+            trade = policy.adjustment(delta[i] + hedge, context)
+            if trade:
+                hedge += trade
+                trades += 1
+                volume += abs(trade)
+                costs += abs(trade) * spot * cost
+        net_abs += abs(delta[i] + hedge)
+        pnl[i] = book_pnl[i] + hedge * (price_list[i + 1] - spot)
+
+    # Residual risk: standard deviation of the hedged book's PnL per minute, before costs
+    per_minute = int(60 / book['dt'])
+    minutes = pnl[:steps - steps % per_minute].reshape(-1, per_minute).sum(axis=1)
+    return {
+        'trades': trades,
+        'volume': volume,
+        'costs': costs,
+        'pnl': float(pnl.sum()) - costs,
+        'risk_per_minute': float(minutes.std()),
+        'mean_net_delta': net_abs / steps,
+    }
+
+def calibrate(make, low, high, book, target_risk, cost=0.0005, check_every=1, iterations=20):
+    """Find the parameter of make(parameter) in [low, high] at which the policy runs target_risk
+
+    Bisects on a log scale, so risk must move monotonically with the
+    parameter (either way). Returns (parameter, run_policy result) for the
+    run closest to the target; a target out of reach gives the nearer end.
+    """
+    def run(parameter):
+        return parameter, run_policy(make(parameter), book, cost, check_every)
+
+    def miss(candidate):
+        return abs(candidate[1]['risk_per_minute'] - target_risk)
+
+    ends = run(low), run(high)
+    rising = ends[1][1]['risk_per_minute'] > ends[0][1]['risk_per_minute']
+    best = min(ends, key=miss)
+    for _ in range(iterations):
+        candidate = run(math.sqrt(low * high))
+        best = min(best, candidate, key=miss)
+        if (candidate[1]['risk_per_minute'] < target_risk) == rising:
+            low = candidate[0]
+        else:
+            high = candidate[0]
+    return best
+
+def compare_at_risk(families, seed=0, hours=1.0, cost=0.0005, check_seconds=0.5, risk_levels=(1.1, 1.25, 1.5)):
+    """Calibrate every policy family to the same residual risks and run each there
+
+    Risk levels are multiples of the floor: the risk_per_minute of hedging
+    the whole delta at every check. Returns the floor and, per risk level,
+    each family's calibrated parameter and run_policy() result.
+    """
+    book = option_book(seed, hours)
+    check_every = max(1, int(round(check_seconds / book['dt'])))
+    floor = run_policy(FixedThreshold(0.0), book, cost, check_every)['risk_per_minute']
+    results = {}
+    for level in risk_levels:
+        results[level] = {}
+        for name, (make, low, high) in families.items():
+            started = time.perf_counter()
+            parameter, result = calibrate(make, low, high, book, floor * level, cost, check_every)
+            results[level][name] = dict(result, parameter=parameter, seconds=time.perf_counter() - started)
+    return floor, results
+
+# Policy families, each tuned by one parameter: (make(parameter), low, high)
+POLICY_FAMILIES = {
+    'fixed': (lambda threshold: FixedThreshold(threshold), 0.001, 5.0),
+    'ww': (lambda risk_aversion: WhalleyWilmott(risk_aversion=risk_aversion), 1e-4, 1e6),
+    'ww edge': (lambda risk_aversion: WhalleyWilmott(risk_aversion=risk_aversion, rebalance_to=1.0), 1e-4, 1e6),
+}
+
+if __name__ == '__main__':
+    # Usage: python hedge_backtest.py [seed] [hours] [seconds between hedge checks]
+    seed = int(sys.argv[1]) if len(sys.argv) > 1 else 0
+    hours = float(sys.argv[2]) if len(sys.argv) > 2 else 4.0
+    check_seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 0.5
+    floor, results = compare_at_risk(POLICY_FAMILIES, seed, hours, check_seconds=check_seconds)
+    print(f"Risk floor (hedging every check): {floor:.2f} $/min")
+    print(f"{'risk':>6} {'policy':>8} {'parameter':>10} {'trades':>7} {'volume':>9} {'costs':>9} "
+          f"{'risk/min':>9} {'|net delta|':>11} {'pnl':>10}")
+    for level, by_family in results.items():
+        for name, r in by_family.items():
+            print(f"{level:>5.2f}x {name:>8} {r['parameter']:>10.4g} {r['trades']:>7} {r['volume']:>9.2f} "
+                  f"{r['costs']:>9.2f} {r['risk_per_minute']:>9.2f} {r['mean_net_delta']:>11.3f} {r['pnl']:>10.2f}")
@@ -0,0 +1,58 @@
+# hedge_netting.py
+from clock import SystemClock
+
+class HedgeNetter:
+    """Coalesces hedge triggers so offsetting orders share one net hedge
+
+    Each order reports the resulting net delta through on_delta_change().
+    Below hard_limit it only opens a netting window (or joins the open one);
+    the tick loop asks due() and hedges the net delta once the window has
+    run for `window` seconds, so a call and a put bought together cost one
+    venue round trip, or none if they offset. A net delta at or beyond
+    hard_limit is hedged immediately.
+    """
+
+    def __init__(self, window=2.0, hard_limit=1.0, clock=None):
+        self.window = window
+        self.hard_limit = hard_limit
+        self.clock = clock or SystemClock()
+        self.opened_at = None       # monotonic time the open window started, None when closed
+        self.stats = {
+            'triggers': 0,          # delta changes reported
+            'coalesced': 0,         # triggers folded into an already open window
+            'windows': 0,           # windows that ran to the end
+            'immediate': 0,         # hard limit breaches hedged on the spot
+        }
+
+    def on_delta_change(self, net_delta, monotonic_now=None):
+        """Record a change in exposure; True when it must be hedged now"""
+        monotonic_now = self.clock.monotonic() if monotonic_now is None else monotonic_now
+        self.stats['triggers'] += 1
+        if abs(net_delta) >= self.hard_limit:
+            self.stats['immediate'] += 1
+            self.opened_at = None
+            return True
+        if self.opened_at is None:
+            self.opened_at = monotonic_now
+        else:
+            self.stats['coalesced'] += 1
+        return False
+
+    def due(self, monotonic_now=None):
+        """True once the open window has run its length; closes it"""
+        if self.opened_at is None:
+            return False
+        monotonic_now = self.clock.monotonic() if monotonic_now is None else monotonic_now
+        if monotonic_now - self.opened_at < self.window:
+            return False
+        self.opened_at = None
+        self.stats['windows'] += 1
+        return True
+
+    def reset(self):
+        """A hedge ran for another reason (e.g. the periodic rebalance): it covers the open window"""
+        self.opened_at = None
+
+    def get_stats(self):
+        return dict(self.stats, window=self.window, hard_limit=self.hard_limit,
+                    window_open=self.opened_at is not None)
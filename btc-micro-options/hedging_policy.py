@@ -0,0 +1,93 @@
+# hedging_policy.py
+import math
+
+SECONDS_PER_YEAR = 365 * 24 * 60 * 60
+
+class HedgingPolicy:
+    """Decides when the net delta is worth hedging and how much to trade
+
+    adjustment(net_delta, context) returns the BTC to trade, 0 for none.
+    context is a dict with the spot, the portfolio gamma (per $), the
+    annualized volatility, the transaction cost (fraction of notional)
+    and optionally max_band, a cap on how much delta may stay unhedged.
+    A net delta inside the band is left alone; outside it, the policy
+    trades back to rebalance_to times the band (0: flat, 1: the band edge).
+    """
+
+    name = None
+    rebalance_to = 0.0
+
+    def __init__(self):
+        self.last_band = None
+
+    def band(self, context):
+        raise NotImplementedError
+
+    def adjustment(self, net_delta, context):
+        band = min(self.band(context), context.get('max_band', math.inf))
+        self.last_band = band
+        if abs(net_delta) <= band:
+            return 0.0
+        return math.copysign(band * self.rebalance_to, net_delta) - net_delta
+
+    def get_stats(self):
+        return {'policy': self.name, 'band': self.last_band}
+
+class FixedThreshold(HedgingPolicy):
+    """Hedge the whole net delta once it exceeds a fixed threshold (BTC)"""
+
+    name = 'fixed'
+
+    def __init__(self, threshold=0.05):
+        super().__init__()
+        self.threshold = threshold
+
+    def band(self, context):
+        return self.threshold
+
+class WhalleyWilmott(HedgingPolicy):
+    """Whalley-Wilmott no-trade band around the delta
+
+    Half-width (3 * cost * spot * gamma^2 / (2 * risk_aversion))^(1/3), with
+    risk_aversion per $: the band balances the cost of re-hedging gamma's
+    delta moves against the risk of carrying unhedged delta, so it widens
+    as near-expiry options' gamma explodes instead of chasing their delta.
+    Trading back to the edge (rebalance_to=1) minimizes proportional costs;
+    the default goes halfway in, for fewer venue round trips.
+    Volatility sets the cap: the delta left unhedged may move the book by at
+    most risk_budget dollars (one standard deviation) over horizon seconds.
+    min_band keeps a gamma-free book from trading dust.
+    """
+
+    name = 'whalley_wilmott'
+
+    def __init__(self, risk_aversion=1.0, risk_budget=100.0, horizon=10.0, min_band=0.05, rebalance_to=0.5):
+        super().__init__()
+        self.rebalance_to = rebalance_to
+        self.risk_aversion = risk_aversion
+        self.risk_budget = risk_budget
+        self.horizon = horizon
+        self.min_band = min_band
+
+    def band(self, context):
+        spot = context['spot']
+        gamma = abs(context.get('gamma', 0.0))
+        cost = context.get('cost', 0.0005)
+        band = (1.5 * cost * spot * gamma * gamma / self.risk_aversion) ** (1 / 3)
+
+        # Delta whose one-sigma move over the horizon uses up the risk budget
+        move = spot * context.get('volatility', 0.7) * math.sqrt(self.horizon / SECONDS_PER_YEAR)
+        if move > 0:
+            band = min(band, self.risk_budget / move)
+        return max(self.min_band, band)
+
+POLICIES = {
+    'fixed': FixedThreshold,
+    'whalley_wilmott': WhalleyWilmott,
+}
+
+def make_policy(name, **params):
+    """Hedging policy by name ('fixed' or 'whalley_wilmott')"""
+    if name not in POLICIES:
+        raise ValueError(f"unknown hedging policy '{name}'")
+    return POLICIES[name](**params)
@@ -1,25 +1,84 @@
 # hedging_system.py
+import math
 import time
 import json
 import asyncio
 import random
 import aiohttp
 from datetime import datetime, timedelta
+from clock import SystemClock
+from positions import PositionKeeper
+from mark_to_market import HedgeMarker
+from exchange_simulator import ExchangeSimulator
+from order_router import SmartOrderRouter
+from hedge_netting import HedgeNetter
+from hedging_policy import make_policy
+from venue_health import VenueHealth, HALF_OPEN
 
 class CrossPlatformHedging:
-    def __init__(self, liquidity_pool_size=1200000):
+    def __init__(self, liquidity_pool_size=1200000, price_source=None, clock=None, seed=None):
         self.liquidity = liquidity_pool_size
+        self.price_source = price_source  # callable returning the consolidated feed price
+        self.clock = clock or SystemClock()
+        self.random = random.Random(seed)
+        self.last_price = 40000  # last feed price, used while the feed has none
+        # latency: typical order round trip (seconds) of the simulated venue
+        # funding_rate: perpetual swap funding per 8 hours (positive: longs pay shorts)
+        # taker_fee: fraction of notional charged per order
         self.platforms = {
-            "binance": {"url": "wss://stream.binance.com:9443/ws/btcusdt@ticker", "weight": 0.4, "status": "active"},
-            "coinbase": {"url": "wss://ws-feed.pro.coinbase.com", "weight": 0.3, "status": "active"},
-            "kraken": {"url": "wss://ws.kraken.com", "weight": 0.2, "status": "active"},
-            "ftx": {"url": "wss://ftx.com/ws/", "weight": 0.1, "status": "backup"}
+            "binance": {"url": "wss://stream.binance.com:9443/ws/btcusdt@ticker", "weight": 0.4, "status": "active", "latency": 0.05, "funding_rate": 0.0001, "taker_fee": 0.0004},
+            "coinbase": {"url": "wss://ws-feed.pro.coinbase.com", "weight": 0.3, "status": "active", "latency": 0.08, "funding_rate": 0.0001, "taker_fee": 0.0006},
+            "kraken": {"url": "wss://ws.kraken.com", "weight": 0.2, "status": "active", "latency": 0.12, "funding_rate": 0.00012, "taker_fee": 0.0005},
+            "ftx": {"url": "wss://ftx.com/ws/", "weight": 0.1, "status": "backup", "latency": 0.15, "funding_rate": 0.00015, "taker_fee": 0.0007}
         }
-        self.hedge_positions = []
+        # Local L2 books per venue (fed by the stand-in exchange simulator) and
+        # the router splitting each hedge over them by expected cost
+        self.exchange_simulator = ExchangeSimulator(list(self.platforms), seed=self.random.getrandbits(64))
+        self.router = SmartOrderRouter(
+            self.exchange_simulator.books,
+            fees={p: c["taker_fee"] for p, c in self.platforms.items()},
+            latencies={p: c["latency"] for p, c in self.platforms.items()}
+        )
+        # Net size, average cost and realized PnL per venue; fills beyond the
+        # last 1000 are only kept in those aggregates
+        self.positions = PositionKeeper(fill_log_size=1000)
+        # Marked to the feed price with funding accrued, on every pass
+        self.marker = HedgeMarker(self.positions, {p: c["funding_rate"] for p, c in self.platforms.items()})
+        self.marked_pnl = 0.0       # hedge PnL already credited to liquidity
         self.hedge_distribution = {}
-        self.fallback_triggered = False
-        self.last_rebalance = datetime.now()
+        # Latency, error rate and fill ratio per venue from the hedge legs
+        # themselves; they steer the router, and circuit breakers take a
+        # failing venue out until probe orders show it has recovered
+        self.health = VenueHealth(list(self.platforms), {p: c["latency"] for p, c in self.platforms.items()},
+                                  clock=self.clock)
+        self.fallback_active = False    # backups trading while an active venue's circuit is open
+        self.last_rebalance = self.clock.now()
+        self.last_rebalance_at = self.clock.monotonic()
         self.rebalance_frequency = 15  # seconds
+        # Order-driven delta changes are netted over a short window; only a
+        # net delta past the hard limit (BTC) is hedged on the order path
+        self.netter = HedgeNetter(window=2.0, hard_limit=1.0, clock=self.clock)
+        self.policy = make_policy('fixed', threshold=0.1)  # hedge the whole delta past 0.1 BTC
+        
+        # Hedge legs run concurrently, each with a deadline; unfilled size is
+        # re-routed to the venues that filled, for up to max_routing_rounds
+        self.leg_timeout = 0.3          # seconds, per leg (a venue may set its own "timeout")
+        self.max_routing_rounds = 3
+        self.min_leg_size = 0.001       # BTC; smaller remainders are left for the next rebalance
+        self.slow_probability = 0.03    # simulated venue stalls past the deadline
+        self.partial_probability = 0.1  # simulated partial fill
+        self.reject_probability = 0.01  # simulated order rejection
+        self.incident_probability = 0.002   # per order, the simulated venue starts degrading
+        self.execution_stats = {
+            'rebalances': 0,
+            'legs': 0,
+            'executed': 0,          # legs by how they resolved
+            'partial': 0,
+            'timeout': 0,
+            'failed': 0,
+            'rerouted': 0,          # routing rounds after the first
+            'last_latency': 0.0,    # seconds from first dispatch to the last leg resolving
+        }
         
     async def connect_to_platforms(self):
         """Establish connections to multiple platforms for price feeds and hedging"""
@@ -34,125 +93,266 @@ class CrossPlatformHedging:
                     active_connections[platform] = True
                 except Exception as e:
                     print(f"Failed to connect to {platform}: {e}")
-                    self._trigger_fallback(platform)
+                    self.health.trip(platform)
         
         return active_connections
     
-    def _trigger_fallback(self, failed_platform):
-        """Activate fallback platform when a primary platform fails"""
-        print(f"⚠️ Platform {failed_platform} failed! Triggering fallback mechanism...")
+    def routable_platforms(self, monotonic_now=None):
+        """Venues hedges may use now
         
-        # Find a backup platform to activate
-        for platform, config in self.platforms.items():
-            if config["status"] == "backup":
-                self.platforms[platform]["status"] = "active"
-                self.platforms[failed_platform]["status"] = "failed"
-                
-                # Redistribute weights
-                failed_weight = self.platforms[failed_platform]["weight"]
-                self.platforms[platform]["weight"] = failed_weight
-                
-                print(f"✅ Activated {platform} as fallback with weight {failed_weight}")
-                self.fallback_triggered = True
-                break
-        
-        # If no backup is available, redistribute among remaining active platforms
-        if not self.fallback_triggered:
-            active_platforms = [p for p, c in self.platforms.items() 
-                              if c["status"] == "active" and p != failed_platform]
-            
-            if active_platforms:
-                failed_weight = self.platforms[failed_platform]["weight"]
-                weight_per_platform = failed_weight / len(active_platforms)
-                
-                for platform in active_platforms:
-                    self.platforms[platform]["weight"] += weight_per_platform
-                
-                print(f"✅ Redistributed weight among remaining {len(active_platforms)} platforms")
-                self.platforms[failed_platform]["status"] = "failed"
+        The active venues whose circuit lets traffic through, plus the
+        backups while any active venue's circuit is open. Backups stand down
+        again once every active venue has recovered.
+        """
+        active = [p for p, c in self.platforms.items() if c["status"] == "active"]
+        usable = self.health.available(active, monotonic_now)
+        fallback = len(usable) < len(active)
+        if fallback:
+            backups = [p for p, c in self.platforms.items() if c["status"] == "backup"]
+            usable += self.health.available(backups, monotonic_now)
+        if fallback != self.fallback_active:
+            self.fallback_active = fallback
+            if fallback:
+                print(f"⚠️ {', '.join(p for p in active if p not in usable)} unavailable, hedging on {', '.join(usable) or 'nothing'}")
             else:
-                print("❌ CRITICAL: All platforms failed!")
+                print("✅ All active platforms available, backups standing down")
+        return usable
+    
+    def _venue_outcome(self, platform):
+        """Draw how the simulated venue treats the next order: (latency, fill ratio, rejected)"""
+        monotonic_now = self.clock.monotonic()
+        if self.random.random() < self.incident_probability:
+            self.exchange_simulator.start_incident(platform, monotonic_now)
+        slowdown, error_probability = self.exchange_simulator.condition(platform, monotonic_now)
+        latency = self.platforms[platform].get("latency", 0.1)
+        latency = max(0.005, self.random.gauss(latency, latency * 0.3)) * slowdown
+        if self.random.random() < self.slow_probability:
+            latency *= 10
+        fill_ratio = 1.0
+        if self.random.random() < self.partial_probability:
+            fill_ratio = self.random.uniform(0.2, 0.9)
+        rejected = self.random.random() < max(self.reject_probability, error_probability)
+        return latency, fill_ratio, rejected
+    
+    async def _send_order(self, platform, amount, outcome, timeout):
+        """Simulated order round trip, resolved by the deadline: returns (filled amount, price)"""
+        latency, fill_ratio, rejected = outcome
+        # In a real implementation, this would place the order via the venue API
+        # under asyncio.wait_for and cancel whatever is unfilled at the deadline
+        if latency > timeout:
+            await self.clock.async_sleep(timeout)
+            raise asyncio.TimeoutError(f"no response from {platform} within {timeout:.2f}s")
+        await self.clock.async_sleep(latency)
+        if rejected:
+            raise RuntimeError(f"order rejected by {platform}")
+        # Fills against the venue's book as it stands when the order arrives
+        filled, price = self.exchange_simulator.execute(platform, amount * fill_ratio)
+        if not filled:
+            raise RuntimeError(f"no liquidity on {platform}")
+        return filled, price
+    
+    async def _execute_leg(self, platform, amount, outcome, now):
+        """One hedge leg on one venue; never raises, the status says how it resolved"""
+        timeout = self.platforms[platform].get("timeout", self.leg_timeout)
+        started = self.clock.monotonic()
+        leg = {"platform": platform, "amount": amount, "filled": 0.0, "price": None}
+        try:
+            filled, price = await self._send_order(platform, amount, outcome, timeout)
+        except asyncio.TimeoutError:
+            leg["status"] = "timeout"
+        except Exception as e:
+            print(f"❌ Failed to execute hedge on {platform}: {e}")
+            leg["status"] = "failed"
+        else:
+            leg.update(filled=filled, price=price, status="executed" if abs(filled - amount) < 1e-9 else "partial")
+            # Using perpetual swaps for hedging
+            fee = abs(filled) * price * self.platforms[platform].get("taker_fee", 0.0)
+            self.positions.apply_fill(platform, filled, price, now, fee=fee, type="perpetual_swap")
+        leg["latency"] = self.clock.monotonic() - started
+        
+        # Every attempt updates the venue's health
+        ok = leg["status"] in ("executed", "partial")
+        self.health.record(platform, ok, leg["latency"], leg["filled"] / amount if ok else 0.0)
+        return leg
+    
+    def on_price(self, price):
+        """Feed a consolidated price to the simulated venue books"""
+        self.exchange_simulator.on_price(price)
+    
+    def split_order(self, amount, venues):
+        """Venue -> size for `amount` BTC: the router's cheapest split, or the health-scaled weights without books
+        
+        Venues whose circuit is half-open get a probe order only, unless
+        they are all that is left.
+        """
+        probes = {}
+        routed = [p for p in venues if self.health.state(p) != HALF_OPEN]
+        if routed and len(routed) < len(venues):
+            probe = math.copysign(min(self.health.probe_size, abs(amount) / len(venues)), amount)
+            probes = {p: probe for p in venues if p not in routed}
+            amount -= probe * len(probes)
+        else:
+            routed = venues
+        
+        self.health.apply(self.router)
+        allocation = self.router.route(amount, routed, reference=self.current_price)
+        if not allocation:
+            weights = {p: self.platforms[p]["weight"] * self.health.weight(p) for p in routed}
+            total_weight = sum(weights.values())
+            if total_weight <= 0:
+                weights = {p: self.platforms[p]["weight"] for p in routed}
+                total_weight = sum(weights.values())
+            allocation = {p: amount * weight / total_weight for p, weight in weights.items()}
+        allocation.update(probes)
+        return allocation
     
-    async def distribute_hedges(self, portfolio_delta):
-        """Distribute hedging across multiple platforms based on weights"""
+    async def distribute_hedges(self, portfolio_delta, now=None):
+        """Distribute hedging across multiple platforms by expected cost
+        
+        The smart order router splits the hedge over the active venues'
+        books (depth, fees, and latency and failures as measured by the
+        venue health monitor), skipping venues whose circuit is open. All
+        legs are sent at once and each resolves by its deadline, so a round
+        takes as long as its slowest leg. Size left by partial fills,
+        timeouts and rejections is re-routed to the venues that filled in full.
+        """
         if abs(portfolio_delta) < 0.01:
             return {"status": "skipped", "reason": "delta too small"}
             
+        if not self.exchange_simulator.touch:
+            # The books follow the feed through on_price(); before the first tick, quote them here
+            self.on_price(self.current_price)
+        
         # Calculate hedge amounts for each platform
         self.hedge_distribution = {}
-        active_platforms = {p: c for p, c in self.platforms.items() if c["status"] == "active"}
+        active_platforms = self.routable_platforms()
+        if not active_platforms:
+            return {"status": "skipped", "reason": "no available platforms"}
         
-        # Normalize weights
-        total_weight = sum(c["weight"] for c in active_platforms.values())
-        normalized_weights = {p: c["weight"]/total_weight for p, c in active_platforms.items()}
-        
-        # Distribute hedge positions
-        for platform, weight in normalized_weights.items():
-            hedge_amount = -portfolio_delta * weight  # Negative to offset delta
+        # Distribute hedge positions (negative to offset delta)
+        orders = self.split_order(-portfolio_delta, active_platforms)
+        for platform, hedge_amount in orders.items():
             self.hedge_distribution[platform] = {
                 "amount": hedge_amount,
+                "filled": 0.0,
                 "execution_price": None,
-                "status": "pending"
+                "status": "pending",
+                "legs": []
             }
         
-        # Simulate executing hedges on each platform
-        for platform, hedge in self.hedge_distribution.items():
-            try:
-                # Simulate slight price differences between platforms (0.1% range)
-                price_variation = random.uniform(0.999, 1.001)
-                execution_price = self.current_price * price_variation
-                
-                # In a real implementation, this would execute trades via API
-                await asyncio.sleep(0.1)  # Simulate network latency
-                
-                self.hedge_distribution[platform]["execution_price"] = execution_price
-                self.hedge_distribution[platform]["status"] = "executed"
-                self.hedge_positions.append({
-                    "platform": platform,
-                    "amount": hedge["amount"],
-                    "price": execution_price,
-                    "timestamp": datetime.now(),
-                    "type": "perpetual_swap"  # Using perpetual swaps for hedging
+        now = now or self.clock.now()
+        started = self.clock.monotonic()
+        healthy = list(active_platforms)
+        for round_number in range(self.max_routing_rounds):
+            # Outcomes are drawn in a fixed order so seeded runs stay reproducible
+            outcomes = {platform: self._venue_outcome(platform) for platform in orders}
+            legs = await asyncio.gather(*(
+                self._execute_leg(platform, amount, outcomes[platform], now)
+                for platform, amount in orders.items()
+            ))
+            
+            unfilled = 0.0
+            for leg in legs:
+                platform = leg["platform"]
+                hedge = self.hedge_distribution[platform]
+                hedge["legs"].append(leg)
+                self.execution_stats['legs'] += 1
+                self.execution_stats[leg["status"]] += 1
+                if leg["filled"]:
+                    # Volume-weighted execution price across this venue's legs
+                    filled = hedge["filled"] + leg["filled"]
+                    previous = (hedge["execution_price"] or 0.0) * hedge["filled"]
+                    hedge["execution_price"] = (previous + leg["price"] * leg["filled"]) / filled
+                    hedge["filled"] = filled
+                    print(f"✅ Executed hedge on {platform}: {leg['filled']:.4f} BTC @ ${leg['price']:.2f}")
+                if leg["status"] != "executed":
+                    # The venue keeps what it filled; the rest moves on
+                    unfilled += leg["amount"] - leg["filled"]
+                    hedge["amount"] -= leg["amount"] - leg["filled"]
+                    if platform in healthy:
+                        healthy.remove(platform)
+            
+            if abs(unfilled) < self.min_leg_size or not healthy:
+                break
+            
+            # Re-route the remainder to the venues that filled in full (or had no leg yet)
+            orders = self.split_order(unfilled, healthy)
+            for platform, amount in orders.items():
+                hedge = self.hedge_distribution.setdefault(platform, {
+                    "amount": 0.0, "filled": 0.0, "execution_price": None, "status": "pending", "legs": []
                 })
-                
-                print(f"✅ Executed hedge on {platform}: {hedge['amount']:.4f} BTC @ ${execution_price:.2f}")
-                
-            except Exception as e:
-                print(f"❌ Failed to execute hedge on {platform}: {e}")
-                self.hedge_distribution[platform]["status"] = "failed"
-                self._trigger_fallback(platform)
-                
+                hedge["amount"] += amount
+            self.execution_stats['rerouted'] += 1
+            print(f"↪️ Re-routing {unfilled:.4f} BTC to {', '.join(orders)}")
+        
+        for hedge in self.hedge_distribution.values():
+            statuses = {leg["status"] for leg in hedge["legs"]}
+            if hedge["filled"] and statuses == {"executed"}:
+                hedge["status"] = "executed"
+            elif hedge["filled"]:
+                hedge["status"] = "partial"
+            else:
+                hedge["status"] = "timeout" if "timeout" in statuses else "failed"
+        
+        self.execution_stats['rebalances'] += 1
+        self.execution_stats['last_latency'] = self.clock.monotonic() - started
         return self.hedge_distribution
     
-    async def check_and_rebalance(self, portfolio_delta):
-        """Check if rebalance is needed and execute if necessary"""
-        now = datetime.now()
+    async def on_exposure_change(self, portfolio_delta, now=None, gamma=0.0, volatility=0.7):
+        """Called after each order: hedge now past the hard limit, otherwise net over the window"""
+        net_delta = portfolio_delta + self.positions.net()
+        if self.netter.on_delta_change(net_delta):
+            return await self._rebalance(net_delta, now, self.clock.monotonic(), gamma, volatility)
+        return {"status": "netting", "net_delta": net_delta}
+    
+    async def check_and_rebalance(self, portfolio_delta, now=None, gamma=0.0, volatility=0.7):
+        """Check if rebalance is needed and execute if necessary
         
-        if (now - self.last_rebalance).total_seconds() < self.rebalance_frequency:
+        Runs when the netting window of recent orders has closed, or every
+        rebalance_frequency seconds for the drift in between. gamma and
+        volatility (annualized) size the hedging policy's no-trade band.
+        """
+        monotonic_now = self.clock.monotonic()
+        if not self.netter.due(monotonic_now) and monotonic_now - self.last_rebalance_at < self.rebalance_frequency:
             return {"status": "skipped", "reason": "too soon"}
         
-        # Calculate current net delta across all platforms
-        current_hedge_delta = sum(pos["amount"] for pos in self.hedge_positions)
+        # Current net delta across all platforms, kept by the position keeper
+        current_hedge_delta = self.positions.net()
         net_delta = portfolio_delta + current_hedge_delta
-        
-        # Rebalance if net delta exceeds threshold
-        if abs(net_delta) > 0.1:
-            print(f"🔄 Rebalancing hedges. Net delta: {net_delta:.4f}")
-            result = await self.distribute_hedges(net_delta)
+        return await self._rebalance(net_delta, now, monotonic_now, gamma, volatility)
+    
+    async def _rebalance(self, net_delta, now, monotonic_now, gamma, volatility):
+        # Rebalance if the policy says the net delta is outside its band
+        self.netter.reset()
+        active = [self.platforms[p] for p in self.routable_platforms(monotonic_now)]
+        adjustment = self.policy.adjustment(net_delta, {
+            "spot": self.current_price,
+            "gamma": gamma,
+            "volatility": volatility,
+            "cost": sum(c.get("taker_fee", 0.0) for c in active) / len(active) if active else 0.0,
+            "max_band": self.netter.hard_limit
+        })
+        if adjustment:
+            print(f"🔄 Rebalancing hedges. Net delta: {net_delta:.4f}, trading {adjustment:.4f}")
+            now = now or self.clock.now()
+            result = await self.distribute_hedges(-adjustment, now)
             self.last_rebalance = now
-            return {"status": "rebalanced", "net_delta": net_delta, "result": result}
+            self.last_rebalance_at = monotonic_now
+            return {"status": "rebalanced", "net_delta": net_delta, "adjustment": adjustment, "result": result}
         
         return {"status": "balanced", "net_delta": net_delta}
     
-    def update_liquidity_from_hedges(self):
-        """Update platform liquidity based on hedge positions"""
-        # Calculate PnL of hedge positions
-        hedge_pnl = 0
-        for position in self.hedge_positions:
-            # In a real implementation, this would calculate actual PnL
-            price_change = random.uniform(-0.001, 0.001) * self.current_price
-            position_pnl = position["amount"] * price_change
-            hedge_pnl += position_pnl
+    def update_liquidity_from_hedges(self, timestamp=None):
+        """Update platform liquidity based on hedge positions
+        
+        The hedges are marked to the feed price, with funding accrued since
+        the last call, and the change in realized, unrealized and funding PnL
+        is credited to liquidity. Each call adds a point to the PnL series.
+        """
+        timestamp = self.clock.time() if timestamp is None else timestamp
+        total_pnl = self.marker.mark(self.current_price, timestamp)
+        hedge_pnl = total_pnl - self.marked_pnl
+        self.marked_pnl = total_pnl
         
         # Update liquidity
         previous_liquidity = self.liquidity
@@ -166,5 +366,9 @@ class CrossPlatformHedging:
     
     @property
     def current_price(self):
-        """Get current BTC price (simulated)"""
-        return 40000 + random.uniform(-500, 500)
+        """Get current BTC price from the feed, or the last one it gave while it has none"""
+        if self.price_source is not None:
+            price = self.price_source()
+            if price:
+                self.last_price = price
+        return self.last_price
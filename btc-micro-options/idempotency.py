@@ -0,0 +1,188 @@
+# idempotency.py
+import hashlib
+import time
+import threading
+from collections import OrderedDict
+from functools import wraps
+from flask import request, jsonify, make_response, Response
+from rate_limiter import client_identity
+
+class IdempotencyCache:
+    """Bounded, time-expiring cache of responses keyed by Idempotency-Key
+
+    A retried request carrying the same key gets the original response back
+    instead of creating (and charging for) a second option.
+    """
+
+    HEADER = 'Idempotency-Key'
+
+    def __init__(self, max_entries=10000, ttl=600, wait_timeout=5.0):
+        self.max_entries = max_entries
+        self.ttl = ttl                      # seconds a completed result is replayable
+        self.wait_timeout = wait_timeout    # how long a duplicate waits on an in-flight original
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'conflicts': 0, 'evictions': 0}
+
+    def _expire(self, now):
+        # Entries share one TTL, so insertion order is expiry order
+        while self.entries:
+            oldest = next(iter(self.entries.values()))
+            if oldest['expires_at'] > now:
+                break
+            self.entries.popitem(last=False)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def begin(self, key, fingerprint):
+        """Claim a key; returns ('new', None), ('hit', entry) or ('mismatch', None)
+
+        A duplicate of a request still in flight waits for it. If the original
+        is aborted meanwhile, the key is free again and the waiter claims it.
+        """
+        while True:
+            now = time.monotonic()
+            with self.lock:
+                self._expire(now)
+                entry = self.entries.get(key)
+                if entry is None:
+                    self.entries[key] = {
+                        'fingerprint': fingerprint,
+                        'done': threading.Event(),
+                        'aborted': False,
+                        'response': None,
+                        'expires_at': now + self.ttl
+                    }
+                    self._expire(now)
+                    self.stats['misses'] += 1
+                    return 'new', None
+
+            if entry['fingerprint'] != fingerprint:
+                with self.lock:
+                    self.stats['conflicts'] += 1
+                return 'mismatch', None
+
+            # Same request still being processed: wait for it rather than redo the work
+            entry['done'].wait(self.wait_timeout)
+            if entry['aborted']:
+                continue
+            with self.lock:
+                self.stats['hits'] += 1
+            return 'hit', entry
+
+    def complete(self, key, status, chunks, mimetype):
+        """Store the final response for a claimed key"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return
+            entry['response'] = {'status': status, 'chunks': chunks, 'mimetype': mimetype}
+            entry['done'].set()
+
+    def abort(self, key):
+        """Release a claimed key without storing a result (failed or rejected request)"""
+        with self.lock:
+            entry = self.entries.pop(key, None)
+        if entry is not None:
+            # Waiters wake up to a free key and retry the claim
+            entry['aborted'] = True
+            entry['done'].set()
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats, entries=len(self.entries))
+
+    def idempotent(self, f):
+        """Flask decorator replaying the stored response for a repeated Idempotency-Key"""
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            idempotency_key = request.headers.get(self.HEADER)
+            if not idempotency_key:
+                return f(*args, **kwargs)
+
+            key = (client_identity(), request.path, idempotency_key)
+            fingerprint = hashlib.sha256(request.get_data()).hexdigest()
+            state, entry = self.begin(key, fingerprint)
+
+            if state == 'mismatch':
+                return jsonify({'error': f'{self.HEADER} was already used with a different request body'}), 422
+            if state == 'hit':
+                cached = entry['response']
+                if cached is None:
+                    response = jsonify({'error': 'Original request is still in progress', 'retry_after': 1})
+                    response.status_code = 409
+                    response.headers['Retry-After'] = '1'
+                    return response
+                response = Response(cached['chunks'], status=cached['status'], mimetype=cached['mimetype'])
+                response.headers['Idempotent-Replayed'] = 'true'
+                return response
+
+            try:
+                response = make_response(f(*args, **kwargs))
+            except Exception:
+                self.abort(key)
+                raise
+
+            # Only successful creations are remembered; rejections may be retried
+            if not 200 <= response.status_code < 300:
+                self.abort(key)
+                return response
+
+            if not response.is_streamed:
+                self.complete(key, response.status_code, [response.get_data()], response.mimetype)
+                return response
+
+            response.response = RecordingBody(self, key, response.response, response.status_code, response.mimetype)
+            return response
+        return decorated_function
+
+class RecordingBody:
+    """Streamed response body that keeps what it sends and settles the key when done
+
+    The WSGI server calls close() once the response is over, whether the
+    client read all of it, went away halfway or never read it. Whatever
+    was not sent is serialized then, so the client's retry gets the full
+    result; a body that fails releases the key instead.
+    """
+
+    def __init__(self, cache, key, body, status, mimetype):
+        self.cache = cache
+        self.key = key
+        self.body = iter(body)
+        self.source = body
+        self.status = status
+        self.mimetype = mimetype
+        self.chunks = []
+        self.settled = False
+
+    def __iter__(self):
+        try:
+            for chunk in self.body:
+                self.chunks.append(chunk)
+                yield chunk
+        except Exception:
+            self._settle(failed=True)
+            raise
+        self._settle()
+
+    def close(self):
+        self._settle()
+
+    def _settle(self, failed=False):
+        if self.settled:
+            return
+        self.settled = True
+        try:
+            if not failed:
+                self.chunks.extend(self.body)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            if failed:
+                self.cache.abort(self.key)
+            else:
+                self.cache.complete(self.key, self.status, self.chunks, self.mimetype)
+            if hasattr(self.source, 'close'):
+                self.source.close()
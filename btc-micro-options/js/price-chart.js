@@ -6,8 +6,11 @@ class PriceChart {
         this.chartInstance = null;
         this.priceData = [];
         this.labels = [];
-        this.maxDataPoints = 100;
+        this.maxDataPoints = 300;
         this.strikeLines = [];
+        this.resolution = '1s';      // bar resolution: 1s, 10s, 1m or 5m
+        this.barTimes = [];          // bar start times (epoch seconds), parallel to priceData
+        this.historyTimer = null;
         this.init();
     }
 
@@ -91,9 +94,60 @@ class PriceChart {
         this.chartInstance.update();
     }
 
+    async loadHistory(resolution = this.resolution) {
+        // Replace the chart with the server's OHLC bars (closing prices)
+        this.resolution = resolution;
+        const response = await fetch(`/api/price_history?resolution=${resolution}&limit=${this.maxDataPoints}`);
+        if (!response.ok) return;
+        const bars = await response.json();
+        
+        this.priceData = bars.map(bar => bar.close);
+        this.labels = bars.map(bar => new Date(bar.time * 1000).toLocaleTimeString());
+        this.barTimes = bars.map(bar => bar.time);
+        this.chartInstance.data.datasets[0].data = this.priceData;
+        this.chartInstance.data.labels = this.labels;
+        this.chartInstance.update();
+    }
+
+    async refreshHistory() {
+        // Fetch only bars since the last one shown; the last bar is re-sent while it is still open
+        if (this.barTimes.length === 0) {
+            return this.loadHistory();
+        }
+        const since = this.barTimes[this.barTimes.length - 1];
+        const response = await fetch(`/api/price_history?resolution=${this.resolution}&since=${since}`);
+        if (!response.ok) return;
+        const bars = await response.json();
+        
+        bars.forEach(bar => {
+            const last = this.barTimes.length - 1;
+            if (last >= 0 && bar.time === this.barTimes[last]) {
+                this.priceData[last] = bar.close;
+            } else {
+                this.priceData.push(bar.close);
+                this.labels.push(new Date(bar.time * 1000).toLocaleTimeString());
+                this.barTimes.push(bar.time);
+            }
+        });
+        
+        // Keep the chart to maxDataPoints bars
+        const excess = this.priceData.length - this.maxDataPoints;
+        if (excess > 0) {
+            this.priceData.splice(0, excess);
+            this.labels.splice(0, excess);
+            this.barTimes.splice(0, excess);
+        }
+        this.chartInstance.update();
+    }
+
+    setResolution(resolution) {
+        return this.loadHistory(resolution);
+    }
+
     clearData() {
         this.priceData = [];
         this.labels = [];
+        this.barTimes = [];
         this.chartInstance.data.datasets[0].data = this.priceData;
         this.chartInstance.data.labels = this.labels;
         this.chartInstance.update();
@@ -173,23 +227,14 @@ class PriceChart {
 
     setSimulationMode(enabled) {
         if (enabled) {
-            // Start price simulation
-            this.simulationTimer = setInterval(() => {
-                const lastPrice = this.priceData.length > 0 ? 
-                    this.priceData[this.priceData.length - 1] : 
-                    40000;
-                
-                // Simulate small price changes
-                const change = (Math.random() - 0.5) * 100;
-                const newPrice = lastPrice + change;
-                
-                this.addPrice(newPrice);
-            }, 1000);
+            // Follow the server-side simulation through its bar history
+            this.loadHistory();
+            this.historyTimer = setInterval(() => this.refreshHistory(), 1000);
         } else {
-            // Stop simulation
-            if (this.simulationTimer) {
-                clearInterval(this.simulationTimer);
-                this.simulationTimer = null;
+            // Stop polling
+            if (this.historyTimer) {
+                clearInterval(this.historyTimer);
+                this.historyTimer = null;
             }
         }
     }
@@ -52,17 +52,17 @@ def lovable_logout():
     session.pop('lovable_token', None)
     return redirect(url_for('index'))
 
-def get_lovable_headers():
-    """Get headers for Lovable API requests"""
+def get_lovable_headers(token=None):
+    """Get headers for Lovable API requests (token defaults to the session's)"""
     return {
-        'Authorization': f"Bearer {session.get('lovable_token')}",
+        'Authorization': f"Bearer {token or session.get('lovable_token')}",
         'Content-Type': 'application/json'
     }
 
-def sync_with_lovable(data):
-    """Sync data with Lovable"""
+def sync_with_lovable(data, token=None):
+    """Sync data with Lovable; pass token when calling outside a request"""
     sync_url = f"{LOVABLE_API_URL}/projects/{LOVABLE_PROJECT_ID}/sync"
-    headers = get_lovable_headers()
+    headers = get_lovable_headers(token)
     
     try:
         response = requests.post(sync_url, json=data, headers=headers)
@@ -1,6 +1,7 @@
 # main.py
 import asyncio
 import json
+import os
 import time
 import random
 import pandas as pd
@@ -16,21 +17,77 @@ from option_pricing import MicroOptionPricing
 from hedging_system import CrossPlatformHedging
 from dynamic_fees import DynamicFeeAdjuster
 from web3_simulator import Web3Simulator
+from tick_store import TickStore
+from market_data import MarketDataAggregator
+from tick_recorder import TickRecorder
+from feed_connection import FeedStaleError
+from clock import SystemClock
+from realized_vol import RealizedVolatility
+from vol_surface import VolSurface
+from garch import GarchForecaster
 
 class BTCMicroOptionsSystem:
-    def __init__(self, initial_liquidity=1200000):
+    def __init__(self, initial_liquidity=1200000, multi_venue=False, clock=None, seed=None, conflate=False):
+        # Shared clock and per-component seeds, so a replay is reproducible
+        self.clock = clock or SystemClock()
+        seeds = random.Random(seed)
+        
+        # Tick history shared by the feed, fee logic and API
+        self.tick_store = TickStore(capacity=1000, clock=self.clock)
+        
+        # Every tick is also kept on disk when a recording directory is configured
+        record_dir = os.getenv('TICK_RECORD_DIR')
+        self.recorder = TickRecorder(record_dir) if record_dir else None
+        
+        # Realized volatility shared by the fee logic and the volatility surface,
+        # which prices off GARCH forecasts once they have been fitted. Refits run
+        # on a worker thread only live; on a simulated clock (replays) they run
+        # inline in the tick loop so results don't depend on thread timing
+        self.realized_vol = RealizedVolatility()
+        self.garch = GarchForecaster(self.tick_store, clock=self.clock,
+                                     background=isinstance(self.clock, SystemClock))
+        self.vol_surface = VolSurface(self.realized_vol, clock=self.clock, forecaster=self.garch)
+        
         # Initialize components
-        self.data_feed = BTCDataFeed(self.on_price_update)
-        self.pricing_model = MicroOptionPricing()
-        self.hedging_system = CrossPlatformHedging(liquidity_pool_size=initial_liquidity)
-        self.fee_adjuster = DynamicFeeAdjuster()
+        self.data_feed = BTCDataFeed(
+            self.on_price_update,
+            tick_store=self.tick_store,
+            recorder=self.recorder,
+            clock=self.clock,
+            seed=seeds.getrandbits(32),
+            conflate=conflate  # deliver only the latest tick when the engine falls behind
+        )
+        self.pricing_model = MicroOptionPricing(vol_surface=self.vol_surface)
+        self.hedging_system = CrossPlatformHedging(
+            liquidity_pool_size=initial_liquidity,
+            price_source=lambda: self.current_quote['price'],
+            clock=self.clock,
+            seed=seeds.getrandbits(32)
+        )
+        self.fee_adjuster = DynamicFeeAdjuster(
+            clock=self.clock,
+            realized_vol=self.realized_vol,
+            seed=seeds.getrandbits(32)
+        )
         self.web3_simulator = Web3Simulator()
         
+        # Latest quote used for pricing and hedging: the single feed's ticker, or
+        # the consolidated best bid/offer across the hedging venues
+        self.current_quote = dict(self.data_feed.current_data)
+        self.market_data = None
+        if multi_venue:
+            venues = {name: config['url'] for name, config in self.hedging_system.platforms.items()
+                      if config['status'] == 'active'}
+            self.market_data = MarketDataAggregator(
+                venues, tick_store=self.tick_store, recorder=self.recorder, clock=self.clock, conflate=conflate,
+                seed=seeds.getrandbits(32)
+            )
+            self.market_data.subscribe(self.on_price_update, 'engine')
+        self.price_feed = self.market_data or self.data_feed
+        
         # Portfolio tracking
         self.options = []
         self.liquidity = initial_liquidity
-        self.price_history = []
-        self.max_history_length = 1000
         self.portfolio_metrics = {
             'delta': 0,
             'gamma': 0,
@@ -60,7 +117,8 @@ class BTCMicroOptionsSystem:
         await self.hedging_system.connect_to_platforms()
         
         # Start price feed in a separate thread
-        price_thread = Thread(target=self.data_feed.run)
+        feed_target = self.market_data.run_forever if self.market_data else self.data_feed.run
+        price_thread = Thread(target=feed_target)
         price_thread.daemon = True
         price_thread.start()
         
@@ -76,43 +134,61 @@ class BTCMicroOptionsSystem:
         """Main simulation loop"""
         while self.is_running:
             try:
-                # Process expired options
-                await self.process_option_expirations()
-                
-                # Update portfolio metrics
-                self.update_portfolio_metrics()
-                
-                # Rebalance hedges if needed
-                await self.hedging_system.check_and_rebalance(self.portfolio_metrics['delta'])
-                
-                # Update liquidity from hedging
-                liquidity_update = self.hedging_system.update_liquidity_from_hedges()
-                self.liquidity = liquidity_update["current_liquidity"]
-                
-                # Dynamic fee adjustment
-                if self.price_history:
-                    prices = [p['price'] for p in self.price_history[-30:]]
-                    volume = self.platform_stats['volume'] or 100000  # Default if no volume yet
-                    new_fee = self.fee_adjuster.update_fee_rate(prices, volume)
-                
-                await asyncio.sleep(1)  # Main loop frequency
+                await self.step()
+                await self.clock.async_sleep(1)  # Main loop frequency
                 
             except Exception as e:
                 print(f"Error in simulation loop: {e}")
-                await asyncio.sleep(1)
+                await self.clock.async_sleep(1)
+    
+    async def step(self):
+        """One pass of expiries, Greeks, hedging and fees (also driven by replays)"""
+        # One clock read per pass, shared by every option
+        now = self.clock.now()
+        
+        # Refit GARCH (on its worker) and recalibrate the volatility surface off the order path
+        self.garch.maybe_refit()
+        self.vol_surface.maybe_calibrate()
+        
+        # Process expired options
+        await self.process_option_expirations(now)
+        
+        # Update portfolio metrics
+        self.update_portfolio_metrics(now)
+        
+        # Rebalance hedges if needed
+        await self.hedging_system.check_and_rebalance(
+            self.portfolio_metrics['delta'], now,
+            gamma=self.portfolio_metrics['gamma'], volatility=self.vol_surface.atm_vol()
+        )
+        
+        # Update liquidity from hedging
+        liquidity_update = self.hedging_system.update_liquidity_from_hedges()
+        self.liquidity = liquidity_update["current_liquidity"]
+        
+        # Dynamic fee adjustment (volatility is tracked tick by tick in on_price_update)
+        volume = self.platform_stats['volume'] or 100000  # Default if no volume yet
+        new_fee = self.fee_adjuster.update_fee_rate(volume)
     
     def on_price_update(self, price_data):
         """Handle price updates from the data feed"""
-        with self.lock:
-            # Store price history
-            self.price_history.append(price_data)
-            if len(self.price_history) > self.max_history_length:
-                self.price_history.pop(0)
+        # Price history is recorded by the feed into the shared tick store
+        self.current_quote = price_data
+        # Conflated deliveries skip ticks, but returns are scaled by elapsed time
+        timestamp = self.clock.time()
+        self.fee_adjuster.on_tick(price_data['price'], timestamp)
+        self.garch.update(price_data['price'], timestamp)
+        self.hedging_system.on_price(price_data['price'])
     
     async def create_option(self, option_type, strike_price, expiry_seconds, quantity=1):
         """Create a new option contract"""
         with self.lock:
-            current_price = self.data_feed.current_data['price']
+            # Never quote off a stale price: the feed is reconnecting or silent
+            if self.price_feed.is_stale():
+                raise FeedStaleError("Quoting paused: price feed is stale")
+            
+            current_price = self.current_quote['price']
+            now = self.clock.now()
             
             # Calculate time to expiry in years
             time_to_expiry = expiry_seconds / (365 * 24 * 60 * 60)
@@ -138,6 +214,7 @@ class BTCMicroOptionsSystem:
             option['fee_rate'] = fee_rate
             option['fee_amount'] = base_premium * fee_rate * quantity
             option['entry_price'] = current_price
+            option['expiry_ts'] = now.timestamp() + expiry_seconds  # epoch seconds on the engine clock
             
             # Calculate Greeks for this option
             greeks = self.pricing_model.calculate_greeks(
@@ -159,29 +236,30 @@ class BTCMicroOptionsSystem:
             self.platform_stats['fees_collected'] += option['fee_amount']
             
             # Update portfolio metrics
-            self.update_portfolio_metrics()
+            self.update_portfolio_metrics(now)
             
-            # Trigger hedging
-            hedge_result = await self.hedging_system.check_and_rebalance(self.portfolio_metrics['delta'])
+            # Trigger hedging (netted with other orders unless past the hard limit)
+            hedge_result = await self.hedging_system.on_exposure_change(
+                self.portfolio_metrics['delta'], now,
+                gamma=self.portfolio_metrics['gamma'], volatility=self.vol_surface.atm_vol()
+            )
             
             # Log the transaction
             print(f"💎 Created {option_type} option: strike=${strike_price}, premium=${premium_with_fee:.2f}, expiry={expiry_seconds}s")
             
             return option
     
-    async def process_option_expirations(self):
+    async def process_option_expirations(self, now=None):
         """Check and process expired options"""
-        current_price = self.data_feed.current_data['price']
-        now = datetime.now()
+        current_price = self.current_quote['price']
+        current_ts = (now or self.clock.now()).timestamp()
         
         for option in self.options:
             if option['status'] != 'active':
                 continue
-                
-            expiry_time = datetime.fromisoformat(option['expiry_time'])
             
             # Check if option has expired
-            if now >= expiry_time:
+            if current_ts >= option['expiry_ts']:
                 # Exercise option if in-the-money
                 result = self.web3_simulator.exercise_option(option['id'], current_price)
                 
@@ -192,23 +270,21 @@ class BTCMicroOptionsSystem:
                 else:
                     print(f"⏱️ Option {option['id']} expired worthless")
     
-    def update_portfolio_metrics(self):
+    def update_portfolio_metrics(self, now=None):
         """Calculate portfolio-wide Greeks"""
-        current_price = self.data_feed.current_data['price']
+        current_price = self.current_quote['price']
+        current_ts = (now or self.clock.now()).timestamp()
         portfolio_greeks = {'delta': 0, 'gamma': 0, 'theta': 0, 'vega': 0}
         
         for option in self.options:
             if option['status'] != 'active':
                 continue
-                
-            # Calculate time to expiry
-            expiry_time = datetime.fromisoformat(option['expiry_time'])
-            now = datetime.now()
             
-            if now >= expiry_time:
+            # Calculate time to expiry
+            seconds_to_expiry = option['expiry_ts'] - current_ts
+            if seconds_to_expiry <= 0:
                 continue  # Skip expired options
-                
-            seconds_to_expiry = (expiry_time - now).total_seconds()
+            
             time_to_expiry = seconds_to_expiry / (365 * 24 * 60 * 60)  # Convert to years
             
             # Calculate current Greeks
@@ -224,7 +300,7 @@ class BTCMicroOptionsSystem:
     
     def get_platform_status(self):
         """Get overall platform status"""
-        current_price = self.data_feed.current_data['price']
+        current_price = self.current_quote['price']
         
         return {
             'price': current_price,
@@ -235,9 +311,31 @@ class BTCMicroOptionsSystem:
             'fee_rate': f"{self.fee_adjuster.current_fee*100:.3f}%",
             'hedging': {
                 'platforms': self.hedging_system.platforms,
-                'hedge_positions': len(self.hedging_system.hedge_positions)
+                'hedge_positions': self.hedging_system.positions.fill_count,
+                'positions': self.hedging_system.positions.to_dict(current_price),
+                'execution': self.hedging_system.execution_stats,
+                'pnl': self.hedging_system.marker.to_dict(),
+                'routing': self.hedging_system.router.get_stats(),
+                'health': self.hedging_system.health.get_stats(),
+                'netting': self.hedging_system.netter.get_stats(),
+                'policy': self.hedging_system.policy.get_stats()
             },
-            'stats': self.platform_stats
+            'stats': self.platform_stats,
+            'feed': self.get_feed_status()
+        }
+    
+    def get_feed_status(self):
+        """Feed freshness and connection metrics (reconnect latency, outages, gaps)"""
+        if self.market_data:
+            connections = self.market_data.get_connection_metrics()
+        else:
+            connections = {'coinbase': self.data_feed.connection.get_metrics()}
+            connections['coinbase']['decoder'] = self.data_feed.decoder.stats
+        return {
+            'stale': self.price_feed.is_stale(),
+            'quoting_paused': self.price_feed.is_stale(),
+            'connections': connections,
+            'subscribers': self.price_feed.get_subscriber_stats()
         }
 
 # Flask API for frontend
@@ -256,17 +354,33 @@ def get_options():
 def create_option():
     data = request.json
     loop = asyncio.new_event_loop()
-    option = loop.run_until_complete(options_system.create_option(
-        data.get('type', 'call'),
-        float(data.get('strike', options_system.data_feed.current_data['price'])),
-        int(data.get('expiry', 120)),  # Default 120 seconds
-        float(data.get('quantity', 1))
-    ))
+    try:
+        option = loop.run_until_complete(options_system.create_option(
+            data.get('type', 'call'),
+            float(data.get('strike', options_system.current_quote['price'])),
+            int(data.get('expiry', 120)),  # Default 120 seconds
+            float(data.get('quantity', 1))
+        ))
+    except FeedStaleError as e:
+        response = jsonify({'error': str(e), 'retry_after': 1})
+        response.status_code = 503
+        response.headers['Retry-After'] = '1'
+        return response
     return jsonify(option)
 
 @app.route('/api/price', methods=['GET'])
 def get_price():
-    return jsonify(options_system.data_feed.current_data)
+    return jsonify(options_system.current_quote)
+
+@app.route('/api/venues', methods=['GET'])
+def get_venues():
+    if options_system.market_data is None:
+        return jsonify({'error': 'Multi-venue market data is not enabled'}), 404
+    return jsonify({
+        'bbo': options_system.market_data.bbo,
+        'quotes': options_system.market_data.get_quote_table(),
+        'stats': options_system.market_data.stats
+    })
 
 @app.route('/api/metrics', methods=['GET'])
 def get_metrics():
@@ -278,8 +392,12 @@ def get_metrics():
         },
         'hedging': {
             'platforms': options_system.hedging_system.platforms,
-            'positions': options_system.hedging_system.hedge_positions
-        }
+            'positions': options_system.hedging_system.positions.to_dict(options_system.current_quote['price']),
+            'recent_fills': options_system.hedging_system.positions.recent_fills(10),
+            'pnl': options_system.hedging_system.marker.series.to_records(300),
+            'books': {venue: book.to_dict(5) for venue, book in options_system.hedging_system.exchange_simulator.books.items()}
+        },
+        'feed': options_system.get_feed_status()
     })
 
 def run_server():
@@ -0,0 +1,113 @@
+# mark_to_market.py
+import numpy as np
+
+FUNDING_INTERVAL = 8 * 60 * 60  # seconds; perpetual funding rates are quoted per 8 hours
+
+class PnLSeries:
+    """Fixed-size ring of hedge PnL marks in preallocated float64 columns
+
+    Same layout as TickStore: each mark is written at slot i and i + capacity,
+    so the last n marks are one contiguous slice.
+    """
+
+    TIME, REALIZED, UNREALIZED, FUNDING, TOTAL = range(5)
+    COLUMNS = ('timestamp', 'realized', 'unrealized', 'funding', 'total')
+
+    def __init__(self, capacity=7200):
+        self.capacity = capacity
+        self.data = np.zeros((5, 2 * capacity), dtype=np.float64)
+        self.count = 0
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, timestamp, realized, unrealized, funding, total):
+        slot = self.count % self.capacity
+        self.data[:, slot] = self.data[:, slot + self.capacity] = (timestamp, realized, unrealized, funding, total)
+        self.count += 1
+
+    def window(self, n=None):
+        """Zero-copy view of the last n marks, shape (5, n)"""
+        n = min(len(self) if n is None else n, len(self))
+        end = self.count % self.capacity + self.capacity
+        return self.data[:, end - n:end]
+
+    def to_records(self, limit=300, since=None):
+        window = self.window()
+        if since is not None:
+            window = window[:, np.searchsorted(window[self.TIME], since, side='right'):]
+        window = window[:, -limit:] if limit else window
+        return [dict(zip(self.COLUMNS, column)) for column in window.T.tolist()]
+
+class HedgeMarker:
+    """Marks a PositionKeeper's per-venue hedges to the feed price
+
+    Hedges are perpetual swaps, so besides price PnL they pay (long) or
+    receive (short) funding: size * price * rate per FUNDING_INTERVAL,
+    accrued pro rata to the time between marks. Venue sizes, costs and
+    funding rates are held in arrays rebuilt only when a fill lands, so a
+    mark is a couple of vector operations and can run on every tick. Each
+    mark is appended to the PnL series.
+    """
+
+    def __init__(self, positions, funding_rates=None, default_funding_rate=0.0001, series_size=7200):
+        self.positions = positions
+        self.funding_rates = dict(funding_rates or {})
+        self.default_funding_rate = default_funding_rate
+        self.series = PnLSeries(series_size)
+        self.venues = []
+        self.sizes = np.zeros(0)
+        self.avg_prices = np.zeros(0)
+        self.rates = np.zeros(0)
+        self.venue_funding = np.zeros(0)    # funding accrued per venue (negative = paid)
+        self.version = None                 # keeper version the arrays were built from
+        self.last_time = None
+        self.last_mark = {'price': None, 'realized': 0.0, 'unrealized': 0.0, 'funding': 0.0, 'total': 0.0}
+
+    def set_funding_rate(self, venue, rate):
+        """Update a venue's funding rate (per FUNDING_INTERVAL, positive: longs pay)"""
+        self.funding_rates[venue] = rate
+        self.version = None
+
+    def _refresh(self):
+        # Fills are rare next to ticks, so the arrays are rebuilt only after one
+        positions = self.positions.positions
+        accrued = dict(zip(self.venues, self.venue_funding))
+        self.venues = list(positions)
+        self.sizes = np.array([positions[v]['size'] for v in self.venues], dtype=np.float64)
+        self.avg_prices = np.array([positions[v]['avg_price'] for v in self.venues], dtype=np.float64)
+        self.rates = np.array([self.funding_rates.get(v, self.default_funding_rate) for v in self.venues])
+        self.venue_funding = np.array([accrued.get(v, 0.0) for v in self.venues], dtype=np.float64)
+        self.version = self.positions.version
+
+    def mark(self, price, timestamp):
+        """Revalue every venue at `price`, accrue funding since the last mark; returns total PnL"""
+        if self.last_time is not None and timestamp > self.last_time:
+            # Funding on the position held since the last mark, i.e. the arrays from before any new fill
+            accrual = self.sizes * self.rates * (price * (timestamp - self.last_time) / FUNDING_INTERVAL)
+            self.venue_funding -= accrual
+        self.last_time = timestamp
+
+        if self.version != self.positions.version:
+            self._refresh()
+
+        realized = float(self.positions.realized_pnl)
+        unrealized = float(np.dot(self.sizes, price - self.avg_prices))
+        funding = float(self.venue_funding.sum())
+        total = realized + unrealized + funding
+        self.series.append(timestamp, realized, unrealized, funding, total)
+        self.last_mark = {'price': price, 'realized': realized, 'unrealized': unrealized,
+                          'funding': funding, 'total': total}
+        return total
+
+    def to_dict(self):
+        by_venue = {}
+        price = self.last_mark['price']
+        for i, venue in enumerate(self.venues):
+            by_venue[venue] = {
+                'size': float(self.sizes[i]),
+                'unrealized': float(self.sizes[i] * (price - self.avg_prices[i])) if price else 0.0,
+                'funding': float(self.venue_funding[i]),
+                'funding_rate': float(self.rates[i]),
+            }
+        return dict(self.last_mark, venues=by_venue, marks=self.series.count)
@@ -0,0 +1,222 @@
+# market_data.py
+import asyncio
+import random
+import time
+from feed_connection import FeedConnectionManager
+from feed_decoder import make_prefiltered_decoder
+from clock import SystemClock
+from conflation import TickConflator
+
+# Venue subscription messages (None when the stream URL already selects the channel)
+SUBSCRIPTIONS = {
+    "coinbase": {"type": "subscribe", "channels": [{"name": "ticker", "product_ids": ["BTC-USD"]}]},
+    "kraken": {"event": "subscribe", "pair": ["XBT/USD"], "subscription": {"name": "ticker"}},
+}
+
+# Substrings every relevant frame contains, checked before full JSON parsing
+PREFILTERS = {
+    "coinbase": '"ticker"',
+    "kraken": '"ticker"',
+}
+
+def parse_binance(message):
+    """Binance bookTicker / 24hrTicker: {"b": bid, "a": ask, "c": last}"""
+    if not isinstance(message, dict) or 'b' not in message or 'a' not in message:
+        return None
+    bid = float(message['b'])
+    ask = float(message['a'])
+    last = float(message['c']) if 'c' in message else (bid + ask) / 2
+    return bid, ask, last
+
+def parse_coinbase(message):
+    """Coinbase ticker: {"type": "ticker", "best_bid", "best_ask", "price"}"""
+    if not isinstance(message, dict) or message.get('type') != 'ticker':
+        return None
+    return float(message['best_bid']), float(message['best_ask']), float(message['price'])
+
+def parse_kraken(message):
+    """Kraken ticker: [channel_id, {"b": [bid, ...], "a": [ask, ...], "c": [last, ...]}, "ticker", pair]"""
+    if not isinstance(message, list) or len(message) < 4 or message[2] != 'ticker':
+        return None
+    payload = message[1]
+    return float(payload['b'][0]), float(payload['a'][0]), float(payload['c'][0])
+
+def parse_generic(message):
+    """Fallback for simple {"bid", "ask", "price"} messages (e.g. local stand-in venues)"""
+    if not isinstance(message, dict) or 'bid' not in message or 'ask' not in message:
+        return None
+    bid = float(message['bid'])
+    ask = float(message['ask'])
+    return bid, ask, float(message.get('price', (bid + ask) / 2))
+
+PARSERS = {
+    "binance": parse_binance,
+    "coinbase": parse_coinbase,
+    "kraken": parse_kraken,
+}
+
+class MarketDataAggregator:
+    """Concurrent multi-venue quote subscriptions with a consolidated best bid/offer
+
+    venues: {name: url} or {name: {"url", "subscribe", "parser"}}. Each venue
+    keeps its latest normalized quote; every update recomputes the consolidated
+    BBO over the venues (O(venues)) and publishes it to subscribers.
+    """
+
+    def __init__(self, venues, tick_store=None, recorder=None, max_quote_age=5.0, clock=None, conflate=False,
+                 seed=None, **connection_options):
+        self.clock = clock or SystemClock()
+        seeds = random.Random(seed)     # per-venue seeds for the connections' backoff jitter
+        self.venues = {}
+        self.connections = {}
+        for name, config in venues.items():
+            if isinstance(config, str):
+                config = {"url": config}
+            self.venues[name] = {
+                "url": config["url"],
+                "subscribe": config.get("subscribe", SUBSCRIPTIONS.get(name)),
+                "parser": config.get("parser", PARSERS.get(name, parse_generic)),
+            }
+            # Each venue gets its own resilient connection (backoff, heartbeats). Gap detection
+            # needs a field that increases by exactly one per message, which no ticker channel
+            # here has (Coinbase's trade_id skips the matches between tickers), so it is opt-in
+            self.connections[name] = FeedConnectionManager(
+                name,
+                config["url"],
+                on_message=lambda message, venue=name: self.on_message(venue, message),
+                subscribe=self.venues[name]["subscribe"],
+                decode=make_prefiltered_decoder(config.get("prefilter", PREFILTERS.get(name))),
+                sequence_key=config.get("sequence_key"),
+                clock=self.clock,
+                seed=seeds.getrandbits(64),
+                **connection_options
+            )
+
+        self.tick_store = tick_store
+        self.recorder = recorder                # optional TickRecorder for raw venue quotes
+        self.max_quote_age = max_quote_age      # seconds before a venue's quote is ignored
+        self.quotes = {}                        # per-venue latest quote
+        self.bbo = None                         # consolidated best bid/offer
+        self.subscribers = []
+        self.conflator = TickConflator() if conflate else None  # latest-BBO delivery for slow consumers
+        self.is_running = False
+        self.stats = {
+            "messages": 0,
+            "updates": 0,
+            "parse_errors": 0,
+            "fan_in_us": 0.0,                   # EWMA of per-message processing time
+        }
+
+    def subscribe(self, callback, name=None):
+        """Register a callable receiving each consolidated BBO update"""
+        if self.conflator is not None:
+            return self.conflator.subscribe(callback, name)
+        self.subscribers.append(callback)
+
+    def on_message(self, venue, message):
+        """Normalize one decoded venue message and fold it into the consolidated book"""
+        started = time.perf_counter()
+        self.stats["messages"] += 1
+        try:
+            parsed = self.venues[venue]["parser"](message)
+        except (ValueError, KeyError, TypeError, IndexError):
+            self.stats["parse_errors"] += 1
+            return None
+        if parsed is None:
+            return None
+
+        bid, ask, last = parsed
+        now = self.clock.time()
+        self.quotes[venue] = {"bid": bid, "ask": ask, "price": last, "time": now}
+        if self.recorder is not None:
+            self.recorder.record(last, bid, ask, venue, int(now * 1e9))
+        bbo = self.update_bbo(now)
+
+        elapsed_us = (time.perf_counter() - started) * 1e6
+        self.stats["fan_in_us"] += 0.05 * (elapsed_us - self.stats["fan_in_us"])
+        return bbo
+
+    def update_bbo(self, now=None):
+        """Recompute the consolidated best bid/offer from fresh venue quotes"""
+        now = self.clock.time() if now is None else now
+        best_bid = best_ask = None
+        bid_venue = ask_venue = None
+
+        for venue, quote in self.quotes.items():
+            if now - quote["time"] > self.max_quote_age:
+                continue
+            if best_bid is None or quote["bid"] > best_bid:
+                best_bid, bid_venue = quote["bid"], venue
+            if best_ask is None or quote["ask"] < best_ask:
+                best_ask, ask_venue = quote["ask"], venue
+
+        if best_bid is None:
+            return None
+
+        mid = (best_bid + best_ask) / 2
+        self.bbo = {
+            "price": mid,
+            "bid": best_bid,
+            "ask": best_ask,
+            "bid_venue": bid_venue,
+            "ask_venue": ask_venue,
+            "crossed": best_bid > best_ask,
+            "time": now,
+        }
+        self.stats["updates"] += 1
+
+        if self.tick_store is not None:
+            self.tick_store.append(mid, best_bid, best_ask, now)
+        if self.conflator is not None:
+            self.conflator.publish(self.bbo)
+        for callback in self.subscribers:
+            callback(self.bbo)
+        return self.bbo
+
+    def get_quote_table(self):
+        """Per-venue quotes with their age in seconds"""
+        now = self.clock.time()
+        return {
+            venue: dict(quote, age=now - quote["time"], stale=now - quote["time"] > self.max_quote_age)
+            for venue, quote in self.quotes.items()
+        }
+
+    def is_stale(self):
+        """True when no venue is delivering fresh quotes"""
+        return all(connection.is_stale() for connection in self.connections.values())
+
+    def get_subscriber_stats(self):
+        return self.conflator.get_stats() if self.conflator is not None else {}
+
+    def get_connection_metrics(self):
+        return {venue: connection.get_metrics() for venue, connection in self.connections.items()}
+
+    async def _venue_loop(self, venue):
+        await self.connections[venue].run()
+        # Drop the venue from the consolidated book once it is shut down
+        if self.quotes.pop(venue, None) is not None:
+            self.update_bbo()
+
+    async def run(self):
+        """Subscribe to every venue concurrently until stopped
+
+        A venue whose loop fails is logged and left down; the others keep running.
+        """
+        self.is_running = True
+        results = await asyncio.gather(*(self._venue_loop(venue) for venue in self.venues), return_exceptions=True)
+        for venue, result in zip(self.venues, results):
+            if isinstance(result, Exception):
+                print(f"❌ Market data for {venue} stopped: {result!r}")
+
+    def stop(self):
+        self.is_running = False
+        for connection in self.connections.values():
+            connection.stop()
+        if self.conflator is not None:
+            self.conflator.stop()
+
+    def run_forever(self):
+        """Run the aggregator on its own event loop (thread target)"""
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(self.run())
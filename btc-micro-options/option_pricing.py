@@ -4,17 +4,25 @@ import scipy.stats as stats
 import math
 
 class MicroOptionPricing:
-    def __init__(self, risk_free_rate=0.03, volatility=0.7):
+    def __init__(self, risk_free_rate=0.03, volatility=0.7, vol_surface=None):
         self.risk_free_rate = risk_free_rate
         self.volatility = volatility
+        self.vol_surface = vol_surface  # when set, every call looks its volatility up here
+    
+    def sigma(self, S, K, T):
+        """Volatility for this strike and expiry (flat without a surface)"""
+        if self.vol_surface is None:
+            return self.volatility
+        return self.vol_surface.vol(T, K, S)
     
     def call_price(self, S, K, T):
         """Calculate call option price using Black-Scholes"""
         if T <= 0:
             return max(0, S - K)
             
-        d1 = (np.log(S/K) + (self.risk_free_rate + 0.5 * self.volatility**2) * T) / (self.volatility * np.sqrt(T))
-        d2 = d1 - self.volatility * np.sqrt(T)
+        sigma = self.sigma(S, K, T)
+        d1 = (np.log(S/K) + (self.risk_free_rate + 0.5 * sigma**2) * T) / (sigma * np.sqrt(T))
+        d2 = d1 - sigma * np.sqrt(T)
         
         call = S * stats.norm.cdf(d1) - K * np.exp(-self.risk_free_rate * T) * stats.norm.cdf(d2)
         return call
@@ -24,8 +32,9 @@ class MicroOptionPricing:
         if T <= 0:
             return max(0, K - S)
             
-        d1 = (np.log(S/K) + (self.risk_free_rate + 0.5 * self.volatility**2) * T) / (self.volatility * np.sqrt(T))
-        d2 = d1 - self.volatility * np.sqrt(T)
+        sigma = self.sigma(S, K, T)
+        d1 = (np.log(S/K) + (self.risk_free_rate + 0.5 * sigma**2) * T) / (sigma * np.sqrt(T))
+        d2 = d1 - sigma * np.sqrt(T)
         
         put = K * np.exp(-self.risk_free_rate * T) * stats.norm.cdf(-d2) - S * stats.norm.cdf(-d1)
         return put
@@ -39,8 +48,9 @@ class MicroOptionPricing:
             else:
                 return {'delta': -1.0 if S < K else 0.0, 'gamma': 0.0, 'theta': 0.0, 'vega': 0.0}
         
-        d1 = (np.log(S/K) + (self.risk_free_rate + 0.5 * self.volatility**2) * T) / (self.volatility * np.sqrt(T))
-        d2 = d1 - self.volatility * np.sqrt(T)
+        sigma = self.sigma(S, K, T)
+        d1 = (np.log(S/K) + (self.risk_free_rate + 0.5 * sigma**2) * T) / (sigma * np.sqrt(T))
+        d2 = d1 - sigma * np.sqrt(T)
         
         # Calculate common terms
         norm_d1 = stats.norm.cdf(d1)
@@ -53,13 +63,13 @@ class MicroOptionPricing:
             delta = norm_d1 - 1
         
         # Gamma (same for calls and puts)
-        gamma = norm_prime_d1 / (S * self.volatility * np.sqrt(T))
+        gamma = norm_prime_d1 / (S * sigma * np.sqrt(T))
         
         # Theta
         if option_type == 'call':
-            theta = -S * norm_prime_d1 * self.volatility / (2 * np.sqrt(T)) - self.risk_free_rate * K * np.exp(-self.risk_free_rate * T) * stats.norm.cdf(d2)
+            theta = -S * norm_prime_d1 * sigma / (2 * np.sqrt(T)) - self.risk_free_rate * K * np.exp(-self.risk_free_rate * T) * stats.norm.cdf(d2)
         else:  # put
-            theta = -S * norm_prime_d1 * self.volatility / (2 * np.sqrt(T)) + self.risk_free_rate * K * np.exp(-self.risk_free_rate * T) * stats.norm.cdf(-d2)
+            theta = -S * norm_prime_d1 * sigma / (2 * np.sqrt(T)) + self.risk_free_rate * K * np.exp(-self.risk_free_rate * T) * stats.norm.cdf(-d2)
         
         # Vega (same for calls and puts)
         vega = S * np.sqrt(T) * norm_prime_d1
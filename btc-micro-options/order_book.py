@@ -0,0 +1,100 @@
+# order_book.py
+import bisect
+
+class L2Book:
+    """Local L2 order book of one venue, updated level by level
+
+    update() sets or removes one price level and keeps running totals of
+    size and notional per side, so the touch, the depth and the average
+    price of the resting liquidity are O(1) reads; only inserting or
+    removing a level touches the sorted price list.
+    """
+
+    def __init__(self, venue):
+        self.venue = venue
+        self.levels = {'bid': {}, 'ask': {}}        # side -> {price: size}
+        self.prices = {'bid': [], 'ask': []}        # side -> ascending prices
+        self.size = {'bid': 0.0, 'ask': 0.0}
+        self.notional = {'bid': 0.0, 'ask': 0.0}
+        self.updates = 0
+
+    def update(self, side, price, size):
+        """Set the size resting at `price` on `side` ('bid' or 'ask'); 0 removes the level"""
+        levels = self.levels[side]
+        old = levels.get(price, 0.0)
+        if size > 0:
+            if not old:
+                bisect.insort(self.prices[side], price)
+            levels[price] = size
+        elif old:
+            prices = self.prices[side]
+            del prices[bisect.bisect_left(prices, price)]
+            del levels[price]
+            size = 0.0
+        else:
+            return
+        if self.prices[side]:
+            self.size[side] += size - old
+            self.notional[side] += (size - old) * price
+        else:
+            # Empty side: reset the totals instead of carrying rounding residue
+            self.size[side] = self.notional[side] = 0.0
+        self.updates += 1
+
+    def best(self, side):
+        prices = self.prices[side]
+        if not prices:
+            return None
+        return prices[-1] if side == 'bid' else prices[0]
+
+    def mid(self):
+        bid, ask = self.best('bid'), self.best('ask')
+        if bid is None or ask is None:
+            return None
+        return (bid + ask) / 2
+
+    def depth(self, side):
+        """(best price, total size, density in BTC per $ away from the touch) or None
+
+        The density treats the side as evenly spread between the touch and
+        its far end: the average resting price is then half the width away
+        from the touch, which the running totals give without a scan.
+        """
+        best = self.best(side)
+        size = self.size[side]
+        if best is None or size <= 0:
+            return None
+        average = self.notional[side] / size
+        half_width = abs(average - best)
+        if half_width <= 0:
+            # One level: charge as if it were one price increment wide
+            half_width = max(best * 1e-5, 1e-9)
+        return best, size, size / (2 * half_width)
+
+    def walk(self, side, amount):
+        """Take up to `amount` from `side`, best price first: (filled, average price)"""
+        prices = self.prices[side]
+        levels = self.levels[side]
+        remaining = amount
+        notional = 0.0
+        while remaining > 1e-12 and prices:
+            price = prices[-1] if side == 'bid' else prices[0]
+            take = min(remaining, levels[price])
+            left = levels[price] - take
+            notional += take * price
+            remaining -= take
+            self.update(side, price, left if left > 1e-12 else 0.0)
+        filled = amount - remaining
+        return filled, (notional / filled if filled else None)
+
+    def to_dict(self, levels=10):
+        bids = self.prices['bid'][::-1][:levels]
+        asks = self.prices['ask'][:levels]
+        return {
+            'venue': self.venue,
+            'bids': [[p, self.levels['bid'][p]] for p in bids],
+            'asks': [[p, self.levels['ask'][p]] for p in asks],
+            'bid_size': self.size['bid'],
+            'ask_size': self.size['ask'],
+            'updates': self.updates,
+        }
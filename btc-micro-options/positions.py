@@ -0,0 +1,107 @@
+# positions.py
+from collections import deque
+
+class PositionKeeper:
+    """Net hedge position per venue, kept up to date fill by fill
+
+    apply_fill() is O(1): it moves the venue's net size and average cost
+    and books realized PnL when a fill reduces or flips the position, so
+    the net hedge and mark-to-market cost O(venues) however many fills
+    there have been. Individual fills only go to a bounded log (the most
+    recent fill_log_size) for display.
+    """
+
+    def __init__(self, fill_log_size=1000):
+        self.positions = {}     # venue -> {'size', 'avg_price', 'realized_pnl', 'fees', 'volume', 'fills', 'updated_at'}
+        self.fills = deque(maxlen=fill_log_size)
+        self.net_size = 0.0
+        self.realized_pnl = 0.0
+        self.fill_count = 0
+        self.version = 0        # bumped on every change to a venue's size or cost
+
+    def position(self, venue):
+        """The venue's position, created flat on first use"""
+        position = self.positions.get(venue)
+        if position is None:
+            position = self.positions[venue] = {
+                'size': 0.0,
+                'avg_price': 0.0,
+                'realized_pnl': 0.0,
+                'fees': 0.0,
+                'volume': 0.0,
+                'fills': 0,
+                'updated_at': None,
+            }
+        return position
+
+    @staticmethod
+    def _book(position, amount, price):
+        """Move a position by `amount` at `price` (average cost); returns the realized PnL"""
+        size = position['size']
+        new_size = size + amount
+        realized = 0.0
+        if size == 0 or (size > 0) == (amount > 0):
+            # Opening or adding: average the cost in
+            position['avg_price'] = (size * position['avg_price'] + amount * price) / new_size
+        else:
+            # Reducing: the closed part realizes against the average cost
+            closed = min(abs(amount), abs(size))
+            realized = closed * (price - position['avg_price']) * (1 if size > 0 else -1)
+            if abs(new_size) < 1e-12:
+                new_size = 0.0
+                position['avg_price'] = 0.0
+            elif (new_size > 0) != (size > 0):
+                # Flipped: the remainder opens at the fill price
+                position['avg_price'] = price
+        position['size'] = new_size
+        position['realized_pnl'] += realized
+        return realized
+
+    def apply_fill(self, venue, amount, price, timestamp=None, fee=0.0, **details):
+        """Book a fill of `amount` BTC (negative to sell) at `price`, paying `fee` ($); returns realized PnL"""
+        if not amount:
+            return 0.0
+        position = self.position(venue)
+        # Fees are realized as they are paid
+        realized = self._book(position, amount, price) - fee
+        position['realized_pnl'] -= fee
+        position['fees'] += fee
+        position['volume'] += abs(amount)
+        position['fills'] += 1
+        position['updated_at'] = timestamp
+        self.net_size += amount
+        self.realized_pnl += realized
+        self.fill_count += 1
+        self.version += 1
+
+        fill = {'venue': venue, 'amount': amount, 'price': price, 'fee': fee, 'timestamp': timestamp}
+        fill.update(details)
+        self.fills.append(fill)
+        return realized
+
+    def net(self):
+        """Net hedge size across all venues"""
+        return self.net_size
+
+    def unrealized_pnl(self, price):
+        """Open PnL of every venue marked at `price`"""
+        return sum(p['size'] * (price - p['avg_price']) for p in self.positions.values() if p['size'])
+
+    def total_pnl(self, price):
+        return self.realized_pnl + self.unrealized_pnl(price)
+
+    def recent_fills(self, count=10):
+        """The last `count` fills, oldest first"""
+        count = min(count, len(self.fills))
+        return [self.fills[i] for i in range(len(self.fills) - count, len(self.fills))]
+
+    def to_dict(self, price=None):
+        result = {
+            'net_size': self.net_size,
+            'realized_pnl': self.realized_pnl,
+            'fills': self.fill_count,
+            'positions': {venue: dict(p) for venue, p in self.positions.items()},
+        }
+        if price is not None:
+            result['unrealized_pnl'] = self.unrealized_pnl(price)
+        return result
@@ -0,0 +1,173 @@
+# price_paths.py
+import sys
+import time
+import numpy as np
+
+SECONDS_PER_YEAR = 365 * 24 * 60 * 60
+
+MODELS = ('walk', 'gbm', 'merton', 'regime')
+
+class PathGenerator:
+    """Seeded synthetic BTC price paths, generated in large NumPy blocks
+
+    Models:
+    - walk: the simulator's per-tick model, a normal return of tick_sigma
+      plus, with probability jump_prob, a normal jump of jump_sigma
+    - gbm: geometric Brownian motion with annualized mu and sigma
+    - merton: gbm plus Poisson jumps (jump_intensity per year) with
+      normally distributed log sizes (jump_mean, jump_std)
+    - regime: gbm whose sigma switches between regime_sigmas, leaving
+      each regime with the per-step probabilities in regime_switch
+
+    Each block also carries bid/ask from the app's spread model: the
+    spread is spread_fraction of the price, widened by spread_sensitivity
+    times the absolute return, with a floor of min_spread.
+    next_tick() serves the block one step at a time and refills when it
+    is used up; generate(n) returns whole arrays for backtests.
+    The same seed and parameters always give the same path.
+    """
+
+    PRICE, BID, ASK, CHANGE, JUMP = range(5)
+
+    def __init__(self, model='walk', start_price=40000.0, seed=None, block_size=8192, dt=0.5,
+                 mu=0.0, sigma=0.7, tick_sigma=0.0005, jump_prob=0.05, jump_sigma=0.002,
+                 jump_intensity=50.0, jump_mean=0.0, jump_std=0.01,
+                 regime_sigmas=(0.5, 1.5), regime_switch=(0.0005, 0.005),
+                 spread_fraction=0.0005, spread_sensitivity=10.0, min_spread=50.0):
+        if model not in MODELS:
+            raise ValueError(f"unknown price model '{model}'")
+        self.model = model
+        self.rng = np.random.default_rng(seed)  # also accepts an existing Generator
+        self.block_size = block_size
+        self.dt = dt / SECONDS_PER_YEAR         # step length in years
+        self.mu = mu
+        self.sigma = sigma
+        self.tick_sigma = tick_sigma
+        self.jump_prob = jump_prob
+        self.jump_sigma = jump_sigma
+        self.jump_intensity = jump_intensity
+        self.jump_mean = jump_mean
+        self.jump_std = jump_std
+        self.regime_sigmas = np.asarray(regime_sigmas, dtype=float)
+        self.regime_switch = regime_switch
+        self.spread_fraction = spread_fraction
+        self.spread_sensitivity = spread_sensitivity
+        self.min_spread = min_spread
+
+        self.price = float(start_price)         # last price handed out
+        self.regime = 0
+        self.block = None
+        self.rows = None                        # block as Python lists, for cheap per-tick reads
+        self.cursor = 0
+        self.steps = 0
+
+    def _returns(self, n):
+        """Simple returns for n steps and a mask of the steps that jumped"""
+        rng = self.rng
+        if self.model == 'walk':
+            returns = rng.normal(0.0, self.tick_sigma, n)
+            jumps = rng.random(n) < self.jump_prob
+            returns[jumps] += rng.normal(0.0, self.jump_sigma, jumps.sum())
+            return returns, jumps
+
+        if self.model == 'regime':
+            sigma = self._regime_sigmas(n)
+        else:
+            sigma = self.sigma
+        log_returns = (self.mu - 0.5 * sigma ** 2) * self.dt + sigma * np.sqrt(self.dt) * rng.standard_normal(n)
+
+        jumps = np.zeros(n, dtype=bool)
+        if self.model == 'merton':
+            counts = rng.poisson(self.jump_intensity * self.dt, n)
+            jumps = counts > 0
+            # Sum of k normal jumps is normal with k times the mean and variance
+            k = counts[jumps]
+            log_returns[jumps] += rng.normal(self.jump_mean * k, self.jump_std * np.sqrt(k))
+        return np.expm1(log_returns), jumps
+
+    def _regime_sigmas(self, n):
+        # Regime run lengths are geometric, so runs can be drawn in bulk and
+        # a block boundary needs no state beyond the current regime
+        states = []
+        lengths = []
+        total = 0
+        regime = self.regime
+        while total < n:
+            runs = max(16, int(n * max(self.regime_switch)) + 1)
+            first = self.rng.geometric(self.regime_switch[regime], (runs + 1) // 2)
+            second = self.rng.geometric(self.regime_switch[1 - regime], runs // 2)
+            run_lengths = np.empty(len(first) + len(second), dtype=np.int64)
+            run_lengths[0::2] = first
+            run_lengths[1::2] = second
+            run_states = np.empty_like(run_lengths)
+            run_states[0::2] = regime
+            run_states[1::2] = 1 - regime
+            states.append(run_states)
+            lengths.append(run_lengths)
+            total += int(run_lengths.sum())
+            regime = 1 - int(run_states[-1])
+        path = np.repeat(np.concatenate(states), np.concatenate(lengths))[:n]
+        self.regime = int(path[-1])
+        return self.regime_sigmas[path]
+
+    def _block(self, n, start_price):
+        """Array of shape (5, n): price, bid, ask, change, jump flag"""
+        returns, jumps = self._returns(n)
+        prices = start_price * np.cumprod(1.0 + returns)
+        changes = np.diff(prices, prepend=start_price)
+
+        # Wider spread after larger moves, as in the simulator
+        spread_factor = 1.0 + np.abs(changes / prices) * self.spread_sensitivity
+        spreads = np.maximum(self.min_spread, prices * self.spread_fraction * spread_factor)
+
+        block = np.empty((5, n))
+        block[self.PRICE] = prices
+        block[self.BID] = prices - spreads / 2
+        block[self.ASK] = prices + spreads / 2
+        block[self.CHANGE] = changes
+        block[self.JUMP] = jumps
+        return block
+
+    def generate(self, n):
+        """The next n steps as a (5, n) array, continuing the current path"""
+        # Drop whatever is left of the per-tick block so the path stays continuous
+        self.block = self.rows = None
+        block = self._block(n, self.price)
+        self.price = float(block[self.PRICE, -1])
+        self.steps += n
+        return block
+
+    def next_tick(self):
+        """(price, bid, ask, change, jumped) for the next step"""
+        if self.rows is None or self.cursor >= self.block_size:
+            self.block = self._block(self.block_size, self.price)
+            self.rows = self.block.tolist()
+            self.cursor = 0
+        i = self.cursor
+        self.cursor += 1
+        self.steps += 1
+        price, bid, ask, change, jump = self.rows
+        self.price = price[i]
+        return price[i], bid[i], ask[i], change[i], jump[i] > 0
+
+    def reset(self, price):
+        """Continue the path from a price set elsewhere (e.g. a replayed tick)"""
+        self.price = float(price)
+        self.block = self.rows = None
+
+def benchmark(model='walk', steps=10_000_000, seed=0):
+    generator = PathGenerator(model, seed=seed, block_size=1_000_000)
+    started = time.perf_counter()
+    remaining = steps
+    while remaining:
+        n = min(remaining, 1_000_000)
+        generator.generate(n)
+        remaining -= n
+    elapsed = time.perf_counter() - started
+    return {'model': model, 'steps': steps, 'steps_per_second': steps / elapsed, 'final_price': generator.price}
+
+if __name__ == '__main__':
+    # Usage: python price_paths.py [model ...]
+    for model in sys.argv[1:] or MODELS:
+        result = benchmark(model)
+        print(f"{result['model']:>7}: {result['steps_per_second']:,.0f} steps/s (final price ${result['final_price']:,.2f})")
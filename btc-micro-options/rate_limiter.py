@@ -0,0 +1,149 @@
+# rate_limiter.py
+import math
+import time
+import threading
+from collections import OrderedDict
+from functools import wraps
+from flask import request, session, jsonify
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate            # tokens refilled per second
+        self.capacity = capacity    # maximum burst size
+        self.tokens = capacity
+        self.last_refill = time.monotonic()
+
+    def _refill(self, now):
+        elapsed = now - self.last_refill
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.last_refill = now
+
+    def try_consume(self, tokens=1, now=None):
+        """Take tokens if available; returns (allowed, seconds until enough tokens)"""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+
+        if tokens <= self.tokens:
+            self.tokens -= tokens
+            return True, 0.0
+
+        return False, (tokens - self.tokens) / self.rate
+
+    def refund(self, tokens=1):
+        """Return tokens taken for a request that was rejected further down"""
+        self.tokens = min(self.capacity, self.tokens + tokens)
+
+class AdmissionController:
+    """Per-client and global token-bucket limits plus tick-lag load shedding"""
+
+    DEFAULT_LIMITS = {
+        # scope: per-client rate/burst and global rate/burst
+        'orders': {'rate': 10, 'burst': 50, 'global_rate': 100, 'global_burst': 500},
+        'reads': {'rate': 10, 'burst': 30, 'global_rate': 200, 'global_burst': 400}
+    }
+
+    def __init__(self, limits=None, lag_source=None, max_tick_lag=0.25, max_clients=10000):
+        self.limits = limits or self.DEFAULT_LIMITS
+        self.lag_source = lag_source        # callable returning current tick-loop lag in seconds
+        self.max_tick_lag = max_tick_lag
+        self.max_clients = max_clients
+
+        self.global_buckets = {
+            scope: TokenBucket(cfg['global_rate'], cfg['global_burst'])
+            for scope, cfg in self.limits.items()
+        }
+        self.client_buckets = {scope: OrderedDict() for scope in self.limits}
+        self.stats = {scope: {'admitted': 0, 'limited': 0, 'shed': 0} for scope in self.limits}
+        self.lock = threading.Lock()
+
+    def is_shedding(self):
+        """True while the tick loop is running later than the allowed lag"""
+        if self.lag_source is None:
+            return False
+        return self.lag_source() > self.max_tick_lag
+
+    def _client_bucket(self, scope, client_id):
+        buckets = self.client_buckets[scope]
+        bucket = buckets.get(client_id)
+        if bucket is None:
+            cfg = self.limits[scope]
+            bucket = TokenBucket(cfg['rate'], cfg['burst'])
+            buckets[client_id] = bucket
+            # Forget the least recently seen clients so the table stays bounded
+            if len(buckets) > self.max_clients:
+                buckets.popitem(last=False)
+        else:
+            buckets.move_to_end(client_id)
+        return bucket
+
+    def admit(self, scope, client_id, cost=1, shed=False):
+        """Decide whether a request may proceed
+
+        Returns a dict with 'allowed', 'reason' and 'retry_after' (seconds).
+        """
+        if shed and self.is_shedding():
+            with self.lock:
+                self.stats[scope]['shed'] += 1
+            return {'allowed': False, 'reason': 'overloaded', 'retry_after': max(1.0, self.lag_source())}
+
+        # A request bigger than the bucket could never be admitted, waiting won't help
+        if cost > self.limits[scope]['burst']:
+            return {'allowed': False, 'reason': 'request_too_large', 'retry_after': 0.0}
+
+        now = time.monotonic()
+        with self.lock:
+            client_bucket = self._client_bucket(scope, client_id)
+            allowed, retry_after = client_bucket.try_consume(cost, now)
+            if not allowed:
+                self.stats[scope]['limited'] += 1
+                return {'allowed': False, 'reason': 'client_rate_limited', 'retry_after': retry_after}
+
+            allowed, retry_after = self.global_buckets[scope].try_consume(cost, now)
+            if not allowed:
+                client_bucket.refund(cost)
+                self.stats[scope]['limited'] += 1
+                return {'allowed': False, 'reason': 'global_rate_limited', 'retry_after': retry_after}
+
+            self.stats[scope]['admitted'] += 1
+        return {'allowed': True, 'reason': None, 'retry_after': 0.0}
+
+    def limit(self, scope, cost=None, shed=False):
+        """Flask decorator enforcing the given scope's limits
+
+        cost: optional callable taking the request and returning the token cost
+        shed: reject with 503 while the tick loop is lagging
+        """
+        def decorator(f):
+            @wraps(f)
+            def decorated_function(*args, **kwargs):
+                tokens = cost(request) if cost else 1
+                decision = self.admit(scope, client_identity(), tokens, shed)
+                if decision['reason'] == 'request_too_large':
+                    return jsonify({'error': 'Request exceeds the rate limit burst size', 'reason': decision['reason']}), 413
+                if not decision['allowed']:
+                    status = 503 if decision['reason'] == 'overloaded' else 429
+                    retry_after = math.ceil(decision['retry_after'])
+                    response = jsonify({
+                        'error': 'Too many requests' if status == 429 else 'Server overloaded, retry later',
+                        'reason': decision['reason'],
+                        'retry_after': retry_after
+                    })
+                    response.status_code = status
+                    response.headers['Retry-After'] = str(retry_after)
+                    return response
+                return f(*args, **kwargs)
+            return decorated_function
+        return decorator
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                'stats': {scope: dict(counts) for scope, counts in self.stats.items()},
+                'tracked_clients': {scope: len(buckets) for scope, buckets in self.client_buckets.items()},
+                'shedding': self.is_shedding()
+            }
+
+def client_identity():
+    """Identify the caller by session, falling back to the remote address"""
+    return session.get('lovable_token') or request.remote_addr or 'anonymous'
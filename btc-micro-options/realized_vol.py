@@ -0,0 +1,295 @@
+# realized_vol.py
+import math
+
+SECONDS_PER_YEAR = 365 * 24 * 60 * 60
+
+class ReturnEstimator:
+    """Base for estimators fed log returns: update() turns ticks into
+    (return, seconds since the previous tick) and calls add()"""
+
+    last_price = None
+    last_time = None
+
+    def update(self, price, timestamp):
+        last_price, last_time = self.last_price, self.last_time
+        self.last_price, self.last_time = price, timestamp
+        if last_price is None or price <= 0 or last_price <= 0:
+            return
+        dt = timestamp - last_time
+        if dt <= 0:
+            return
+        self.add(math.log(price / last_price), dt)
+
+    def add(self, r, dt):
+        raise NotImplementedError
+
+class EWMAVolatility(ReturnEstimator):
+    """Exponentially weighted realized volatility with time-based decay
+
+    Each log return is normalized by the time since the previous tick, so
+    irregular tick spacing is handled and annualizing is just a scale by
+    seconds per year. halflife is in seconds. The average is divided by the
+    weight accumulated so far, so the first returns do not dominate it.
+    """
+
+    def __init__(self, halflife=60.0, min_samples=10):
+        self.halflife = halflife
+        self.min_samples = min_samples
+        self.variance = 0.0         # per-second variance of log returns (unnormalized)
+        self.weight = 0.0
+        self.samples = 0
+        self.last_dt = None
+        self.alpha = 0.0
+
+    def add(self, r, dt):
+        if dt != self.last_dt:
+            # Ticks usually arrive at a fixed interval, so the decay is rarely recomputed
+            self.last_dt = dt
+            self.alpha = 1.0 - math.exp(-dt * math.log(2) / self.halflife)
+        alpha = self.alpha
+        self.variance += alpha * (r * r / dt - self.variance)
+        self.weight += alpha * (1.0 - self.weight)
+        self.samples += 1
+
+    def annualized(self):
+        """Annualized volatility, or None until min_samples returns were seen"""
+        if self.samples < self.min_samples:
+            return None
+        return math.sqrt(self.variance / self.weight * SECONDS_PER_YEAR)
+
+class RollingVolatility(ReturnEstimator):
+    """Sample volatility over the last `window` returns (windowed Welford)
+
+    Returns are scaled to per-second units (r / sqrt(dt)). The mean and sum
+    of squared deviations are updated in place as a return enters and the
+    oldest one leaves, so an update is O(1) regardless of the window.
+    """
+
+    def __init__(self, window=120, min_samples=10):
+        self.window = window
+        self.min_samples = min_samples
+        self.values = [0.0] * window  # ring of scaled returns
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, r, dt):
+        x = r / math.sqrt(dt)
+
+        slot = self.count % self.window
+        if self.count < self.window:
+            # Growing window: standard Welford step
+            n = self.count + 1
+            delta = x - self.mean
+            self.mean += delta / n
+            self.m2 += delta * (x - self.mean)
+        else:
+            # Full window: replace the oldest value
+            old = self.values[slot]
+            old_mean = self.mean
+            self.mean += (x - old) / self.window
+            self.m2 += (x - old) * (x - self.mean + old - old_mean)
+            if self.m2 < 0:
+                self.m2 = 0.0  # rounding
+        self.values[slot] = x
+        self.count += 1
+
+    def annualized(self):
+        n = min(self.count, self.window)
+        if n < max(2, self.min_samples):
+            return None
+        return math.sqrt(self.m2 / (n - 1) * SECONDS_PER_YEAR)
+
+class BipowerVariation(ReturnEstimator):
+    """Jump-robust volatility from products of adjacent absolute returns
+
+    (pi / 2) * sum(|r_i| * |r_i-1|) over the last `window` returns, divided
+    by the time they span. A single jump enters only products with a small
+    neighbour, so it barely moves the estimate. Running sums make an update O(1).
+    """
+
+    def __init__(self, window=120, min_samples=10):
+        self.window = window
+        self.min_samples = min_samples
+        self.products = [0.0] * window
+        self.dts = [0.0] * window
+        self.count = 0
+        self.product_sum = 0.0
+        self.dt_sum = 0.0
+        self.last_abs = None
+
+    def add(self, r, dt):
+        r = abs(r)
+        last_abs, self.last_abs = self.last_abs, r
+        if last_abs is None:
+            return
+
+        slot = self.count % self.window
+        if self.count >= self.window:
+            self.product_sum -= self.products[slot]
+            self.dt_sum -= self.dts[slot]
+        product = r * last_abs
+        self.products[slot] = product
+        self.dts[slot] = dt
+        self.product_sum += product
+        self.dt_sum += dt
+        self.count += 1
+
+    def annualized(self):
+        if min(self.count, self.window) < self.min_samples or self.dt_sum <= 0:
+            return None
+        variance = max(0.0, math.pi / 2 * self.product_sum / self.dt_sum)
+        return math.sqrt(variance * SECONDS_PER_YEAR)
+
+def parzen(x):
+    """Parzen kernel weight, used by the realized kernel"""
+    if x <= 0.5:
+        return 1 - 6 * x * x + 6 * x ** 3
+    if x <= 1:
+        return 2 * (1 - x) ** 3
+    return 0.0
+
+class RealizedKernel(ReturnEstimator):
+    """Noise-robust realized variance over the last `window` returns
+
+    Bid/ask bounce makes adjacent returns negatively correlated and inflates
+    the plain sum of squares at sub-second sampling. The kernel adds the
+    return autocovariances up to `lags`, Parzen weighted:
+    gamma_0 + 2 * sum(k(h / (lags + 1)) * gamma_h), divided by the time the
+    window spans. Each autocovariance is a running sum, so an update costs
+    O(lags).
+    """
+
+    def __init__(self, window=120, lags=4, min_samples=20):
+        self.window = window
+        self.lags = lags
+        self.min_samples = min_samples
+        self.weights = [1.0] + [2 * parzen(h / (lags + 1)) for h in range(1, lags + 1)]
+        self.size = window + lags + 1   # returns kept: the window plus the lags it reaches back to
+        self.returns = [0.0] * self.size
+        self.dts = [0.0] * self.size
+        self.count = 0
+        self.gammas = [0.0] * (lags + 1)
+        self.dt_sum = 0.0
+
+    def add(self, r, dt):
+        n = self.count
+        size = self.size
+        returns = self.returns
+
+        gammas = self.gammas
+
+        # Drop the return leaving the window and its products with earlier returns
+        if n >= self.window:
+            old = n - self.window
+            r_old = returns[old % size]
+            for h in range(min(self.lags, old) + 1):
+                gammas[h] -= r_old * returns[(old - h) % size]
+            self.dt_sum -= self.dts[old % size]
+
+        returns[n % size] = r
+        self.dts[n % size] = dt
+        self.dt_sum += dt
+        for h in range(min(self.lags, n) + 1):
+            gammas[h] += r * returns[(n - h) % size]
+        self.count += 1
+
+    def annualized(self):
+        if min(self.count, self.window) < self.min_samples or self.dt_sum <= 0:
+            return None
+        variance = sum(w * g for w, g in zip(self.weights, self.gammas)) / self.dt_sum
+        return math.sqrt(max(0.0, variance) * SECONDS_PER_YEAR)
+
+class RangeVolatility:
+    """Parkinson or Garman-Klass volatility from closed OHLC bars, EWMA smoothed
+
+    on_bar() takes a BarSeries bar (column order) of `seconds` length.
+    Both estimators use the high-low range, which carries more information
+    than one close-to-close return. The gap from the previous close to the
+    bar's open (one tick return) is added so consecutive bars cover all of
+    the time. halflife is in seconds.
+    """
+
+    def __init__(self, estimator='garman_klass', seconds=10, halflife=60.0, min_samples=3):
+        if estimator not in ('parkinson', 'garman_klass'):
+            raise ValueError(f"unknown range estimator '{estimator}'")
+        self.estimator = estimator
+        self.seconds = seconds
+        self.alpha = 1.0 - math.exp(-seconds * math.log(2) / halflife)
+        self.min_samples = min_samples
+        self.variance = 0.0         # per-second variance (unnormalized, as in EWMAVolatility)
+        self.weight = 0.0
+        self.samples = 0
+        self.last_close = None
+
+    def on_bar(self, bar):
+        _, open_, high, low, close = bar[:5]
+        last_close, self.last_close = self.last_close, close
+        if low <= 0 or open_ <= 0:
+            return
+        hl = math.log(high / low)
+        if self.estimator == 'parkinson':
+            variance = hl * hl / (4 * math.log(2))
+        else:
+            co = math.log(close / open_)
+            variance = 0.5 * hl * hl - (2 * math.log(2) - 1) * co * co
+        if last_close is not None and last_close > 0:
+            gap = math.log(open_ / last_close)
+            variance += gap * gap
+        self.variance += self.alpha * (variance / self.seconds - self.variance)
+        self.weight += self.alpha * (1.0 - self.weight)
+        self.samples += 1
+
+    def annualized(self):
+        if self.samples < self.min_samples:
+            return None
+        return math.sqrt(max(0.0, self.variance / self.weight) * SECONDS_PER_YEAR)
+
+METHODS = ('ewma', 'rolling', 'bipower', 'kernel', 'parkinson', 'garman_klass')
+
+class RealizedVolatility(ReturnEstimator):
+    """Volatility estimators fed from the same tick stream
+
+    update() is called once per tick (with the mid price) and on_bar() with
+    each closed bar of bar_seconds; both are O(1). estimate() is what the fee
+    logic and the volatility surface read: the `method` estimator (jump-robust
+    bipower variation by default), falling back to the EWMA, then to the
+    default until enough ticks have arrived. The slow EWMA gives the long-run
+    level the volatility surface reverts to.
+    """
+
+    def __init__(self, halflife=60.0, window=120, min_samples=10, default=0.7, slow_halflife=3600.0,
+                 method='bipower', kernel_lags=4, bar_seconds=10):
+        if method not in METHODS:
+            raise ValueError(f"unknown volatility method '{method}'")
+        self.ewma = EWMAVolatility(halflife, min_samples)
+        self.rolling = RollingVolatility(window, min_samples)
+        self.slow = EWMAVolatility(slow_halflife, min_samples)
+        self.bipower = BipowerVariation(window, min_samples)
+        self.kernel = RealizedKernel(window, kernel_lags, max(min_samples, 2 * kernel_lags))
+        self.parkinson = RangeVolatility('parkinson', bar_seconds, halflife)
+        self.garman_klass = RangeVolatility('garman_klass', bar_seconds, halflife)
+        self.method = method
+        self.default = default
+        self.estimators = (self.ewma, self.rolling, self.slow, self.bipower, self.kernel)
+
+    def add(self, r, dt):
+        # One log return per tick, shared by every estimator
+        for estimator in self.estimators:
+            estimator.add(r, dt)
+
+    def on_bar(self, bar):
+        self.parkinson.on_bar(bar)
+        self.garman_klass.on_bar(bar)
+
+    def estimate(self):
+        value = getattr(self, self.method).annualized()
+        if value is None:
+            value = self.ewma.annualized()
+        return self.default if value is None else value
+
+    def get_stats(self):
+        stats = {method: getattr(self, method).annualized() for method in METHODS}
+        stats.update(slow=self.slow.annualized(), method=self.method, estimate=self.estimate(),
+                     samples=self.ewma.samples)
+        return stats
@@ -0,0 +1,207 @@
+# replay.py
+import hashlib
+import json
+import os
+import sys
+import time
+from clock import SimulatedClock
+from simulation import SimulationState
+from tick_recorder import TickReader
+
+def recorded_ticks(directory, start_ns=None, end_ns=None):
+    """Yield (epoch seconds, (price, bid, ask)) from a TickRecorder directory"""
+    for view in TickReader(directory).range(start_ns, end_ns):
+        times = view['time_ns'] / 1e9
+        prices = view['price']
+        bids = view['bid']
+        asks = view['ask']
+        for i in range(len(view)):
+            yield float(times[i]), (float(prices[i]), float(bids[i]), float(asks[i]))
+
+def generated_ticks(count, start, interval=0.5):
+    """Yield count tick times with no prices, so the engine simulates each one"""
+    for i in range(count):
+        yield start + (i + 1) * interval, None
+
+def load_orders(orders):
+    """Order script from a JSON file path or a list, sorted by time
+
+    Each entry: {"at": seconds from the start, "type", "strike" or "strike_offset",
+    "expiry", "quantity"}, or {"at", "batch": [entries without "at"]}.
+    """
+    if isinstance(orders, str):
+        with open(orders) as f:
+            orders = json.load(f)
+    return sorted(orders or [], key=lambda order: order.get('at', 0))
+
+def _order_args(order, spot):
+    strike = order.get('strike')
+    if strike is None:
+        strike = round(spot + order.get('strike_offset', 0))
+    return {
+        'type': order.get('type', 'call'),
+        'strike': float(strike),
+        'expiry': int(order.get('expiry', 120)),
+        'quantity': float(order.get('quantity', 1)),
+    }
+
+def state_digest(*parts):
+    """sha256 over the JSON encoding of the given state, for comparing runs"""
+    encoded = json.dumps(parts, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+class ReplayEngine:
+    """Drives a SimulationState from a tick stream as fast as the CPU allows
+
+    The engine runs on a SimulatedClock that is moved to each tick's time, so
+    expiries, hedge rebalances and fee updates happen exactly as they would
+    live. With the same seed, ticks and order script, two runs produce
+    identical state (compare report()['digest']).
+    """
+
+    def __init__(self, seed=0, initial_liquidity=1200000, start=None):
+        self.seed = seed
+        self.initial_liquidity = initial_liquidity
+        self._reset(start)
+        self.ticks = 0
+        self.orders_submitted = 0
+        self.order_errors = []
+        self.wall_seconds = 0.0
+
+    def _reset(self, start):
+        self.clock = SimulatedClock(start)
+        self.start_time = self.clock.time()
+        self.state = SimulationState(self.initial_liquidity, clock=self.clock, seed=self.seed, start=False)
+
+    def submit(self, order):
+        """Book one scripted order (or batch) against the current state"""
+        spot = self.state.btc_price
+        try:
+            if 'batch' in order:
+                requests = [_order_args(item, spot) for item in order['batch']]
+                self.state.create_options_batch(requests)
+                self.orders_submitted += len(requests)
+            else:
+                args = _order_args(order, spot)
+                self.state.create_option(args['type'], args['strike'], args['expiry'], args['quantity'])
+                self.orders_submitted += 1
+        except (ValueError, KeyError, TypeError) as e:
+            self.order_errors.append({'at': order.get('at'), 'error': str(e)})
+
+    def run(self, ticks=None, orders=None, duration=3600):
+        """Replay ticks (default: duration seconds of simulated ticks) with scripted orders"""
+        if ticks is None:
+            count = int(duration / self.state.tick_interval)
+            ticks = generated_ticks(count, self.clock.time(), self.state.tick_interval)
+        pending = load_orders(orders)
+        next_order = 0
+
+        started = time.perf_counter()
+        for timestamp, tick in ticks:
+            if self.ticks == 0 and tick is not None:
+                # Recorded streams start the session at their first tick
+                self._reset(timestamp)
+            self.clock.set(timestamp)
+
+            # Orders due by this tick go in before it is processed
+            elapsed = self.clock.time() - self.start_time
+            while next_order < len(pending) and pending[next_order].get('at', 0) <= elapsed:
+                self.submit(pending[next_order])
+                next_order += 1
+
+            self.state.step(tick)
+            self.ticks += 1
+        self.wall_seconds += time.perf_counter() - started
+        return self.report()
+
+    def digest(self):
+        state = self.state
+        return state_digest(
+            state.options, state.transactions, state.positions.to_dict(), state.fee_history,
+            state.liquidity, state.btc_price
+        )
+
+    def report(self):
+        state = self.state
+        statuses = {}
+        for option in state.options:
+            statuses[option['status']] = statuses.get(option['status'], 0) + 1
+        simulated = self.clock.time() - self.start_time
+        return {
+            'ticks': self.ticks,
+            'orders': self.orders_submitted,
+            'order_errors': self.order_errors,
+            'simulated_seconds': simulated,
+            'wall_seconds': self.wall_seconds,
+            'ticks_per_second': self.ticks / self.wall_seconds if self.wall_seconds else 0.0,
+            'speedup': simulated / self.wall_seconds if self.wall_seconds else 0.0,
+            'final_price': state.btc_price,
+            'liquidity': state.liquidity,
+            'fee_rate': state.fee_rate,
+            'options': statuses,
+            'transactions': len(state.transactions),
+            'hedge_positions': state.positions.fill_count,
+            'digest': self.digest(),
+        }
+
+class ReplayFeed:
+    """Stands in for the live feed while a replay supplies the quotes"""
+
+    def is_stale(self):
+        return False
+
+async def replay_system(system, ticks, orders=None):
+    """Drive a BTCMicroOptionsSystem (built with a SimulatedClock) from recorded ticks
+
+    Each tick updates the system's quote and tick store, submits the orders
+    due, then runs one pass of the expiry, hedging and fee pipeline.
+    """
+    system.price_feed = ReplayFeed()
+    pending = load_orders(orders)
+    next_order = 0
+    count = 0
+    start_time = None
+
+    started = time.perf_counter()
+    for timestamp, (price, bid, ask) in ticks:
+        system.clock.set(timestamp)
+        if start_time is None:
+            start_time = timestamp
+        system.tick_store.append(price, bid, ask, timestamp)
+        system.on_price_update({'price': price, 'bid': bid, 'ask': ask, 'time': timestamp})
+
+        while next_order < len(pending) and pending[next_order].get('at', 0) <= timestamp - start_time:
+            args = _order_args(pending[next_order], price)
+            await system.create_option(args['type'], args['strike'], args['expiry'], args['quantity'])
+            next_order += 1
+
+        await system.step()
+        count += 1
+    wall_seconds = time.perf_counter() - started
+
+    return {
+        'ticks': count,
+        'wall_seconds': wall_seconds,
+        'ticks_per_second': count / wall_seconds if wall_seconds else 0.0,
+        'liquidity': system.liquidity,
+        'platform_stats': dict(system.platform_stats),
+        'digest': state_digest(system.options, system.platform_stats, system.liquidity,
+                               system.hedging_system.positions.to_dict(), system.fee_adjuster.fee_history),
+    }
+
+if __name__ == '__main__':
+    # Usage: python replay.py [seed] [hours | recording directory] [orders.json]
+    seed = int(sys.argv[1]) if len(sys.argv) > 1 else 0
+    source = sys.argv[2] if len(sys.argv) > 2 else '1'
+    orders = sys.argv[3] if len(sys.argv) > 3 else None
+
+    engine = ReplayEngine(seed=seed)
+    if os.path.isdir(source):
+        result = engine.run(ticks=recorded_ticks(source), orders=orders)
+    else:
+        result = engine.run(duration=float(source) * 3600, orders=orders)
+
+    print(f"Replayed {result['ticks']} ticks ({result['simulated_seconds']:.0f}s simulated) in {result['wall_seconds']:.2f}s")
+    print(f"  {result['ticks_per_second']:,.0f} ticks/s, {result['speedup']:,.0f}x real time")
+    print(f"  options: {result['options']}, liquidity: ${result['liquidity']:,.2f}")
+    print(f"  digest: {result['digest']}")
@@ -0,0 +1,711 @@
+# simulation.py
+import math
+import threading
+import numpy as np
+import random
+from datetime import timedelta
+from clock import SystemClock
+from tick_store import TickStore
+from bar_store import BarStore
+from event_bus import EventBus
+from price_paths import PathGenerator
+from realized_vol import RealizedVolatility
+from vol_surface import VolSurface
+from garch import GarchForecaster
+from positions import PositionKeeper
+from mark_to_market import HedgeMarker
+from exchange_simulator import ExchangeSimulator
+from order_router import SmartOrderRouter
+from hedge_netting import HedgeNetter
+from hedging_policy import make_policy
+from venue_health import VenueHealth, HALF_OPEN
+
+# In-memory storage for simulation purposes
+class SimulationState:
+    def __init__(self, initial_liquidity=1200000, recorder=None, clock=None, seed=None, start=True, bus=None,
+                 price_model='walk', hedge_window=2.0, hedge_limit=1.0, hedge_policy='fixed'):
+        # Time and randomness are injectable so a session can be replayed
+        # faster than real time and reproduced exactly from a seed
+        self.clock = clock or SystemClock()
+        self.rng = np.random.default_rng(seed)
+        self.random = random.Random(seed)
+        
+        self.btc_price = 40000
+        self.bid_price = 39950
+        self.ask_price = 40050
+        
+        # Prices and spreads come from pre-generated blocks instead of per-tick draws
+        self.paths = PathGenerator(
+            price_model, start_price=self.btc_price, seed=int(self.rng.integers(2**63)), dt=0.5
+        )
+        self.liquidity = initial_liquidity
+        self.options = []
+        self.positions = PositionKeeper(fill_log_size=1000)  # hedge fills, aggregated per exchange
+        self.hedge_marker = HedgeMarker(self.positions)     # marked every tick, funding accrued
+        self.hedge_pnl = 0.0                                # hedge PnL already in liquidity
+        self.fee_rate = 0.0015  # 0.15%
+        self.fee_history = []
+        self.volatility = 0.7  # Annualized volatility (short-dated ATM level of the surface)
+        
+        # Realized volatility, updated in O(1) per tick from the tick timestamps,
+        # drives fees and calibrates the volatility surface every pricing call reads
+        self.realized_vol = RealizedVolatility(default=self.volatility)
+        self.tick_store = TickStore(capacity=1000, clock=self.clock)
+        # GARCH forecasts per expiry once fitted (refits run on a worker thread when
+        # the engine runs live, inline when a replay drives step())
+        self.garch = GarchForecaster(self.tick_store, clock=self.clock, default=self.volatility, background=start)
+        self.vol_surface = VolSurface(self.realized_vol, clock=self.clock, forecaster=self.garch,
+                                      default=self.volatility)
+        
+        self.portfolio_delta = 0
+        self.portfolio_gamma = 0
+        self.portfolio_theta = 0
+        self.portfolio_vega = 0
+        # latency: typical order round trip (seconds) of the simulated exchange
+        self.exchanges = {
+            "binance": {"status": "active", "weight": 0.4, "hedge_delta": 0, "taker_fee": 0.0004, "latency": 0.05},
+            "coinbase": {"status": "active", "weight": 0.3, "hedge_delta": 0, "taker_fee": 0.0006, "latency": 0.08},
+            "kraken": {"status": "active", "weight": 0.2, "hedge_delta": 0, "taker_fee": 0.0005, "latency": 0.12},
+            "ftx": {"status": "backup", "weight": 0.1, "hedge_delta": 0, "taker_fee": 0.0007, "latency": 0.15}
+        }
+        # Local L2 books per exchange, moved every tick by the stand-in exchange
+        # simulator; hedges are split over them by expected cost and fill against them
+        self.exchange_books = ExchangeSimulator(list(self.exchanges), seed=int(self.rng.integers(2**63)))
+        self.router = SmartOrderRouter(
+            self.exchange_books.books,
+            fees={name: exchange['taker_fee'] for name, exchange in self.exchanges.items()},
+            latencies={name: exchange['latency'] for name, exchange in self.exchanges.items()}
+        )
+        # Health per exchange from the hedge attempts; circuit breakers take a
+        # failing exchange out, and the backup in, until probes show recovery
+        self.venue_health = VenueHealth(list(self.exchanges),
+                                        {name: exchange['latency'] for name, exchange in self.exchanges.items()},
+                                        clock=self.clock)
+        self.fallback_active = False
+        self.hedge_error_probability = 0.01   # simulated rejections on a healthy exchange
+        self.competitor_fees = {
+            "binance": 0.0010,
+            "coinbase": 0.0020,
+            "dydx": 0.0010,
+            "uniswap": 0.0030,
+            "sushiswap": 0.0025
+        }
+        self.bars = BarStore()  # 1s/10s/1m/5m OHLC bars for charts
+        self.bars.subscribe('10s', self.realized_vol.on_bar)  # range-based vol estimators
+        self.recorder = recorder  # optional TickRecorder keeping every tick on disk
+        
+        # Prices, transactions, options, fee changes and exchange events are
+        # published here; consumers subscribe instead of polling shared lists
+        self.bus = bus or EventBus(clock=self.clock)
+        self.recorder_subscription = None
+        if recorder is not None:
+            # The recorder writes on its own consumer thread. Publishing happens under the
+            # engine lock, so a slow disk must not push back on the tick loop: once 10000
+            # ticks are pending the oldest are dropped and counted in the bus stats
+            self.recorder_subscription = self.bus.attach(
+                'recorder', self._record_tick, topics=['price'], maxlen=10000, policy='drop_oldest'
+            )
+        self.transactions = []
+        
+        # The clock is read once per tick and that timestamp is shared by
+        # everything the tick does; intervals use the monotonic clock
+        now = self.clock.now()
+        self.tick_time = now
+        self.last_rebalance = now
+        self.last_price_update = now
+        self.rebalance_interval = 10  # seconds
+        self.last_rebalance_at = self.clock.monotonic()
+        # Orders' delta changes are netted over hedge_window seconds and hedged
+        # as one; a net delta of hedge_limit BTC or more is hedged at once
+        self.hedge_netter = HedgeNetter(hedge_window, hedge_limit, clock=self.clock)
+        # When a rebalance trades and how much: flatten any delta past 0.05 BTC by default
+        self.hedge_policy = make_policy(hedge_policy) if isinstance(hedge_policy, str) else hedge_policy
+        
+        # Engine state is mutated by the tick thread and by request handlers;
+        # every mutation happens under the lock and bumps the state version
+        self.lock = threading.RLock()
+        self.state_version = 0
+        
+        # Tick loop timing, used for load shedding
+        self.tick_interval = 0.5
+        self.tick_lag = 0.0
+        self.next_tick_due = self.clock.monotonic()
+        
+        # Start price simulation thread (replays drive step() themselves)
+        self.should_run = start
+        if start:
+            self.simulation_thread = threading.Thread(target=self.run_simulation)
+            self.simulation_thread.daemon = True
+            self.simulation_thread.start()
+    
+    def run_simulation(self):
+        """Simulate real-time price and platform behavior"""
+        while self.should_run:
+            with self.lock:
+                # How late this tick started (sleep overshoot, GIL or lock contention)
+                self.tick_lag = max(0.0, self.clock.monotonic() - self.next_tick_due)
+                self.step()
+            
+            # Short sleep to prevent CPU overuse
+            self.next_tick_due = self.clock.monotonic() + self.tick_interval
+            self.clock.sleep(self.tick_interval)
+    
+    def step(self, tick=None):
+        """Run one tick of the engine
+        
+        tick: optional (price, bid, ask) from a recorded or generated stream;
+        without it the next price is simulated.
+        """
+        with self.lock:
+            now = self.clock.now()
+            self.tick_time = now
+            
+            if tick is None:
+                # Next step of the synthetic path (small random walk with occasional
+                # jumps, spread wider during volatile periods)
+                if self.paths.price != self.btc_price:
+                    # Price was set by an injected tick; continue the path from there
+                    self.paths.reset(self.btc_price)
+                self.btc_price, self.bid_price, self.ask_price, _, _ = self.paths.next_tick()
+            else:
+                self.btc_price, self.bid_price, self.ask_price = tick
+            
+            # Record price history (fixed-size ring, oldest ticks are overwritten)
+            timestamp = now.timestamp()
+            self.tick_store.append(self.btc_price, self.bid_price, self.ask_price, timestamp)
+            self.bars.update(self.btc_price, self.bid_price, self.ask_price, timestamp)
+            self.exchange_books.on_price(self.btc_price)
+            self.realized_vol.update(self.btc_price, timestamp)
+            self.garch.update(self.btc_price, timestamp)
+            self.bus.publish('price', {
+                'price': self.btc_price,
+                'bid': self.bid_price,
+                'ask': self.ask_price
+            }, timestamp)
+            
+            # Process option expirations
+            self.process_expirations(now)
+            
+            # Update Greeks and hedge if needed
+            self.update_portfolio_metrics(now)
+            
+            # Mark the hedges to this tick's price and book the change in their PnL
+            hedge_pnl = self.hedge_marker.mark(self.btc_price, timestamp)
+            self.liquidity += hedge_pnl - self.hedge_pnl
+            self.hedge_pnl = hedge_pnl
+            
+            # Recalibrate the surface here, so order handlers only ever read it
+            monotonic_now = self.clock.monotonic()
+            self.garch.maybe_refit(monotonic_now)
+            self.vol_surface.maybe_calibrate(monotonic_now)
+            self.volatility = self.vol_surface.atm_vol()
+            
+            if self.hedge_netter.due(monotonic_now) or monotonic_now - self.last_rebalance_at > self.rebalance_interval:
+                self.rebalance_hedges(now)
+                self.last_rebalance = now
+                self.last_rebalance_at = monotonic_now
+            
+            # Dynamically adjust fees (less frequently)
+            if self.random.random() < 0.05:
+                self.adjust_fees(now)
+            
+            # Occasionally an exchange starts degrading (0.2% chance per cycle)
+            if self.random.random() < 0.002:
+                self.simulate_exchange_issue(now)
+            
+            self.last_price_update = now
+            self.state_version += 1
+    
+    def _record_tick(self, event):
+        tick = event['data']
+        self.recorder.record(tick['price'], tick['bid'], tick['ask'], 'simulation', int(event['time'] * 1e9))
+    
+    def log_transaction(self, transaction):
+        """Append to the transaction log and publish it on the bus"""
+        self.transactions.append(transaction)
+        self.bus.publish('transaction', transaction)
+    
+    def current_tick_lag(self):
+        """Lag of the last tick, or of the pending one if it is already overdue"""
+        return max(self.tick_lag, self.clock.monotonic() - self.next_tick_due)
+    
+    def create_option(self, option_type, strike_price, expiry_seconds, quantity):
+        """Create a new option contract"""
+        with self.lock:
+            current_time = self.clock.now()
+            
+            # Calculate option price
+            time_to_expiry_years = expiry_seconds / (365 * 24 * 60 * 60)
+            option_price = self.calculate_option_price(
+                option_type, self.btc_price, strike_price, time_to_expiry_years
+            )
+            
+            # Calculate greeks
+            greeks = self.calculate_greeks(
+                option_type, self.btc_price, strike_price, time_to_expiry_years
+            )
+            
+            option = self._build_option(
+                option_type, strike_price, expiry_seconds, quantity, option_price, greeks, current_time
+            )
+            self._apply_option(option, current_time)
+            self.state_version += 1
+            
+            # Update portfolio metrics after new option
+            self.update_portfolio_metrics(current_time)
+            
+            # Hedge now only past the hard limit; otherwise net with the next orders
+            self.on_exposure_change(current_time)
+            
+            self.bus.publish('option', {
+                'type': 'option_created',
+                'option': option,
+                'timestamp': current_time.isoformat()
+            })
+            return option
+    
+    def create_options_batch(self, order_requests):
+        """Create several options atomically under a single state version
+        
+        All requests are priced against the same spot and booked together,
+        followed by one portfolio update and one hedge rebalance. Requests
+        must already be validated (see parse_option_request).
+        """
+        with self.lock:
+            current_time = self.clock.now()
+            
+            # Price the whole ladder in one vectorized pass
+            prices, greeks = self.calculate_batch_prices(
+                [order['type'] for order in order_requests],
+                self.btc_price,
+                [order['strike'] for order in order_requests],
+                [order['expiry'] / (365 * 24 * 60 * 60) for order in order_requests]
+            )
+            
+            options = []
+            for index, order in enumerate(order_requests):
+                option_greeks = {greek: values[index] for greek, values in greeks.items()}
+                options.append(self._build_option(
+                    order['type'], order['strike'], order['expiry'], order['quantity'],
+                    prices[index], option_greeks, current_time
+                ))
+            
+            for option in options:
+                self._apply_option(option, current_time)
+            self.state_version += 1
+            
+            # One metrics update and one hedge trigger for the whole batch
+            self.update_portfolio_metrics(current_time)
+            self.on_exposure_change(current_time)
+            
+            self.bus.publish('option', {
+                'type': 'options_batch_created',
+                'option_ids': [option['id'] for option in options],
+                'state_version': self.state_version,
+                'timestamp': current_time.isoformat()
+            })
+            return self.state_version, options
+    
+    def _build_option(self, option_type, strike_price, expiry_seconds, quantity, option_price, greeks, current_time):
+        """Build an option record from its price and per-unit Greeks"""
+        expiry_time = current_time + timedelta(seconds=expiry_seconds)
+        
+        # Apply fee
+        premium = option_price * (1 + self.fee_rate)
+        fee_amount = option_price * self.fee_rate
+        
+        return {
+            'id': f"{self.random.getrandbits(32):08x}",
+            'type': option_type,
+            'strike': strike_price,
+            'quantity': quantity,
+            'premium': premium,
+            'fee_amount': fee_amount,
+            'creation_time': current_time.isoformat(),
+            'expiry_time': expiry_time.isoformat(),
+            'expiry_ts': expiry_time.timestamp(),  # epoch seconds, so per-tick checks don't parse the ISO string
+            'status': 'active',
+            'entry_price': self.btc_price,
+            'greeks': {
+                'delta': greeks['delta'] * quantity,
+                'gamma': greeks['gamma'] * quantity,
+                'theta': greeks['theta'] * quantity,
+                'vega': greeks['vega'] * quantity
+            }
+        }
+    
+    def _apply_option(self, option, current_time):
+        """Book an option: store it, collect the premium and log the transaction"""
+        self.options.append(option)
+        
+        # Update liquidity
+        self.liquidity += option['premium'] * option['quantity']
+        
+        # Log transaction
+        self.log_transaction({
+            'type': 'create',
+            'option_id': option['id'],
+            'timestamp': current_time.isoformat(),
+            'details': f"{option['type']} option, strike ${option['strike']}, premium ${option['premium']:.2f}"
+        })
+    
+    def process_expirations(self, now=None):
+        """Process expired options"""
+        current_time = now or self.clock.now()
+        current_ts = current_time.timestamp()
+        
+        for option in self.options:
+            if option['status'] != 'active':
+                continue
+            
+            if current_ts >= option['expiry_ts']:
+                # Check if ITM
+                if option['type'] == 'call':
+                    is_itm = self.btc_price > option['strike']
+                else:  # put
+                    is_itm = self.btc_price < option['strike']
+                
+                if is_itm:
+                    # Calculate payoff
+                    if option['type'] == 'call':
+                        payoff = max(0, self.btc_price - option['strike']) * option['quantity']
+                    else:  # put
+                        payoff = max(0, option['strike'] - self.btc_price) * option['quantity']
+                    
+                    option['status'] = 'exercised'
+                    option['settlement_price'] = self.btc_price
+                    option['payoff'] = payoff
+                    
+                    # Update liquidity
+                    self.liquidity -= payoff
+                    
+                    # Log transaction
+                    self.log_transaction({
+                        'type': 'exercise',
+                        'option_id': option['id'],
+                        'timestamp': current_time.isoformat(),
+                        'details': f"Exercise {option['type']} option, payoff ${payoff:.2f}"
+                    })
+                else:
+                    option['status'] = 'expired'
+                    option['settlement_price'] = self.btc_price
+                    option['payoff'] = 0
+                    
+                    # Log transaction
+                    self.log_transaction({
+                        'type': 'expire',
+                        'option_id': option['id'],
+                        'timestamp': current_time.isoformat(),
+                        'details': f"Option expired worthless"
+                    })
+    
+    def calculate_option_price(self, option_type, S, K, T):
+        """Simple Black-Scholes calculation"""
+        import math
+        from scipy.stats import norm
+        
+        r = 0.03  # Risk-free rate
+        
+        if T <= 0:
+            # At expiry
+            if option_type == 'call':
+                return max(0, S - K)
+            else:  # put
+                return max(0, K - S)
+        
+        sigma = self.vol_surface.vol(T, K, S)
+        d1 = (math.log(S/K) + (r + 0.5 * sigma**2) * T) / (sigma * math.sqrt(T))
+        d2 = d1 - sigma * math.sqrt(T)
+        
+        if option_type == 'call':
+            return S * norm.cdf(d1) - K * math.exp(-r * T) * norm.cdf(d2)
+        else:  # put
+            return K * math.exp(-r * T) * norm.cdf(-d2) - S * norm.cdf(-d1)
+    
+    def calculate_greeks(self, option_type, S, K, T):
+        """Calculate option Greeks"""
+        import math
+        from scipy.stats import norm
+        
+        r = 0.03  # Risk-free rate
+        
+        if T <= 0:
+            # At expiry
+            if option_type == 'call':
+                delta = 1.0 if S > K else 0.0
+            else:  # put
+                delta = -1.0 if S < K else 0.0
+            return {'delta': delta, 'gamma': 0.0, 'theta': 0.0, 'vega': 0.0}
+        
+        sigma = self.vol_surface.vol(T, K, S)
+        d1 = (math.log(S/K) + (r + 0.5 * sigma**2) * T) / (sigma * math.sqrt(T))
+        d2 = d1 - sigma * math.sqrt(T)
+        
+        # Calculate normal distribution values
+        norm_d1 = norm.cdf(d1)
+        norm_prime_d1 = norm.pdf(d1)
+        
+        # Delta
+        if option_type == 'call':
+            delta = norm_d1
+        else:  # put
+            delta = norm_d1 - 1
+        
+        # Gamma (same for calls and puts)
+        gamma = norm_prime_d1 / (S * sigma * math.sqrt(T))
+        
+        # Theta
+        if option_type == 'call':
+            theta = -S * norm_prime_d1 * sigma / (2 * math.sqrt(T)) - r * K * math.exp(-r * T) * norm.cdf(d2)
+        else:  # put
+            theta = -S * norm_prime_d1 * sigma / (2 * math.sqrt(T)) + r * K * math.exp(-r * T) * norm.cdf(-d2)
+        
+        # Vega (same for calls and puts)
+        vega = S * math.sqrt(T) * norm_prime_d1
+        
+        return {'delta': delta, 'gamma': gamma, 'theta': theta, 'vega': vega}
+    
+    def calculate_batch_prices(self, option_types, S, strikes, T):
+        """Vectorized Black-Scholes prices and per-unit Greeks for many options"""
+        from scipy.stats import norm
+        
+        r = 0.03  # Risk-free rate
+        
+        is_call = np.array([option_type == 'call' for option_type in option_types])
+        K = np.asarray(strikes, dtype=float)
+        T = np.asarray(T, dtype=float)
+        
+        # Expired entries fall back to intrinsic value with zero Greeks
+        live = T > 0
+        safe_T = np.where(live, T, 1.0)
+        sqrt_T = np.sqrt(safe_T)
+        sigma = self.vol_surface.vols(safe_T, K, S)
+        
+        d1 = (np.log(S / K) + (r + 0.5 * sigma**2) * safe_T) / (sigma * sqrt_T)
+        d2 = d1 - sigma * sqrt_T
+        cdf_d1 = norm.cdf(d1)
+        cdf_d2 = norm.cdf(d2)
+        pdf_d1 = norm.pdf(d1)
+        discount = np.exp(-r * safe_T)
+        
+        call_price = S * cdf_d1 - K * discount * cdf_d2
+        put_price = K * discount * (1 - cdf_d2) - S * (1 - cdf_d1)
+        intrinsic = np.where(is_call, np.maximum(0, S - K), np.maximum(0, K - S))
+        prices = np.where(live, np.where(is_call, call_price, put_price), intrinsic)
+        
+        expired_delta = np.where(is_call, (S > K).astype(float), -(S < K).astype(float))
+        delta = np.where(live, np.where(is_call, cdf_d1, cdf_d1 - 1), expired_delta)
+        gamma = np.where(live, pdf_d1 / (S * sigma * sqrt_T), 0.0)
+        decay = -S * pdf_d1 * sigma / (2 * sqrt_T)
+        theta = np.where(
+            live,
+            np.where(is_call, decay - r * K * discount * cdf_d2, decay + r * K * discount * (1 - cdf_d2)),
+            0.0
+        )
+        vega = np.where(live, S * sqrt_T * pdf_d1, 0.0)
+        
+        return prices, {'delta': delta, 'gamma': gamma, 'theta': theta, 'vega': vega}
+    
+    def update_portfolio_metrics(self, now=None):
+        """Update portfolio-wide Greeks"""
+        portfolio_greeks = {'delta': 0, 'gamma': 0, 'theta': 0, 'vega': 0}
+        current_ts = (now or self.clock.now()).timestamp()
+        
+        # Loop through active options
+        for option in self.options:
+            if option['status'] != 'active':
+                continue
+            
+            # Calculate time to expiry
+            seconds_to_expiry = option['expiry_ts'] - current_ts
+            if seconds_to_expiry <= 0:
+                continue  # Skip expired options
+            
+            time_to_expiry = seconds_to_expiry / (365 * 24 * 60 * 60)  # Convert to years
+            
+            # Recalculate Greeks with current price and time
+            greeks = self.calculate_greeks(
+                option['type'], self.btc_price, option['strike'], time_to_expiry
+            )
+            
+            # Update option Greeks
+            option['greeks'] = {
+                'delta': greeks['delta'] * option['quantity'],
+                'gamma': greeks['gamma'] * option['quantity'],
+                'theta': greeks['theta'] * option['quantity'],
+                'vega': greeks['vega'] * option['quantity']
+            }
+            
+            # Sum for portfolio metrics
+            for greek in portfolio_greeks:
+                portfolio_greeks[greek] += option['greeks'][greek]
+        
+        # Update portfolio metrics
+        self.portfolio_delta = portfolio_greeks['delta']
+        self.portfolio_gamma = portfolio_greeks['gamma']
+        self.portfolio_theta = portfolio_greeks['theta']
+        self.portfolio_vega = portfolio_greeks['vega']
+    
+    def net_delta(self):
+        """Portfolio delta plus the hedges held on every exchange, reachable or not"""
+        current_hedge_delta = sum(exch['hedge_delta'] for exch in self.exchanges.values())
+        return self.portfolio_delta + current_hedge_delta
+    
+    def on_exposure_change(self, now=None):
+        """Called after orders change the portfolio delta"""
+        if self.hedge_netter.on_delta_change(self.net_delta()):
+            self.rebalance_hedges(now)
+    
+    def rebalance_hedges(self, now=None):
+        """Rebalance hedges across exchanges"""
+        timestamp = (now or self.clock.now()).isoformat()
+        # Whatever was waiting in the netting window is covered by this rebalance
+        self.hedge_netter.reset()
+        
+        # The policy decides whether the net delta is worth trading, and how much
+        monotonic_now = self.clock.monotonic()
+        active_exchanges = self.routable_exchanges(now, monotonic_now)
+        if not active_exchanges:
+            return
+        adjustment_needed = self.hedge_policy.adjustment(self.net_delta(), {
+            'spot': self.btc_price,
+            'gamma': self.portfolio_gamma,
+            'volatility': self.volatility,
+            'cost': sum(self.exchanges[name]['taker_fee'] for name in active_exchanges) / len(active_exchanges),
+            'max_band': self.hedge_netter.hard_limit
+        })
+        if not adjustment_needed:
+            return
+        
+        # Distribute adjustment across available exchanges: half-open ones
+        # only get a probe order, unless nothing else is available
+        probes = {}
+        routed = [name for name in active_exchanges if self.venue_health.state(name, monotonic_now) != HALF_OPEN]
+        if routed and len(routed) < len(active_exchanges):
+            probe = math.copysign(min(self.venue_health.probe_size, abs(adjustment_needed) / len(active_exchanges)),
+                                  adjustment_needed)
+            probes = {name: probe for name in active_exchanges if name not in routed}
+        else:
+            routed = active_exchanges
+        routed_amount = adjustment_needed - sum(probes.values())
+        
+        # Cheapest split over the exchange books; health-scaled weights if none has liquidity
+        self.venue_health.apply(self.router, monotonic_now)
+        allocation = self.router.route(routed_amount, routed, reference=self.btc_price)
+        if not allocation:
+            weights = {name: self.exchanges[name]['weight'] * self.venue_health.weight(name) for name in routed}
+            if sum(weights.values()) <= 0:
+                weights = {name: self.exchanges[name]['weight'] for name in routed}
+            total_weight = sum(weights.values())
+            allocation = {name: routed_amount * weight / total_weight for name, weight in weights.items()}
+        allocation.update(probes)
+        
+        for name, exchange_adjustment in allocation.items():
+            exchange = self.exchanges[name]
+            
+            # Add new hedge position, filled against the exchange's book, unless
+            # the exchange rejects or times out; either way its health sees the attempt
+            latency, error_probability = self._exchange_attempt(name, monotonic_now)
+            filled, hedge_price = 0.0, None
+            if self.random.random() >= error_probability:
+                filled, hedge_price = self.exchange_books.execute(name, exchange_adjustment)
+            self.venue_health.record(name, bool(filled), latency, filled / exchange_adjustment, monotonic_now)
+            if not filled:
+                continue
+            fee = abs(filled) * hedge_price * exchange['taker_fee']
+            self.positions.apply_fill(name, filled, hedge_price, timestamp, fee=fee)
+            
+            # Update exchange hedge delta
+            exchange['hedge_delta'] += filled
+        
+        # Log transaction
+        self.log_transaction({
+            'type': 'hedge',
+            'timestamp': timestamp,
+            'details': f"Rebalanced hedges across {len(allocation)} exchanges, net adjustment: {adjustment_needed:.4f}"
+        })
+    
+    def adjust_fees(self, now=None):
+        """Dynamically adjust fee rate based on competitive positioning"""
+        # Calculate average competitor fee
+        avg_competitor_fee = sum(self.competitor_fees.values()) / len(self.competitor_fees)
+        
+        # Add small random changes to competitor fees
+        for platform in self.competitor_fees:
+            adjustment = self.rng.normal(0, 0.0001)
+            self.competitor_fees[platform] = max(0.0001, min(0.005, self.competitor_fees[platform] + adjustment))
+        
+        # Calculate volatility factor from the streaming estimate (the default
+        # 0.7, i.e. a factor of 1.0, until enough ticks have arrived)
+        recent_volatility = self.realized_vol.estimate()
+        volatility_factor = 1.0 + (recent_volatility - 0.7) * 0.5
+        volatility_factor = max(0.8, min(1.5, volatility_factor))
+        
+        # Adjust fee based on competitive positioning and volatility
+        target_fee = avg_competitor_fee * 0.95 * volatility_factor
+        
+        # Smooth fee changes
+        fee_change = (target_fee - self.fee_rate) * 0.3
+        new_fee = self.fee_rate + fee_change
+        
+        # Apply constraints
+        new_fee = max(0.0005, min(0.003, new_fee))
+        
+        # Record fee change
+        fee_change = {
+            'timestamp': (now or self.clock.now()).isoformat(),
+            'fee_rate': new_fee,
+            'avg_competitor_fee': avg_competitor_fee,
+            'volatility_factor': volatility_factor
+        }
+        self.fee_history.append(fee_change)
+        
+        # Update fee rate
+        self.fee_rate = new_fee
+        self.bus.publish('fee', fee_change)
+    
+    def _exchange_attempt(self, name, monotonic_now):
+        """Simulated round trip of an order on an exchange: (latency, probability it fails)"""
+        slowdown, error_probability = self.exchange_books.condition(name, monotonic_now)
+        base = self.exchanges[name]['latency']
+        latency = max(0.005, self.random.gauss(base, base * 0.3)) * slowdown
+        return latency, max(self.hedge_error_probability, error_probability)
+    
+    def routable_exchanges(self, now=None, monotonic_now=None):
+        """Exchanges hedges may use: active ones whose circuit is not open, plus the backup while one is"""
+        active = [name for name, exch in self.exchanges.items() if exch['status'] == 'active']
+        usable = self.venue_health.available(active, monotonic_now)
+        unavailable = [name for name in active if name not in usable]
+        if unavailable:
+            backups = [name for name, exch in self.exchanges.items() if exch['status'] == 'backup']
+            usable += self.venue_health.available(backups, monotonic_now)
+        
+        if bool(unavailable) != self.fallback_active:
+            # Log the switch to and from the backup
+            self.fallback_active = bool(unavailable)
+            fallback = [name for name in usable if self.exchanges[name]['status'] == 'backup']
+            details = (f"Exchange {', '.join(unavailable)} circuit open. Hedging on {', '.join(usable) or 'nothing'}."
+                       if unavailable else "All active exchanges recovered. Backup standing down.")
+            self.log_transaction({
+                'type': 'exchange_fallback',
+                'timestamp': (now or self.clock.now()).isoformat(),
+                'details': details
+            })
+            self.bus.publish('exchange', {'unavailable': unavailable, 'fallback': fallback,
+                                          'status': 'fallback' if unavailable else 'recovered'})
+        return usable
+    
+    def simulate_exchange_issue(self, now=None):
+        """Occasionally degrade an exchange to exercise the health monitor and fallback
+        
+        Its latency and error rate build up over a minute, it is down for a
+        few minutes, then it recovers; the circuit breakers react to what
+        the hedge attempts see.
+        """
+        candidates = [name for name in self.exchanges if name not in self.exchange_books.incidents]
+        if not candidates:
+            return
+        name = self.random.choice(candidates)
+        outage = self.random.uniform(60, 300)
+        self.exchange_books.start_incident(name, self.clock.monotonic(), ramp=60.0, outage=outage)
+        self.bus.publish('exchange', {'exchange': name, 'status': 'degrading', 'outage': outage})
@@ -0,0 +1,239 @@
+# tick_recorder.py
+import glob
+import json
+import os
+import time
+import numpy as np
+
+# Fixed-width little-endian record, padded to 40 bytes so fields stay aligned
+TICK_DTYPE = np.dtype([
+    ('time_ns', '<i8'),
+    ('price', '<f8'),
+    ('bid', '<f8'),
+    ('ask', '<f8'),
+    ('source', '<u2'),
+    ('_pad', 'V6'),
+])
+
+# File header: count is updated after each record is written, so readers
+# never see a partially written record
+HEADER_DTYPE = np.dtype([
+    ('magic', 'S8'),
+    ('version', '<u4'),
+    ('record_size', '<u4'),
+    ('capacity', '<u8'),
+    ('count', '<u8'),
+    ('first_ns', '<i8'),
+    ('last_ns', '<i8'),
+    ('_pad', 'V16'),
+])
+
+MAGIC = b'BTCTICK1'
+VERSION = 1
+
+# Known sources; new names are assigned the next free id and saved with the recording
+DEFAULT_SOURCES = {
+    'simulation': 1,
+    'coinbase': 2,
+    'binance': 3,
+    'kraken': 4,
+    'ftx': 5,
+    'consolidated': 6,
+}
+
+def _open_segment(path, capacity=None):
+    """Map a segment file; creates and preallocates it when capacity is given"""
+    if capacity is not None:
+        size = HEADER_DTYPE.itemsize + capacity * TICK_DTYPE.itemsize
+        with open(path, 'wb') as f:
+            f.truncate(size)
+        header = np.memmap(path, dtype=HEADER_DTYPE, mode='r+', shape=(1,))
+        header['magic'] = MAGIC
+        header['version'] = VERSION
+        header['record_size'] = TICK_DTYPE.itemsize
+        header['capacity'] = capacity
+        header['count'] = 0
+        mode = 'r+'
+    else:
+        header = np.memmap(path, dtype=HEADER_DTYPE, mode='r', shape=(1,))
+        if header['magic'][0] != MAGIC:
+            raise ValueError(f"{path} is not a tick recording")
+        capacity = int(header['capacity'][0])
+        mode = 'r'
+    records = np.memmap(path, dtype=TICK_DTYPE, mode=mode, offset=HEADER_DTYPE.itemsize, shape=(capacity,))
+    return header, records
+
+class TickRecorder:
+    """Appends ticks as fixed-width binary records to rotating memory-mapped files
+
+    Segments are preallocated, so an append is a handful of stores into mapped
+    memory with no system call. When a segment fills up the recorder rotates to
+    a new file. One writer per directory; any number of TickReader instances
+    can read the same files concurrently.
+    """
+
+    def __init__(self, directory, segment_capacity=1_000_000, max_segments=None):
+        self.directory = directory
+        self.segment_capacity = segment_capacity
+        self.max_segments = max_segments    # oldest segments are deleted beyond this
+        os.makedirs(directory, exist_ok=True)
+
+        self.sources_path = os.path.join(directory, 'sources.json')
+        self.sources = dict(DEFAULT_SOURCES)
+        if os.path.exists(self.sources_path):
+            with open(self.sources_path) as f:
+                self.sources.update(json.load(f))
+        else:
+            self._save_sources()
+
+        existing = segment_paths(directory)
+        self.segment_index = int(os.path.basename(existing[-1])[6:12]) + 1 if existing else 0
+        self.header = None
+        self.records = None
+        # Resume after the last tick already recorded, so time stays non-decreasing across restarts
+        self.last_ns = 0
+        for path in reversed(existing):
+            header, _ = _open_segment(path)
+            if header['count'][0]:
+                self.last_ns = int(header['last_ns'][0])
+                break
+        self._rotate()
+
+    def _save_sources(self):
+        with open(self.sources_path, 'w') as f:
+            json.dump(self.sources, f)
+
+    def source_id(self, name):
+        source = self.sources.get(name)
+        if source is None:
+            source = max(self.sources.values()) + 1
+            self.sources[name] = source
+            self._save_sources()
+        return source
+
+    def _rotate(self):
+        if self.records is not None:
+            self.records.flush()
+            self.header.flush()
+        path = os.path.join(self.directory, f'ticks-{self.segment_index:06d}.bin')
+        self.segment_index += 1
+        self.header, self.records = _open_segment(path, self.segment_capacity)
+        self.count = 0
+
+        # Cache field views so append() does no field lookups
+        self._time = self.records['time_ns']
+        self._price = self.records['price']
+        self._bid = self.records['bid']
+        self._ask = self.records['ask']
+        self._source = self.records['source']
+        self._header_count = self.header['count']
+        self._header_last = self.header['last_ns']
+
+        if self.max_segments is not None:
+            for old_path in segment_paths(self.directory)[:-self.max_segments]:
+                os.remove(old_path)
+
+    def record(self, price, bid, ask, source='simulation', time_ns=None):
+        """Append one tick; source is a name or a numeric source id"""
+        if self.count == self.segment_capacity:
+            self._rotate()
+        if time_ns is None:
+            time_ns = time.time_ns()
+        # Keep time non-decreasing within the recording so range seeks can bisect
+        if time_ns < self.last_ns:
+            time_ns = self.last_ns
+        if isinstance(source, str):
+            source = self.source_id(source)
+
+        i = self.count
+        self._time[i] = time_ns
+        self._price[i] = price
+        self._bid[i] = bid
+        self._ask[i] = ask
+        self._source[i] = source
+        if i == 0:
+            self.header['first_ns'] = time_ns
+        self._header_last[0] = time_ns
+        self.last_ns = time_ns
+
+        # Publish the record to readers
+        self.count = i + 1
+        self._header_count[0] = self.count
+
+    def flush(self):
+        self.records.flush()
+        self.header.flush()
+
+    def close(self):
+        self.flush()
+        self.records = None
+        self.header = None
+
+def segment_paths(directory):
+    return sorted(glob.glob(os.path.join(directory, 'ticks-*.bin')))
+
+class TickReader:
+    """Zero-copy reader over a recording directory, indexed by time"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.segments = {}  # path -> (header, records)
+
+    def _segments(self):
+        for path in segment_paths(self.directory):
+            if path not in self.segments:
+                self.segments[path] = _open_segment(path)
+        for path in list(self.segments):
+            if not os.path.exists(path):
+                del self.segments[path]
+        return [self.segments[path] for path in sorted(self.segments)]
+
+    def sources(self):
+        """Source id -> name mapping for the recording"""
+        with open(os.path.join(self.directory, 'sources.json')) as f:
+            return {source: name for name, source in json.load(f).items()}
+
+    def range(self, start_ns=None, end_ns=None):
+        """Records with start_ns <= time_ns < end_ns, as zero-copy views (one per segment)
+
+        Segments are skipped using the first/last times in their headers and
+        the bounds within a segment are found by bisecting its time column.
+        """
+        views = []
+        for header, records in self._segments():
+            count = int(header['count'][0])
+            if count == 0:
+                continue
+            if end_ns is not None and header['first_ns'][0] >= end_ns:
+                continue
+            if start_ns is not None and header['last_ns'][0] < start_ns:
+                continue
+            times = records['time_ns'][:count]
+            lo = 0 if start_ns is None else np.searchsorted(times, start_ns, side='left')
+            hi = count if end_ns is None else np.searchsorted(times, end_ns, side='left')
+            if hi > lo:
+                views.append(records[lo:hi])
+        return views
+
+    def read(self, start_ns=None, end_ns=None):
+        """Like range(), but concatenated into a single array (copies)"""
+        views = self.range(start_ns, end_ns)
+        if not views:
+            return np.empty(0, dtype=TICK_DTYPE)
+        return np.concatenate(views)
+
+    def latest(self, n=1):
+        """The last n records across segments"""
+        views = []
+        remaining = n
+        for header, records in reversed(self._segments()):
+            count = int(header['count'][0])
+            take = min(remaining, count)
+            if take:
+                views.insert(0, records[count - take:count])
+                remaining -= take
+            if remaining == 0:
+                break
+        if not views:
+            return np.empty(0, dtype=TICK_DTYPE)
+        return np.concatenate(views)
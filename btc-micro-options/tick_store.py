@@ -0,0 +1,102 @@
+# tick_store.py
+import datetime
+import numpy as np
+from clock import SystemClock
+
+class TickStore:
+    """Fixed-size ring buffer of ticks held in preallocated float64 columns
+
+    Each tick is written twice, at slot i and at slot i + capacity, so the
+    most recent n ticks always form one contiguous slice. Appends are O(1)
+    and windows are zero-copy NumPy views. There is a single writer (the
+    feed or simulation thread); readers that keep data across ticks should
+    use snapshot() instead of holding on to a live view. Ticks appended
+    without a timestamp are stamped from the injected clock.
+    """
+
+    PRICE, BID, ASK, TIME = range(4)
+
+    def __init__(self, capacity=1000, clock=None):
+        self.capacity = capacity
+        self.clock = clock or SystemClock()
+        self.data = np.zeros((4, 2 * capacity), dtype=np.float64)
+        self._price, self._bid, self._ask, self._time = self.data
+        self.count = 0  # total ticks ever appended
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, price, bid, ask, timestamp=None):
+        """Record a tick; timestamp is epoch seconds (defaults to the clock's now)"""
+        if timestamp is None:
+            timestamp = self.clock.time()
+        slot = self.count % self.capacity
+        mirror = slot + self.capacity
+        self._price[slot] = self._price[mirror] = price
+        self._bid[slot] = self._bid[mirror] = bid
+        self._ask[slot] = self._ask[mirror] = ask
+        self._time[slot] = self._time[mirror] = timestamp
+        # Publish only after the values are in place
+        self.count += 1
+
+    def _window(self, count, n):
+        n = min(len(self) if n is None else n, count, self.capacity)
+        end = count % self.capacity + self.capacity
+        return self.data[:, end - n:end]
+
+    def window(self, n=None):
+        """Zero-copy view of the last n ticks, shape (4, n) rows price/bid/ask/time"""
+        return self._window(self.count, n)
+
+    def prices(self, n=None):
+        return self.window(n)[self.PRICE]
+
+    def bids(self, n=None):
+        return self.window(n)[self.BID]
+
+    def asks(self, n=None):
+        return self.window(n)[self.ASK]
+
+    def times(self, n=None):
+        return self.window(n)[self.TIME]
+
+    def since(self, timestamp):
+        """Zero-copy view of the ticks recorded after the given epoch time"""
+        window = self.window()
+        start = np.searchsorted(window[self.TIME], timestamp, side='right')
+        return window[:, start:]
+
+    def snapshot(self, n=None):
+        """Consistent copy of the last n ticks, safe against a concurrent append"""
+        while True:
+            count = self.count
+            data = self._window(count, n).copy()
+            # Appends made while copying only clobber the window once they wrap into it
+            if self.count - count <= self.capacity - data.shape[1]:
+                return data
+
+    def latest(self):
+        if self.count == 0:
+            return None
+        column = self.window(1)[:, 0]
+        return {
+            'price': float(column[self.PRICE]),
+            'bid': float(column[self.BID]),
+            'ask': float(column[self.ASK]),
+            'time': float(column[self.TIME])
+        }
+
+    def to_records(self, n=None, since=None):
+        """Last n ticks (optionally only those after epoch time since) as API-friendly dicts"""
+        data = self.snapshot(n)
+        if since is not None:
+            data = data[:, np.searchsorted(data[self.TIME], since, side='right'):]
+        return [
+            {
+                'price': price,
+                'bid': bid,
+                'ask': ask,
+                'timestamp': datetime.datetime.fromtimestamp(timestamp, tz=datetime.timezone.utc).isoformat()
+            }
+            for price, bid, ask, timestamp in zip(*data.tolist())
+        ]
@@ -0,0 +1,170 @@
+# venue_health.py
+from clock import SystemClock
+
+CLOSED = 'closed'           # healthy: takes traffic
+OPEN = 'open'               # tripped: no traffic until the cooldown runs out
+HALF_OPEN = 'half_open'     # cooled down: small probe orders decide whether it recovers
+
+class VenueHealth:
+    """Per-venue health from hedge attempts, with a circuit breaker per venue
+
+    Every hedge leg is reported through record(): how it resolved, how long
+    it took and how much of it filled. Each venue keeps EWMAs (weight alpha
+    per attempt) of its latency, error rate (rejections and timeouts) and
+    fill ratio. They feed routing continuously through apply() and
+    weight(), so a venue that slows down or starts failing loses flow well
+    before its breaker trips. A venue the router has stopped using gets no
+    new measurements, so between attempts its figures relax back towards a
+    healthy venue's with a half-life of recovery_halflife seconds, and flow
+    returns to it gradually.
+
+    The breaker opens once the error rate reaches error_threshold (after
+    min_samples attempts), after max_failures failures in a row, or on trip(). An open venue takes nothing for
+    `cooldown` seconds, then turns half-open and gets probe_size orders
+    only: probe_successes clean probes close it, one failure reopens it with
+    the cooldown doubled, up to max_cooldown.
+    """
+
+    def __init__(self, venues, baseline_latency=None, alpha=0.2, error_threshold=0.5, min_samples=5, max_failures=3,
+                 cooldown=30.0, max_cooldown=600.0, probe_size=0.01, probe_successes=2,
+                 failure_cost=0.001, recovery_halflife=60.0, clock=None):
+        self.alpha = alpha
+        self.error_threshold = error_threshold
+        self.min_samples = min_samples
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.probe_size = probe_size            # BTC per order on a half-open venue
+        self.probe_successes = probe_successes
+        self.failure_cost = failure_cost        # cost of an attempt that fails (fraction of notional)
+        self.recovery_halflife = recovery_halflife
+        self.clock = clock or SystemClock()
+        baseline_latency = baseline_latency or {}
+        self.venues = {}
+        for venue in venues:
+            self.venues[venue] = {
+                'state': CLOSED,
+                'baseline_latency': baseline_latency.get(venue, 0.1),
+                'latency': baseline_latency.get(venue, 0.1),    # EWMA, seconds
+                'error_rate': 0.0,                              # EWMA of failed attempts
+                'fill_ratio': 1.0,                              # EWMA of filled / requested
+                'attempts': 0,
+                'failures': 0,
+                'consecutive_failures': 0,
+                'probes': 0,                # clean probes since turning half-open
+                'cooldown': cooldown,       # current open period, doubled on each failed probe
+                'opened_at': None,          # monotonic time the breaker last opened
+                'updated_at': None,         # monotonic time of the last attempt or relaxation
+                'trips': 0,
+                'recoveries': 0,
+            }
+        self.stats = {
+            'attempts': 0,
+            'failures': 0,
+            'trips': 0,
+            'recoveries': 0,
+        }
+
+    def state(self, venue, monotonic_now=None):
+        """Breaker state; an open breaker whose cooldown has run out turns half-open here"""
+        health = self.venues[venue]
+        if health['state'] == OPEN:
+            monotonic_now = self.clock.monotonic() if monotonic_now is None else monotonic_now
+            if monotonic_now - health['opened_at'] >= health['cooldown']:
+                health['state'] = HALF_OPEN
+                health['probes'] = 0
+                print(f"🔎 {venue} cooled down, probing")
+        return health['state']
+
+    def available(self, venues, monotonic_now=None):
+        """The venues whose breaker lets traffic through (closed or half-open)"""
+        monotonic_now = self.clock.monotonic() if monotonic_now is None else monotonic_now
+        return [venue for venue in venues if self.state(venue, monotonic_now) != OPEN]
+
+    def _relax(self, venue, monotonic_now):
+        # Decay the figures towards a healthy venue's for the time since they were last updated
+        health = self.venues[venue]
+        if health['updated_at'] is not None and monotonic_now > health['updated_at']:
+            keep = 0.5 ** ((monotonic_now - health['updated_at']) / self.recovery_halflife)
+            baseline = health['baseline_latency']
+            health['latency'] = baseline + (health['latency'] - baseline) * keep
+            health['error_rate'] *= keep
+            health['fill_ratio'] = 1.0 - (1.0 - health['fill_ratio']) * keep
+        health['updated_at'] = monotonic_now
+        return health
+
+    def record(self, venue, ok, latency=None, fill_ratio=1.0, monotonic_now=None):
+        """One hedge attempt: ok is False for a rejection or timeout"""
+        monotonic_now = self.clock.monotonic() if monotonic_now is None else monotonic_now
+        health = self._relax(venue, monotonic_now)
+        alpha = self.alpha
+        health['attempts'] += 1
+        self.stats['attempts'] += 1
+        if latency is not None:
+            health['latency'] += alpha * (latency - health['latency'])
+        health['error_rate'] += alpha * ((0.0 if ok else 1.0) - health['error_rate'])
+        if ok:
+            health['fill_ratio'] += alpha * (float(fill_ratio) - health['fill_ratio'])
+            health['consecutive_failures'] = 0
+        else:
+            health['failures'] += 1
+            health['consecutive_failures'] += 1
+            self.stats['failures'] += 1
+
+        state = self.state(venue, monotonic_now)
+        if state == HALF_OPEN:
+            if not ok:
+                # Still failing: back off for longer
+                health['cooldown'] = min(self.max_cooldown, health['cooldown'] * 2)
+                self._open(venue, monotonic_now)
+            else:
+                health['probes'] += 1
+                if health['probes'] >= self.probe_successes:
+                    health['state'] = CLOSED
+                    health['cooldown'] = self.cooldown
+                    # Start the recovered venue from a clean record, not the one that tripped it
+                    health['error_rate'] = 0.0
+                    health['recoveries'] += 1
+                    self.stats['recoveries'] += 1
+                    print(f"✅ {venue} recovered")
+        elif state == CLOSED and not ok:
+            if health['consecutive_failures'] >= self.max_failures or \
+                    (health['attempts'] >= self.min_samples and health['error_rate'] >= self.error_threshold):
+                self._open(venue, monotonic_now)
+
+    def trip(self, venue, monotonic_now=None):
+        """Open the venue's breaker now (e.g. its connection failed)"""
+        if self.venues[venue]['state'] != OPEN:
+            self._open(venue, monotonic_now)
+
+    def _open(self, venue, monotonic_now=None):
+        health = self.venues[venue]
+        health['state'] = OPEN
+        health['opened_at'] = self.clock.monotonic() if monotonic_now is None else monotonic_now
+        health['trips'] += 1
+        self.stats['trips'] += 1
+        print(f"⛔ {venue} circuit open for {health['cooldown']:.0f}s "
+              f"(error rate {health['error_rate']:.0%}, latency {health['latency'] * 1000:.0f}ms)")
+
+    def apply(self, router, monotonic_now=None):
+        """Set the router's expected latency and failure cost (fraction of notional) per venue"""
+        monotonic_now = self.clock.monotonic() if monotonic_now is None else monotonic_now
+        for venue in self.venues:
+            health = self._relax(venue, monotonic_now)
+            router.latencies[venue] = health['latency']
+            router.penalties[venue] = self.failure_cost * (health['error_rate'] + 1.0 - health['fill_ratio'])
+
+    def weight(self, venue):
+        """0..1 multiplier for a venue's static weight: its share of what a healthy venue delivers"""
+        health = self.venues[venue]
+        if health['state'] == OPEN:
+            return 0.0
+        speed = min(1.0, health['baseline_latency'] / health['latency']) if health['latency'] > 0 else 1.0
+        return (1.0 - health['error_rate']) * health['fill_ratio'] * speed
+
+    def get_stats(self):
+        venues = {}
+        for venue, health in self.venues.items():
+            venues[venue] = {key: value for key, value in health.items() if key != 'opened_at'}
+            venues[venue]['weight'] = self.weight(venue)
+        return dict(self.stats, venues=venues)
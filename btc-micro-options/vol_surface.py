@@ -0,0 +1,206 @@
+# vol_surface.py
+import bisect
+import math
+import threading
+import numpy as np
+from clock import SystemClock
+
+SECONDS_PER_YEAR = 365 * 24 * 60 * 60
+
+# Grid nodes: expiries in seconds (1 minute to 1 week) and standardized
+# moneyness z = log(K/S) / (atm_vol * sqrt(T)); lookups outside are clamped
+EXPIRIES = (60, 300, 900, 3600, 14400, 86400, 604800)
+MONEYNESS = (-3.0, -2.0, -1.0, -0.5, 0.0, 0.5, 1.0, 2.0, 3.0)
+
+class VolSurface:
+    """Implied volatility by expiry and moneyness, read by every pricing call
+
+    calibrate() sets the ATM level of each expiry from the forecaster's
+    vol over that horizon once it has been fitted; before that, from a
+    RealizedVolatility estimator, the short end following its estimate()
+    and longer expiries mean-reverting towards its slow EWMA
+    (reversion_halflife, seconds). A fixed skew and curvature
+    in z add the smile, and fresh competitor quotes shift the level of the
+    expiry they fall in. Each calibration publishes a new snapshot of the
+    per-expiry ATM levels, so pricing never waits on it: vol() interpolates
+    the current snapshot and applies the smile, memoized per (T, K, S) until
+    the next calibration.
+    """
+
+    def __init__(self, realized_vol=None, clock=None, forecaster=None, default=0.7, bounds=(0.2, 3.0), skew=-0.05,
+                 curvature=0.03, reversion_halflife=1800.0, calibrate_interval=1.0, quote_ttl=300.0,
+                 quote_weight=0.5, cache_size=4096):
+        self.realized_vol = realized_vol
+        self.forecaster = forecaster  # e.g. GarchForecaster: forecast(seconds) -> annualized vol
+        self.clock = clock or SystemClock()
+        self.default = default
+        self.bounds = bounds
+        self.skew = skew
+        self.curvature = curvature
+        self.reversion_halflife = reversion_halflife
+        self.calibrate_interval = calibrate_interval
+        self.quote_ttl = quote_ttl
+        self.quote_weight = quote_weight
+        self.cache_size = cache_size
+        self.expiry_years = np.array(EXPIRIES) / SECONDS_PER_YEAR
+        self.moneyness = np.array(MONEYNESS)
+        
+        # Fixed per node, so calibration is a few multiplications
+        k = math.log(2) / reversion_halflife
+        self.decays = [(1 - math.exp(-k * seconds)) / (k * seconds) for seconds in EXPIRIES]
+        self.smile_factors = [self._smile(z) for z in MONEYNESS]
+
+        # Competitor quotes: (source, expiry index) -> (iv, z, timestamp)
+        self.quotes = {}
+        self.quotes_lock = threading.Lock()
+        self.last_calibration_at = None
+        self.stats = {
+            'calibrations': 0,
+            'lookups': 0,
+            'cache_hits': 0,
+            'quotes': 0,
+        }
+        self.snapshot = None
+        self.calibrate()
+
+    def _bound(self, sigma):
+        low, high = self.bounds
+        return max(low, min(high, sigma))
+
+    def _estimates(self):
+        """(short, long) annualized vols from the estimator, default when unavailable"""
+        if self.realized_vol is None:
+            return self.default, self.default
+        short = self.realized_vol.estimate()
+        long = self.realized_vol.slow.annualized()
+        long = short if long is None else long
+        return self._bound(short), self._bound(long)
+
+    def calibrate(self):
+        """Rebuild the grid and publish it as the new snapshot"""
+        if self.forecaster is not None and self.forecaster.ready():
+            atm = [self.forecaster.forecast(seconds) for seconds in EXPIRIES]
+        else:
+            # ATM term structure: variance decays from the short to the long level
+            short, long = self._estimates()
+            atm = [math.sqrt(long ** 2 + (short ** 2 - long ** 2) * decay) for decay in self.decays]
+
+        # Fresh competitor quotes move the level of their expiry
+        now = self.clock.time()
+        residuals = [[] for _ in EXPIRIES]
+        with self.quotes_lock:
+            for key, (iv, z, timestamp) in list(self.quotes.items()):
+                if now - timestamp > self.quote_ttl:
+                    del self.quotes[key]
+                    continue
+                i = key[1]
+                residuals[i].append(iv - atm[i] * self._smile(z))
+        for i, values in enumerate(residuals):
+            if values:
+                atm[i] += self.quote_weight * sum(values) / len(values)
+        atm = [self._bound(a) for a in atm]
+
+        # Only the ATM levels change; the smile is applied at lookup time
+        self.snapshot = {
+            'atm': atm,
+            'atm_array': np.array(atm),
+            'calibrated_at': now,
+            'cache': {},
+        }
+        self.last_calibration_at = self.clock.monotonic()
+        self.stats['calibrations'] += 1
+        return self.snapshot
+
+    def maybe_calibrate(self, monotonic_now=None):
+        """Recalibrate once calibrate_interval has passed; called from the tick loop"""
+        monotonic_now = self.clock.monotonic() if monotonic_now is None else monotonic_now
+        if monotonic_now - self.last_calibration_at >= self.calibrate_interval:
+            self.calibrate()
+
+    def _smile(self, z):
+        z = max(MONEYNESS[0], min(MONEYNESS[-1], z))
+        return 1.0 + self.skew * z + self.curvature * z * z
+
+    def observe_quote(self, source, expiry_seconds, strike, spot, iv):
+        """Record a competitor's implied vol; it is used until quote_ttl expires"""
+        seconds = max(EXPIRIES[0], min(EXPIRIES[-1], expiry_seconds))
+        # Nearest expiry node in log time
+        i = min(range(len(EXPIRIES)), key=lambda n: abs(math.log(EXPIRIES[n] / seconds)))
+        atm = self.snapshot['atm'][i]
+        z = math.log(strike / spot) / (atm * math.sqrt(EXPIRIES[i] / SECONDS_PER_YEAR))
+        with self.quotes_lock:
+            self.quotes[(source, i)] = (iv, z, self.clock.time())
+        self.stats['quotes'] += 1
+
+    @staticmethod
+    def _bracket(nodes, x):
+        """(lower index, weight of the upper node) for linear interpolation, clamped"""
+        j = bisect.bisect_right(nodes, x)
+        if j <= 0:
+            return 0, 0.0
+        if j >= len(nodes):
+            return len(nodes) - 2, 1.0
+        return j - 1, (x - nodes[j - 1]) / (nodes[j] - nodes[j - 1])
+
+    def vol(self, T, K, S):
+        """Volatility for time to expiry T (years), strike K and spot S"""
+        snapshot = self.snapshot
+        cache = snapshot['cache']
+        key = (T, K, S)
+        self.stats['lookups'] += 1
+        sigma = cache.get(key)
+        if sigma is not None:
+            self.stats['cache_hits'] += 1
+            return sigma
+
+        # ATM level interpolated between expiry nodes, then the smile at z
+        seconds = max(T, 0.0) * SECONDS_PER_YEAR
+        i, wt = self._bracket(EXPIRIES, seconds)
+        atm = snapshot['atm']
+        atm_t = atm[i] + (atm[i + 1] - atm[i]) * wt
+        T_eff = max(seconds, EXPIRIES[0]) / SECONDS_PER_YEAR
+        z = math.log(K / S) / (atm_t * math.sqrt(T_eff))
+        sigma = self._bound(atm_t * self._smile(z))
+
+        if len(cache) >= self.cache_size:
+            cache.clear()
+        cache[key] = sigma
+        return sigma
+
+    def vols(self, T, K, S):
+        """Vectorized vol() for arrays of T (years) and K at one spot"""
+        snapshot = self.snapshot
+        T = np.asarray(T, dtype=float)
+        K = np.asarray(K, dtype=float)
+        expiries = self.expiry_years
+        moneyness = self.moneyness
+        T_clamped = np.clip(T, expiries[0], expiries[-1])
+
+        i = np.clip(np.searchsorted(expiries, T_clamped, side='right') - 1, 0, len(expiries) - 2)
+        wt = (T_clamped - expiries[i]) / (expiries[i + 1] - expiries[i])
+        atm = snapshot['atm_array']
+        atm_t = atm[i] + (atm[i + 1] - atm[i]) * wt
+        z = np.clip(np.log(K / S) / (atm_t * np.sqrt(np.maximum(T, expiries[0]))), moneyness[0], moneyness[-1])
+        return np.clip(atm_t * (1.0 + self.skew * z + self.curvature * z * z), *self.bounds)
+
+    def atm_vol(self, T=None):
+        """At-the-money vol for T (years), the shortest expiry by default"""
+        if T is None:
+            return self.snapshot['atm'][0]
+        return self.vol(T, 1.0, 1.0)
+
+    def to_dict(self):
+        """The surface at the grid nodes (rows: expiries, columns: moneyness)"""
+        snapshot = self.snapshot
+        return {
+            'expiries': list(EXPIRIES),
+            'moneyness': list(MONEYNESS),
+            'atm': snapshot['atm'],
+            'grid': [[self._bound(a * factor) for factor in self.smile_factors] for a in snapshot['atm']],
+            'calibrated_at': snapshot['calibrated_at'],
+        }
+
+    def get_stats(self):
+        with self.quotes_lock:
+            quotes = len(self.quotes)
+        return dict(self.stats, active_quotes=quotes, atm=self.snapshot['atm'][0])
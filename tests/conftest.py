@@ -0,0 +1,6 @@
+# conftest.py
+import os
+import sys
+
+# The application modules live flat in btc-micro-options/ (not a package)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'btc-micro-options'))
@@ -0,0 +1,18 @@
+# test_app.py
+import pytest
+
+from app import parse_option_request
+
+def test_parse_option_request_fills_defaults():
+    assert parse_option_request({'type': 'put', 'expiry': 60}, 40000.0) == \
+        {'type': 'put', 'strike': 40000.0, 'expiry': 60, 'quantity': 1.0}
+
+@pytest.mark.parametrize('field', ['strike', 'expiry', 'quantity'])
+@pytest.mark.parametrize('value', [float('nan'), float('inf'), float('-inf'), 'nan', 'inf', 0, -1])
+def test_parse_option_request_rejects_non_finite_and_non_positive(field, value):
+    with pytest.raises(ValueError):
+        parse_option_request({field: value}, 40000.0)
+
+def test_parse_option_request_rejects_unknown_type():
+    with pytest.raises(ValueError):
+        parse_option_request({'type': 'straddle'}, 40000.0)
@@ -0,0 +1,12 @@
+# test_bar_store.py
+from bar_store import BarSeries
+
+def test_open_bar_is_replaced_not_mutated():
+    series = BarSeries(10, 100)
+    series.update(100.0, 1.0, 1000.0)
+    held = series.bar     # what a concurrent snapshot may be holding
+    series.update(105.0, 2.0, 1001.0)
+
+    assert held == [1000.0, 100.0, 100.0, 100.0, 100.0, 1, 1.0, 1.0, 1.0]
+    assert series.bar == [1000.0, 100.0, 105.0, 100.0, 105.0, 2, 3.0, 1.0, 2.0]
+    assert series.snapshot()[:, -1].tolist() == series.bar
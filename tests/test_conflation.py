@@ -0,0 +1,72 @@
+# test_conflation.py
+import sys
+import threading
+import time
+
+from conflation import TickConflator
+
+def wait_for(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not met in time"
+        time.sleep(0.01)
+
+def test_subscribers_come_and_go_while_ticks_are_published():
+    conflator = TickConflator()
+    for i in range(50):
+        conflator.subscribe(lambda tick: None, 'chart')
+    errors = []
+    done = threading.Event()
+
+    def publisher():
+        price = 0
+        try:
+            while not done.is_set():
+                price += 1
+                conflator.publish({'price': price})
+                conflator.get_stats()
+        except Exception as e:
+            errors.append(e)
+
+    # Switch threads as often as possible so the churn lands mid-iteration
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    thread = threading.Thread(target=publisher)
+    thread.start()
+    try:
+        for i in range(300):
+            subscriber = conflator.subscribe(lambda tick: None, 'stream')
+            conflator.unsubscribe(subscriber.name)
+    finally:
+        done.set()
+        thread.join()
+        sys.setswitchinterval(interval)
+        conflator.stop()
+    assert errors == []
+    assert len(conflator.subscribers) == 50
+
+def test_slow_subscriber_gets_the_latest_tick_with_a_coalesced_count():
+    conflator = TickConflator()
+    release = threading.Event()
+    received = []
+
+    def slow(tick):
+        release.wait()
+        received.append(tick)
+
+    subscriber = conflator.subscribe(slow, 'slow')
+    conflator.publish({'price': 1})
+    # The first tick has been taken and the callback is now stuck on it
+    wait_for(lambda: subscriber.get_stats()['pending'] == 0)
+    for price in (2, 3, 4):
+        conflator.publish({'price': price})
+    release.set()
+    wait_for(lambda: len(received) == 2)
+    conflator.stop()
+    assert received == [{'price': 1, 'coalesced': 0}, {'price': 4, 'coalesced': 2}]
+
+def test_duplicate_names_get_a_suffix():
+    conflator = TickConflator()
+    names = [conflator.subscribe(lambda tick: None, 'engine').name for _ in range(3)]
+    conflator.stop()
+    assert names[0] == 'engine' and len(set(names)) == 3
@@ -0,0 +1,36 @@
+# test_feed_decoder.py
+import json
+
+from clock import SimulatedClock
+from feed_decoder import TickerDecoder
+from tick_store import TickStore
+
+def ticker(price):
+    return json.dumps({'type': 'ticker', 'price': str(price), 'best_bid': str(price - 1), 'best_ask': str(price + 1)})
+
+def test_only_ticker_objects_reach_the_store():
+    clock = SimulatedClock(start=1704067200.0)
+    store = TickStore(capacity=10, clock=clock)
+    decoder = TickerDecoder(store, clock=clock)
+    frames = [
+        ticker(40000),
+        json.dumps({'type': 'heartbeat', 'last_trade_id': 1}),
+        json.dumps({'type': 'l2update', 'note': 'mentions "ticker" in passing'}),
+        json.dumps(['ticker']),
+        json.dumps('"ticker"'),
+        '{"type": "ticker", "price": ',
+        json.dumps({'type': 'ticker', 'price': 'n/a', 'best_bid': '1', 'best_ask': '2'}),
+        ticker(40010),
+    ]
+    for raw in frames:
+        decoder(raw)
+
+    assert store.prices().tolist() == [40000.0, 40010.0]
+    assert store.times().tolist() == [1704067200.0, 1704067200.0]
+    stats = decoder.stats
+    assert (stats['frames'], stats['decoded'], stats['filtered'], stats['errors']) == (8, 2, 4, 2)
+
+def test_bytes_frames_are_decoded():
+    decoder = TickerDecoder(TickStore(capacity=10))
+    assert decoder.decode(ticker(40000).encode())['price'] == '40000'
+    assert decoder.decode(b'{"type": "heartbeat"}') is None
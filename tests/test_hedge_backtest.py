@@ -0,0 +1,14 @@
+# test_hedge_backtest.py
+import pytest
+
+from hedge_backtest import POLICY_FAMILIES, calibrate, option_book, run_policy
+from hedging_policy import FixedThreshold
+
+@pytest.mark.parametrize('family', sorted(POLICY_FAMILIES))
+def test_calibrate_lands_each_family_on_the_target_risk(family):
+    book = option_book(seed=0, hours=1.0)
+    floor = run_policy(FixedThreshold(0.0), book)['risk_per_minute']
+    make, low, high = POLICY_FAMILIES[family]
+    parameter, result = calibrate(make, low, high, book, 1.25 * floor)
+    assert low < parameter < high
+    assert result['risk_per_minute'] == pytest.approx(1.25 * floor, rel=0.03)
@@ -0,0 +1,65 @@
+# test_idempotency.py
+import threading
+import time
+from flask import Flask, Response, jsonify
+from idempotency import IdempotencyCache
+
+def make_app(cache):
+    app = Flask(__name__)
+    calls = {'stream': 0, 'slow': 0}
+
+    @app.route('/stream', methods=['POST'])
+    @cache.idempotent
+    def stream():
+        calls['stream'] += 1
+        def body():
+            yield '{"n": '
+            yield str(calls['stream'])
+            yield '}'
+        return Response(body(), mimetype='application/json')
+
+    @app.route('/slow', methods=['POST'])
+    @cache.idempotent
+    def slow():
+        calls['slow'] += 1
+        time.sleep(0.2)
+        if calls['slow'] == 1:
+            return jsonify({'error': 'rejected'}), 400
+        return jsonify({'ok': True})
+
+    return app, calls
+
+def test_unread_streamed_response_is_still_replayed():
+    cache = IdempotencyCache()
+    app, calls = make_app(cache)
+    client = app.test_client()
+    headers = {'Idempotency-Key': 'k1'}
+
+    response = client.post('/stream', data='x', headers=headers, buffered=False)
+    response.close()    # the client went away without reading the body
+
+    retry = client.post('/stream', data='x', headers=headers)
+    assert retry.status_code == 200
+    assert retry.get_json() == {'n': 1}
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert calls['stream'] == 1
+
+def test_waiter_takes_over_key_after_abort():
+    cache = IdempotencyCache(wait_timeout=2.0)
+    app, calls = make_app(cache)
+    headers = {'Idempotency-Key': 'k2'}
+    first = {}
+
+    def original():
+        first['status'] = app.test_client().post('/slow', data='y', headers=headers).status_code
+    thread = threading.Thread(target=original)
+    thread.start()
+    time.sleep(0.05)
+    duplicate = app.test_client().post('/slow', data='y', headers=headers)
+    thread.join()
+
+    # The original was rejected (and released the key); the waiter ran the request itself
+    assert first['status'] == 400
+    assert duplicate.status_code == 200
+    assert duplicate.get_json() == {'ok': True}
+    assert calls['slow'] == 2
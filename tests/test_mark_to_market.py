@@ -0,0 +1,32 @@
+# test_mark_to_market.py
+import pytest
+
+from mark_to_market import FUNDING_INTERVAL, HedgeMarker
+from positions import PositionKeeper
+
+def test_fill_is_not_charged_funding_for_the_interval_before_it():
+    keeper = PositionKeeper()
+    marker = HedgeMarker(keeper, default_funding_rate=0.0001)
+    marker.mark(1000.0, 0.0)
+    # Flat for a whole funding interval, then a fill just before the next mark
+    keeper.apply_fill('a', 1.0, 1000.0)
+    marker.mark(1000.0, FUNDING_INTERVAL)
+    assert marker.last_mark['funding'] == 0.0
+
+    # Long 1 BTC for the next interval: pays size * price * rate
+    marker.mark(1000.0, 2 * FUNDING_INTERVAL)
+    assert marker.last_mark['funding'] == pytest.approx(-0.1)
+
+def test_short_receives_funding_and_closing_stops_it():
+    keeper = PositionKeeper()
+    marker = HedgeMarker(keeper, funding_rates={'a': 0.0002})
+    keeper.apply_fill('a', -2.0, 1000.0)
+    marker.mark(1000.0, 0.0)
+    marker.mark(1000.0, FUNDING_INTERVAL / 2)
+    assert marker.last_mark['funding'] == pytest.approx(0.2)
+
+    keeper.apply_fill('a', 2.0, 1000.0)
+    marker.mark(1000.0, FUNDING_INTERVAL)       # the short was still held up to this mark
+    marker.mark(1000.0, 2 * FUNDING_INTERVAL)
+    assert marker.last_mark['funding'] == pytest.approx(0.4)
+    assert marker.to_dict()['venues']['a']['size'] == 0.0
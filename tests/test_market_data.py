@@ -0,0 +1,129 @@
+# test_market_data.py
+import asyncio
+import json
+import pytest
+
+websockets = pytest.importorskip("websockets")
+
+from market_data import MarketDataAggregator
+
+class StandInVenue:
+    """Local websocket server streaming {"bid", "ask", "price"} quotes until paused or dropped"""
+
+    def __init__(self, bid, ask, interval=0.02):
+        self.bid = bid
+        self.ask = ask
+        self.interval = interval
+        self.paused = False
+        self.connections = 0
+        self.clients = set()
+        self.server = None
+
+    async def handler(self, websocket):
+        self.connections += 1
+        self.clients.add(websocket)
+        try:
+            while True:
+                if not self.paused:
+                    await websocket.send(json.dumps({"bid": self.bid, "ask": self.ask,
+                                                     "price": (self.bid + self.ask) / 2}))
+                try:
+                    # Doubles as the pause between quotes; returns when the connection closes
+                    await asyncio.wait_for(websocket.wait_closed(), self.interval)
+                    break
+                except asyncio.TimeoutError:
+                    pass
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            self.clients.discard(websocket)
+
+    async def start(self):
+        self.server = await websockets.serve(self.handler, "127.0.0.1", 0)
+        return f"ws://127.0.0.1:{self.server.sockets[0].getsockname()[1]}"
+
+    async def drop_clients(self):
+        for websocket in list(self.clients):
+            await websocket.close()
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+async def wait_for(condition, timeout=3.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("condition not met in time")
+        await asyncio.sleep(0.01)
+
+def run_with_venues(quotes, scenario, **options):
+    """Start stand-in venues and an aggregator over them, run scenario(aggregator, venues), then shut down"""
+    async def main():
+        venues = {name: StandInVenue(bid, ask) for name, (bid, ask) in quotes.items()}
+        urls = {name: await venue.start() for name, venue in venues.items()}
+        options.setdefault("base_delay", 0.05)
+        options.setdefault("max_delay", 0.1)
+        aggregator = MarketDataAggregator(urls, **options)
+        task = asyncio.create_task(aggregator.run())
+        try:
+            await scenario(aggregator, venues)
+        finally:
+            aggregator.stop()
+            for venue in venues.values():
+                await venue.drop_clients()
+                await venue.close()
+            await asyncio.wait_for(task, 5.0)
+    asyncio.run(main())
+
+def test_consolidated_bbo_takes_best_bid_and_ask_across_venues():
+    async def scenario(aggregator, venues):
+        await wait_for(lambda: len(aggregator.quotes) == 3)
+        await wait_for(lambda: aggregator.bbo["bid"] == 40001.0 and aggregator.bbo["ask"] == 40002.0)
+        bbo = aggregator.bbo
+        assert (bbo["bid_venue"], bbo["ask_venue"]) == ("a", "b")
+        assert bbo["price"] == 40001.5
+        assert not bbo["crossed"]
+
+    run_with_venues({"a": (40001.0, 40004.0), "b": (39999.0, 40002.0), "c": (40000.0, 40003.0)}, scenario)
+
+def test_silent_venue_drops_out_of_the_bbo():
+    async def scenario(aggregator, venues):
+        await wait_for(lambda: aggregator.bbo is not None and aggregator.bbo["bid_venue"] == "a")
+        venues["a"].paused = True
+        # a's quote ages out; b keeps quoting and now sets the bid
+        await wait_for(lambda: aggregator.bbo["bid_venue"] == "b")
+        assert aggregator.bbo["bid"] == 39999.0
+        assert aggregator.get_quote_table()["a"]["stale"]
+        await wait_for(lambda: aggregator.connections["a"].is_stale())
+        assert not aggregator.connections["b"].is_stale()
+        assert not aggregator.is_stale()
+
+    run_with_venues({"a": (40001.0, 40004.0), "b": (39999.0, 40002.0)}, scenario, max_quote_age=0.2, stale_after=0.2)
+
+def test_venue_reconnects_after_disconnect():
+    async def scenario(aggregator, venues):
+        await wait_for(lambda: "a" in aggregator.quotes and "b" in aggregator.quotes)
+        await venues["a"].drop_clients()
+        await wait_for(lambda: aggregator.connections["a"].metrics["reconnects"] >= 1)
+        assert venues["a"].connections == 2
+        venues["a"].bid = 40010.0
+        await wait_for(lambda: aggregator.bbo["bid"] == 40010.0)
+        # The other venue's connection was never interrupted
+        assert aggregator.connections["b"].metrics["reconnects"] == 0
+
+    run_with_venues({"a": (40001.0, 40004.0), "b": (39999.0, 40002.0)}, scenario)
+
+def test_failing_consumer_does_not_stop_other_venues():
+    def consumer(bbo):
+        if bbo["bid_venue"] == "a":
+            raise RuntimeError("consumer bug")
+
+    async def scenario(aggregator, venues):
+        aggregator.subscribe(consumer)
+        await wait_for(lambda: aggregator.connections["a"].metrics["callback_errors"] >= 3)
+        messages = aggregator.connections["b"].metrics["messages"]
+        await wait_for(lambda: aggregator.connections["b"].metrics["messages"] > messages + 3)
+        assert aggregator.connections["a"].connected
+
+    run_with_venues({"a": (40001.0, 40004.0), "b": (39999.0, 40002.0)}, scenario)
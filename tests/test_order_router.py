@@ -0,0 +1,35 @@
+# test_order_router.py
+import pytest
+from order_book import L2Book
+from order_router import SmartOrderRouter
+
+def make_book(venue, best_ask, size, levels=10, tick=5.0):
+    book = L2Book(venue)
+    for i in range(levels):
+        book.update('ask', best_ask + i * tick, size)
+        book.update('bid', best_ask - (i + 1) * tick, size)
+    return book
+
+def test_route_splits_across_venues():
+    books = {'deep': make_book('deep', 40005.0, 2.0), 'thin': make_book('thin', 40005.0, 0.5)}
+    router = SmartOrderRouter(books, fees={'deep': 0.0005, 'thin': 0.0005})
+
+    allocation = router.route(3.0, reference=40000.0)
+
+    assert set(allocation) == {'deep', 'thin'}
+    assert sum(allocation.values()) == pytest.approx(3.0)
+    # Same costs, so sizes follow depth
+    assert allocation['deep'] > allocation['thin'] > 0
+
+def test_route_skips_expensive_venue_for_small_orders():
+    books = {'cheap': make_book('cheap', 40005.0, 2.0), 'dear': make_book('dear', 40050.0, 2.0)}
+    router = SmartOrderRouter(books)
+
+    allocation = router.route(0.1, reference=40000.0)
+
+    assert allocation == {'cheap': pytest.approx(0.1)}
+
+def test_route_without_liquidity_is_empty():
+    router = SmartOrderRouter({'empty': L2Book('empty')})
+    assert router.route(1.0) == {}
+    assert router.stats['unroutable'] == 1
@@ -0,0 +1,48 @@
+# test_positions.py
+import pytest
+
+from positions import PositionKeeper
+
+def test_adding_averages_the_cost():
+    keeper = PositionKeeper()
+    keeper.apply_fill('a', 1.0, 100.0)
+    assert keeper.apply_fill('a', 3.0, 200.0) == 0.0
+    position = keeper.position('a')
+    assert position['size'] == 4.0
+    assert position['avg_price'] == pytest.approx(175.0)
+
+def test_reducing_realizes_against_the_average_cost():
+    keeper = PositionKeeper()
+    keeper.apply_fill('a', 2.0, 100.0)
+    assert keeper.apply_fill('a', -0.5, 120.0) == pytest.approx(10.0)
+    position = keeper.position('a')
+    assert position['size'] == 1.5
+    assert position['avg_price'] == 100.0
+
+def test_closing_leaves_a_flat_position_and_only_realized_pnl():
+    keeper = PositionKeeper()
+    keeper.apply_fill('a', -1.0, 100.0)
+    assert keeper.apply_fill('a', 1.0, 90.0, fee=0.5) == pytest.approx(9.5)
+    position = keeper.position('a')
+    assert (position['size'], position['avg_price']) == (0.0, 0.0)
+    assert keeper.realized_pnl == pytest.approx(9.5)
+    assert keeper.unrealized_pnl(500.0) == 0.0
+
+def test_flipping_closes_the_old_side_and_opens_the_rest_at_the_fill_price():
+    keeper = PositionKeeper()
+    keeper.apply_fill('a', 1.0, 100.0)
+    assert keeper.apply_fill('a', -3.0, 110.0) == pytest.approx(10.0)
+    position = keeper.position('a')
+    assert position['size'] == -2.0
+    assert position['avg_price'] == 110.0
+    assert keeper.total_pnl(105.0) == pytest.approx(10.0 + 10.0)
+
+def test_net_and_version_follow_fills_across_venues():
+    keeper = PositionKeeper(fill_log_size=2)
+    keeper.apply_fill('a', 1.0, 100.0)
+    keeper.apply_fill('b', -0.25, 101.0)
+    keeper.apply_fill('a', 0.0, 102.0)     # nothing to book
+    keeper.apply_fill('b', 0.5, 99.0)
+    assert keeper.net() == pytest.approx(1.25)
+    assert (keeper.version, keeper.fill_count) == (3, 3)
+    assert [fill['venue'] for fill in keeper.recent_fills(5)] == ['b', 'b']
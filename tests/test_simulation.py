@@ -0,0 +1,33 @@
+# test_simulation.py
+import threading
+import time
+
+from clock import SimulatedClock
+from simulation import SimulationState
+
+class StalledRecorder:
+    """Recorder whose disk never comes back until released"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.ticks = 0
+
+    def record(self, price, bid, ask, venue, time_ns):
+        self.release.wait()
+        self.ticks += 1
+
+def test_stalled_recorder_does_not_hold_up_publishing():
+    recorder = StalledRecorder()
+    state = SimulationState(recorder=recorder, clock=SimulatedClock(), seed=0, start=False)
+    try:
+        started = time.monotonic()
+        for i in range(10100):
+            state.bus.publish('price', {'price': 40000.0 + i, 'bid': 39999.0, 'ask': 40001.0})
+        assert time.monotonic() - started < 5.0
+        stats = state.recorder_subscription.get_stats()
+        # One tick is stuck in the recorder, 10000 are queued, the rest were dropped
+        assert stats['dropped'] >= 99
+        assert stats['depth'] == 10000
+    finally:
+        recorder.release.set()
+        state.bus.unsubscribe(state.recorder_subscription)
@@ -0,0 +1,21 @@
+# test_tick_recorder.py
+import numpy as np
+from tick_recorder import TickRecorder, TickReader
+
+def test_time_stays_non_decreasing_across_restart(tmp_path):
+    recorder = TickRecorder(str(tmp_path), segment_capacity=10)
+    recorder.record(40000.0, 39999.0, 40001.0, time_ns=5000)
+    recorder.record(40001.0, 40000.0, 40002.0, time_ns=6000)
+    recorder.records.flush()
+    recorder.header.flush()
+
+    # A restarted recorder (e.g. after a clock step back) must not write earlier times
+    restarted = TickRecorder(str(tmp_path), segment_capacity=10)
+    assert restarted.last_ns == 6000
+    restarted.record(40002.0, 40001.0, 40003.0, time_ns=4000)
+    restarted.records.flush()
+    restarted.header.flush()
+
+    times = np.concatenate([view['time_ns'] for view in TickReader(str(tmp_path)).range()])
+    assert times.tolist() == [5000, 6000, 6000]
+    assert len(np.concatenate([view['time_ns'] for view in TickReader(str(tmp_path)).range(6000)])) == 2
@@ -0,0 +1,37 @@
+# test_tick_store.py
+from clock import SimulatedClock
+from tick_store import TickStore
+
+def test_omitted_timestamp_comes_from_the_clock():
+    clock = SimulatedClock(start=1704067200.0)
+    store = TickStore(capacity=4, clock=clock)
+    store.append(100.0, 99.0, 101.0)
+    clock.advance(2.5)
+    store.append(101.0, 100.0, 102.0)
+    assert store.times().tolist() == [1704067200.0, 1704067202.5]
+
+def test_ring_wraps_and_windows_stay_contiguous():
+    store = TickStore(capacity=4)
+    for i in range(10):
+        store.append(100.0 + i, 99.0 + i, 101.0 + i, 1000.0 + i)
+    assert len(store) == 4
+    assert store.prices().tolist() == [106.0, 107.0, 108.0, 109.0]
+    assert store.window(2)[TickStore.ASK].tolist() == [109.0, 110.0]
+    assert store.since(1007.0)[TickStore.PRICE].tolist() == [108.0, 109.0]
+    assert store.latest() == {'price': 109.0, 'bid': 108.0, 'ask': 110.0, 'time': 1009.0}
+
+    # A snapshot is a copy that later appends don't touch
+    snapshot = store.snapshot()
+    store.append(200.0, 199.0, 201.0, 1010.0)
+    assert snapshot[TickStore.PRICE].tolist() == [106.0, 107.0, 108.0, 109.0]
+
+def test_to_records_formats_utc_timestamps():
+    store = TickStore(capacity=4)
+    for i in range(6):
+        store.append(100.0 + i, 99.0 + i, 101.0 + i, 1704067200.0 + i)
+    assert store.to_records(n=2) == [
+        {'price': 104.0, 'bid': 103.0, 'ask': 105.0, 'timestamp': '2024-01-01T00:00:04+00:00'},
+        {'price': 105.0, 'bid': 104.0, 'ask': 106.0, 'timestamp': '2024-01-01T00:00:05+00:00'},
+    ]
+    assert [record['price'] for record in store.to_records(since=1704067203.0)] == [104.0, 105.0]
+    assert TickStore().to_records() == []